@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class TodoV2Config(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'TODO_V2'
+
+    def ready(self):
+        import TODO_V2.checks
+        from TODO_V2.events import connect_event_receivers
+        connect_event_receivers()
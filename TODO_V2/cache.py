@@ -0,0 +1,145 @@
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.conf import settings
+from django.db.models import Model, QuerySet
+from rest_framework.serializers import Serializer
+from typing import Any, Callable, Iterable, List, Type
+from random import random
+from uuid import uuid4
+import logging
+import math
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_fragment_settings() -> dict:
+    fragment_settings = {
+        'CACHE_ALIAS': 'default',
+        'ENABLED': True,
+        'TIMEOUT': 60 * 60,
+    }
+    fragment_settings.update(getattr(settings, 'FRAGMENT_CACHE_SETTINGS', {}))
+
+    timeout = fragment_settings['TIMEOUT']
+    if hasattr(timeout, 'total_seconds'):
+        fragment_settings['TIMEOUT'] = timeout.total_seconds()
+
+    return fragment_settings
+
+
+def fragment_key(instance: Model, serializer_class: Type[Serializer]) -> str:
+    return (
+        f'fragment-{instance._meta.label_lower}-{serializer_class.__name__}'
+        f'-{instance.pk}-{instance.updated_at.isoformat()}'
+    )
+
+
+def render_fragments(objects: QuerySet | Iterable[Model], serializer_class: Type[Serializer]) -> List[dict]:
+    """
+    Serializes `objects` with `serializer_class` reusing the cached representation of every row whose
+    (id, updated_at) pair hasn't changed. Cached rows are fetched with a single get_many and only the
+    missing ones are serialized (and stored back with a single set_many).
+    """
+    fragment_settings = get_fragment_settings()
+    objects = list(objects)
+
+    if not fragment_settings['ENABLED']:
+        return list(serializer_class(objects, many=True).data)
+
+    cache = caches[fragment_settings['CACHE_ALIAS']]
+    keys = [fragment_key(instance, serializer_class) for instance in objects]
+    fragments = cache.get_many(keys)
+
+    missing = [instance for instance, key in zip(objects, keys) if key not in fragments]
+    if missing:
+        rendered = {
+            fragment_key(instance, serializer_class): data
+            for instance, data in zip(missing, serializer_class(missing, many=True).data)
+        }
+        cache.set_many(rendered, fragment_settings['TIMEOUT'])
+        fragments.update(rendered)
+
+    return [fragments[key] for key in keys]
+
+
+def get_single_flight_settings() -> dict:
+    single_flight_settings = {
+        'CACHE_ALIAS': 'default',
+        'LOCK_TIMEOUT': 10,
+        'WAIT_TIMEOUT': 2,
+        'STALE_TIMEOUT': 5 * 60,
+        'BETA': 1.0,
+    }
+    single_flight_settings.update(getattr(settings, 'SINGLE_FLIGHT_SETTINGS', {}))
+
+    single_flight_settings['CACHE'] = caches[single_flight_settings['CACHE_ALIAS']]
+    for key, value in single_flight_settings.items():
+        if hasattr(value, 'total_seconds'):
+            single_flight_settings[key] = value.total_seconds()
+
+    return single_flight_settings
+
+
+def single_flight(key: str, compute: Callable[[], Any], timeout: float, beta: float = None) -> Any:
+    """
+    Returns the cached value of `key`, computing it with `compute` when needed, so that only one worker
+    rebuilds a given key at a time.
+
+    - Entries are recomputed slightly before they expire with a probability that grows as the expiration
+      gets closer and with how long the last computation took (probabilistic early expiration).
+    - While one worker holds the rebuild lock, the others get the stale value if there is one, or wait up
+      to WAIT_TIMEOUT for the new value before computing it themselves.
+    """
+    single_flight_settings = get_single_flight_settings()
+    beta = single_flight_settings['BETA'] if beta is None else beta
+    cache = single_flight_settings['CACHE']
+    lock_key = f'{key}-lock'
+
+    entry = cache.get(key)
+    if entry is not None and not _should_recompute(entry, beta):
+        return entry['value']
+
+    lock_token = uuid4().hex
+    if cache.add(lock_key, lock_token, single_flight_settings['LOCK_TIMEOUT']):
+        try:
+            return _recompute(cache, key, compute, timeout, single_flight_settings['STALE_TIMEOUT'])
+        finally:
+            if cache.get(lock_key) == lock_token:
+                cache.delete(lock_key)
+
+    if entry is not None:  # Someone else is rebuilding, the stale value will do
+        return entry['value']
+
+    deadline = time.monotonic() + single_flight_settings['WAIT_TIMEOUT']
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value']
+
+    logger.warning(f'Timed out waiting for {key} to be rebuilt, computing it locally')
+    return _recompute(cache, key, compute, timeout, single_flight_settings['STALE_TIMEOUT'])
+
+
+def _should_recompute(entry: dict, beta: float) -> bool:
+    # XFetch: now - delta * beta * ln(rand()) >= expires_at
+    return time.time() - entry['delta'] * beta * math.log(1 - random()) >= entry['expires_at']
+
+
+def _recompute(cache: BaseCache, key: str, compute: Callable[[], Any], timeout: float, stale_timeout: float) -> Any:
+    start = time.time()
+    value = compute()
+    delta = time.time() - start
+
+    cache.set(
+        key,
+        {'value': value, 'delta': delta, 'expires_at': time.time() + timeout},
+        timeout + stale_timeout,  # Kept around past its expiration to be served while it's rebuilt
+    )
+    return value
+
+
+def invalidate_single_flight(key: str) -> bool:
+    return get_single_flight_settings()['CACHE'].delete(key)
@@ -0,0 +1,371 @@
+from collections import OrderedDict
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.utils.module_loading import import_string
+from django_redis.cache import RedisCache, omit_exception
+from django_redis.compressors.base import BaseCompressor
+from django_redis.client.default import _main_exceptions
+from django_redis.exceptions import ConnectionInterrupted
+from django_redis.pool import ConnectionFactory
+from typing import Any, Dict, Iterable, Tuple
+from uuid import uuid4
+import json
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+CLEAR_ALL = '*'
+
+
+class NamedPoolConnectionFactory(ConnectionFactory):
+    """
+    django_redis shares one connection pool per URL across every cache alias. This keeps a separate pool
+    per OPTIONS["CONNECTION_POOL_NAME"] so a burst on one workload can't starve the others of connections.
+    """
+    def get_or_create_connection_pool(self, params):
+        key = (self.options.get('CONNECTION_POOL_NAME'), params['url'])
+        if key not in self._pools:
+            self._pools[key] = self.get_connection_pool(params)
+        return self._pools[key]
+
+
+class ThresholdCompressor(BaseCompressor):
+    """
+    Wraps one of django_redis' compressors (OPTIONS["COMPRESSOR_CLASS"]) making the size under which
+    values are stored uncompressed configurable through OPTIONS["COMPRESS_MIN_LENGTH"].
+    """
+    def __init__(self, options):
+        super().__init__(options)
+        self.compressor = import_string(
+            options.get('COMPRESSOR_CLASS', 'django_redis.compressors.identity.IdentityCompressor')
+        )(options)
+        if 'COMPRESS_MIN_LENGTH' in options:
+            self.compressor.min_length = options['COMPRESS_MIN_LENGTH']
+
+    def compress(self, value: bytes) -> bytes:
+        return self.compressor.compress(value)
+
+    def decompress(self, value: bytes) -> bytes:
+        return self.compressor.decompress(value)
+
+
+class LocalMemoryTier:
+    """
+    A bounded, thread-safe LRU of encoded cache values with a per-entry expiration time.
+    """
+    def __init__(self, max_entries: int, timeout: float):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> (bool, Any):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any, timeout: float | None = None):
+        if timeout is None or timeout > self.timeout:
+            timeout = self.timeout
+        if timeout <= 0:
+            return self.delete(key)
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TwoTierRedisCache(RedisCache):
+    """
+    django_redis backend with an in-process LRU in front of Redis.
+
+    Reads are served from process memory when possible. Every write publishes the affected keys on a
+    Redis pub/sub channel so the other workers and nodes drop their local copies. Local entries live
+    at most LOCAL_CACHE["TIMEOUT"] seconds, which bounds staleness if an invalidation message is lost.
+
+    OPTIONS = {
+        'LOCAL_CACHE': {
+            'MAX_ENTRIES': 1024,
+            'TIMEOUT': 5,
+            'CHANNEL': 'cache-invalidation',
+        }
+    }
+    """
+    def __init__(self, server: str, params: Dict[str, Any]):
+        super().__init__(server, params)
+        local_settings = {
+            'MAX_ENTRIES': 1024,
+            'TIMEOUT': 5,
+            'CHANNEL': 'cache-invalidation',
+        }
+        local_settings.update(params.get('OPTIONS', {}).get('LOCAL_CACHE', {}))
+
+        self.local = LocalMemoryTier(local_settings['MAX_ENTRIES'], local_settings['TIMEOUT'])
+        self.channel = local_settings['CHANNEL']
+        self.node_id = uuid4().hex
+
+        self._pid = None
+        self._listener = None
+        self._listener_lock = threading.Lock()
+        self._subscribed = threading.Event()
+        # Bumped on every invalidation so a value fetched before one arrives isn't cached afterwards
+        self._generation = 0
+
+    # Invalidation
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid() and self._listener is not None and self._listener.is_alive():
+            return
+
+        with self._listener_lock:
+            if self._pid == os.getpid() and self._listener is not None and self._listener.is_alive():
+                return
+
+            # A forked worker inherits the parent's entries but not its subscription
+            self._pid = os.getpid()
+            self._subscribed.clear()
+            self.local.clear()
+            self._listener = threading.Thread(
+                target=self._listen,
+                name=f'cache-invalidation-{self.node_id[:8]}',
+                daemon=True,
+            )
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            pubsub = None
+            # noinspection PyBroadException
+            try:
+                pubsub = self.client.get_client(write=False).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self._subscribed.set()
+                while True:
+                    # Polled rather than blocking in listen(), which fails with the pool's SOCKET_TIMEOUT
+                    # whenever the channel is idle for that long. Only a lost connection raises here.
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._handle_invalidation(message.get('data'))
+            except Exception:
+                logger.warning('Lost cache invalidation channel, dropping the local cache tier', exc_info=True)
+            finally:
+                # Anything cached while unsubscribed may miss invalidations
+                self._subscribed.clear()
+                self._generation += 1
+                self.local.clear()
+                if pubsub is not None:
+                    # noinspection PyBroadException
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            time.sleep(1)
+
+    def _handle_invalidation(self, data: bytes | str | None):
+        if data is None:
+            return
+        # noinspection PyBroadException
+        try:
+            message = json.loads(data)
+        except Exception:
+            logger.warning(f'Ignoring malformed cache invalidation message: {data!r}')
+            return
+
+        if message.get('node') == self.node_id:
+            return
+
+        self._drop_local(message.get('keys', []))
+
+    def invalidate(self, *keys: str):
+        """
+        Drops `keys` (already built with make_key) from this process and from every subscribed process.
+        """
+        self._drop_local(keys)
+
+        # noinspection PyBroadException
+        try:
+            self.client.get_client(write=True).publish(
+                self.channel,
+                json.dumps({'node': self.node_id, 'keys': list(keys)})
+            )
+        except Exception:
+            logger.warning('Failed to publish cache invalidation', exc_info=True)
+
+    def _drop_local(self, keys):
+        self._generation += 1
+        if CLEAR_ALL in keys:
+            self.local.clear()
+        else:
+            self.local.delete(*keys)
+
+    def _current_generation(self) -> int | None:
+        return self._generation if self._subscribed.is_set() else None
+
+    def _store_local(self, nkey: str, raw, ttl: float | None, generation: int | None):
+        if generation is not None and generation == self._generation:
+            self.local.set(nkey, raw, ttl)
+
+    def _local_key(self, key, version=None) -> str:
+        return str(self.client.make_key(key, version=version))
+
+    # Reads
+
+    def get(self, key, default=None, version=None, client=None):
+        self._ensure_listener()
+        nkey = self._local_key(key, version)
+
+        hit, raw = self.local.get(nkey)
+        if hit:
+            return self.client.decode(raw)
+
+        generation = self._current_generation()
+        fetched = self._fetch_raw([nkey], client)
+        if not fetched or fetched[0][0] is None:
+            return default
+
+        raw, ttl = fetched[0]
+        self._store_local(nkey, raw, ttl, generation)
+        return self.client.decode(raw)
+
+    def get_many(self, keys: Iterable, version=None, client=None):
+        self._ensure_listener()
+        keys = list(keys)
+        result = OrderedDict()
+        missing = OrderedDict()
+
+        for key in keys:
+            nkey = self._local_key(key, version)
+            hit, raw = self.local.get(nkey)
+            if hit:
+                result[key] = raw
+            else:
+                missing[nkey] = key
+
+        if missing:
+            generation = self._current_generation()
+            for nkey, (raw, ttl) in zip(missing, self._fetch_raw(list(missing), client)):
+                if raw is None:
+                    continue
+                self._store_local(nkey, raw, ttl, generation)
+                result[missing[nkey]] = raw
+
+        return OrderedDict(
+            (key, self.client.decode(result[key])) for key in keys if key in result
+        )
+
+    @omit_exception(return_value=[])
+    def _fetch_raw(self, nkeys: list, client=None) -> list:
+        """
+        Fetches the encoded values of `nkeys` along with their remaining TTL (in seconds, None when the
+        key doesn't expire) in a single round trip.
+        """
+        client = client or self.client.get_client(write=False)
+        try:
+            pipeline = client.pipeline(transaction=False)
+            pipeline.mget(*nkeys)
+            for nkey in nkeys:
+                pipeline.pttl(nkey)
+            values, *pttls = pipeline.execute()
+        except _main_exceptions as e:
+            raise ConnectionInterrupted(connection=client) from e
+
+        return [
+            (value, None if pttl == -1 else max(pttl, 0) / 1000)
+            for value, pttl in zip(values, pttls)
+        ]
+
+    def has_key(self, key, version=None, client=None):
+        hit, _ = self.local.get(self._local_key(key, version))
+        return hit or super().has_key(key, version=version, client=client)
+
+    # Writes
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False, xx=False):
+        result = super().set(key, value, timeout=timeout, version=version, client=client, nx=nx, xx=xx)
+        if result:
+            self.invalidate(self._local_key(key, version))
+        return result
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super().add(key, value, timeout=timeout, version=version, client=client)
+        if result:
+            self.invalidate(self._local_key(key, version))
+        return result
+
+    def set_many(self, data: dict, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super().set_many(data, timeout=timeout, version=version, client=client)
+        if data:
+            self.invalidate(*(self._local_key(key, version) for key in data))
+        return result
+
+    def delete(self, key, version=None, prefix=None, client=None):
+        result = super().delete(key, version=version, prefix=prefix, client=client)
+        self.invalidate(self._local_key(key, version))
+        return result
+
+    def delete_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        result = super().delete_many(keys, version=version, client=client)
+        if keys:
+            self.invalidate(*(self._local_key(key, version) for key in keys))
+        return result
+
+    def delete_pattern(self, *args, **kwargs):
+        result = super().delete_pattern(*args, **kwargs)
+        self.invalidate(CLEAR_ALL)
+        return result
+
+    def clear(self):
+        result = super().clear()
+        self.invalidate(CLEAR_ALL)
+        return result
+
+    def incr(self, key, delta=1, version=None, client=None, ignore_key_check=False):
+        result = super().incr(key, delta=delta, version=version, client=client, ignore_key_check=ignore_key_check)
+        self.invalidate(self._local_key(key, version))
+        return result
+
+    def decr(self, key, delta=1, version=None, client=None):
+        result = super().decr(key, delta=delta, version=version, client=client)
+        self.invalidate(self._local_key(key, version))
+        return result
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super().touch(key, timeout=timeout, version=version, client=client)
+        self.invalidate(self._local_key(key, version))
+        return result
+
+    def expire(self, key, timeout, version=None, client=None):
+        result = super().expire(key, timeout, version=version, client=client)
+        self.invalidate(self._local_key(key, version))
+        return result
+
+    def persist(self, key, version=None, client=None):
+        result = super().persist(key, version=version, client=client)
+        self.invalidate(self._local_key(key, version))
+        return result
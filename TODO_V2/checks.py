@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Warning, register, Tags
+
+
+@register(Tags.security)
+def cipher_keys_check(app_configs, **kwargs):
+    if settings.DEBUG or getattr(settings, 'CIPHER_KEYS', None):
+        return []
+
+    return [
+        Warning(
+            'CIPHER_KEYS is not set, values are encrypted with a key derived from SECRET_KEY.',
+            hint='Changing SECRET_KEY makes the encrypted values (e.g. queued SMS) unreadable and the key '
+                 'can\'t be rotated. Generate a key ring with "manage.py cipher_keys generate" and set CIPHER_KEYS.',
+            id='TODO_V2.W001',
+        )
+    ]
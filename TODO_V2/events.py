@@ -0,0 +1,287 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django_redis import get_redis_connection
+from typing import AsyncIterator, Dict, Iterable, List, Tuple, Type
+from .models import SoftDeleteModel, restored, soft_deleted
+import json
+import logging
+import redis.asyncio
+
+
+logger = logging.getLogger(__name__)
+
+
+EVENT_MODELS = ('task.Task', 'step.Step', 'tag.Tag', 'contact.Contact')
+
+# Labels of the models whose change events aren't recorded, see suppress_events
+_suppressed: ContextVar[frozenset] = ContextVar('suppressed_events', default=frozenset())
+
+# The event is appended to the user's stream (kept for Last-Event-ID resumes) and published on the channel of the
+# same name with its stream id, in a single round trip.
+PUBLISH_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[3])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+redis.call('PUBLISH', KEYS[1], id .. ' ' .. ARGV[3])
+return id
+"""
+
+
+def get_event_settings() -> dict:
+    event_settings = {
+        'CACHE_ALIAS': 'default',
+        'HISTORY_SIZE': 1000,
+        'HISTORY_TIMEOUT': 60 * 60,
+        'KEEPALIVE': 15,
+        'RETRY': 3,
+    }
+    event_settings.update(getattr(settings, 'EVENT_SETTINGS', {}))
+
+    for key in ('HISTORY_TIMEOUT', 'KEEPALIVE', 'RETRY'):
+        if hasattr(event_settings[key], 'total_seconds'):
+            event_settings[key] = event_settings[key].total_seconds()
+
+    return event_settings
+
+
+def event_channel(user_id: int) -> str:
+    return f'events-{user_id}'
+
+
+def publish_event(user_id: int, model: str, action: str, ids: Iterable[int]) -> str:
+    """
+    Sends {"model", "action", "ids"} to the event streams of `user_id` and returns the event id.
+    """
+    event_settings = get_event_settings()
+    client = get_redis_connection(event_settings['CACHE_ALIAS'])
+    event_id = client.register_script(PUBLISH_SCRIPT)(
+        keys=[event_channel(user_id)],
+        args=[
+            event_settings['HISTORY_SIZE'],
+            int(event_settings['HISTORY_TIMEOUT'] * 1000),
+            json.dumps({'model': model, 'action': action, 'ids': sorted(set(ids))}),
+        ],
+    )
+    return event_id.decode() if isinstance(event_id, bytes) else event_id
+
+
+class EventBatch:
+    """
+    Change events of a transaction, published once it commits (one event per user, model and action) and
+    dropped if it's rolled back.
+    """
+    def __init__(self):
+        # (model class, action, pk, user id, task id), the user is looked up through the task when only it is known
+        self.events: List[Tuple[Type[models.Model], str, int, int | None, int | None]] = []
+        self.published = False
+
+    def add(self, model: Type[models.Model], action: str, pk: int, user_id: int = None, task_id: int = None):
+        self.events.append((model, action, pk, user_id, task_id))
+
+    def __call__(self):
+        self.published = True
+        try:
+            for (user_id, model, action), ids in self.group().items():
+                publish_event(user_id, model, action, ids)
+        except Exception:
+            # The changes are committed already, clients will catch up on their next full fetch
+            logger.exception('Failed to publish change events')
+
+    def group(self) -> Dict[Tuple[int, str, str], List[int]]:
+        # Owners that weren't known when the event was recorded, looked up with one query per model
+        task_model = apps.get_model('task.Task')
+        missing = {}
+        for model, _, pk, user_id, task_id in self.events:
+            if user_id is None and task_id is not None:
+                missing.setdefault(task_model, set()).add(task_id)
+            elif user_id is None:
+                missing.setdefault(model, set()).add(pk)
+        owners = {
+            model: dict(model._base_manager.filter(pk__in=pks).values_list('pk', owner_lookup(model)))
+            for model, pks in missing.items()
+        }
+
+        grouped = {}
+        for model, action, pk, user_id, task_id in self.events:
+            if user_id is None:
+                user_id = owners[task_model].get(task_id) if task_id is not None else owners[model].get(pk)
+            if user_id is not None:
+                grouped.setdefault((user_id, model._meta.model_name, action), []).append(pk)
+        return grouped
+
+
+def owner_lookup(model: Type[models.Model]) -> str:
+    return 'task__user_id' if model._meta.label == 'step.Step' else 'user_id'
+
+
+def current_batch(using: str = None) -> EventBatch | None:
+    """
+    Returns the EventBatch of the current transaction (savepoint), registering a new one when needed, or None
+    outside of a transaction. Only the last registered callback is reused so events are published in order.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        return None
+
+    if connection.run_on_commit:
+        callback_savepoint_ids, callback, _ = connection.run_on_commit[-1]
+        if isinstance(callback, EventBatch) and not callback.published \
+                and callback_savepoint_ids == set(connection.savepoint_ids):
+            return callback
+
+    batch = EventBatch()
+    transaction.on_commit(batch, using=using)
+    return batch
+
+
+@contextmanager
+def suppress_events(*model_classes: Type[models.Model]):
+    """
+    Drops the change events of `model_classes` within the block, for writes that don't change what clients see
+    (e.g. steps moved to or from Task.compacted_steps). The caller reports the change itself if needed.
+    """
+    token = _suppressed.set(_suppressed.get() | {model._meta.label for model in model_classes})
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+def queue_events(
+    model: Type[models.Model], action: str, pks: Iterable[int],
+    user_id: int = None, task_id: int = None, using: str = None,
+):
+    """
+    Records change events for the rows `pks` of `model`, published when the current transaction commits (right
+    away outside of one). When `user_id` isn't given, the owner of the rows (or of `task_id`) is looked up then.
+    """
+    if model._meta.label in _suppressed.get():
+        return
+
+    batch = current_batch(using)
+    publish = batch is None
+    if publish:
+        batch = EventBatch()
+    for pk in pks:
+        batch.add(model, action, pk, user_id, task_id)
+    if publish:
+        batch()
+
+
+def instance_owner(instance: models.Model) -> dict:
+    # Steps have no user, their task is used unless it's loaded already
+    if instance._meta.label == 'step.Step':
+        if instance._meta.get_field('task').is_cached(instance):
+            return {'user_id': instance.task.user_id}
+        return {'task_id': instance.task_id}
+    return {'user_id': instance.user_id}
+
+
+def saved(sender, instance, created, using, **kwargs):
+    queue_events(sender, 'created' if created else 'updated', [instance.pk], using=using, **instance_owner(instance))
+
+
+def deleted(sender, instance, using, origin=None, **kwargs):
+    # Rows deleted along with a task or a user (cascades) are reported with it
+    if (isinstance(origin, models.Model) and origin is not instance) or (
+        isinstance(origin, models.QuerySet) and origin.model is not sender
+    ):
+        return
+    # Rows purged from the trash were reported when they were moved there
+    if isinstance(instance, SoftDeleteModel) and instance.deleted_at is not None:
+        return
+    queue_events(sender, 'deleted', [instance.pk], using=using, **instance_owner(instance))
+
+
+def trashed(sender, pks, using, **kwargs):
+    queue_events(sender, 'deleted', pks, using=using)
+
+
+def untrashed(sender, pks, using, **kwargs):
+    queue_events(sender, 'restored', pks, using=using)
+
+
+def tasks_changed(sender, instance, action, reverse, model, pk_set, using, **kwargs):
+    # Linking tags or contacts to tasks changes the tasks list of the tag or contact
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        if pk_set:
+            queue_events(model, 'updated', pk_set, user_id=instance.user_id, using=using)
+    else:
+        queue_events(type(instance), 'updated', [instance.pk], user_id=instance.user_id, using=using)
+
+
+def connect_event_receivers():
+    for label in EVENT_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(saved, sender=model, dispatch_uid=f'events-saved-{label}')
+        # Tasks and contacts are moved to the trash (unless TRASH_SETTINGS["ENABLED"] is off) and deleted for
+        # good when purged, see deleted()
+        if issubclass(model, SoftDeleteModel):
+            soft_deleted.connect(trashed, sender=model, dispatch_uid=f'events-trashed-{label}')
+            restored.connect(untrashed, sender=model, dispatch_uid=f'events-restored-{label}')
+
+        post_delete.connect(deleted, sender=model, dispatch_uid=f'events-deleted-{label}')
+
+    for label in ('tag.Tag', 'contact.Contact'):
+        m2m_changed.connect(
+            tasks_changed, sender=apps.get_model(label).tasks.through, dispatch_uid=f'events-tasks-{label}'
+        )
+
+
+def _stream_id(event_id: str) -> Tuple[int, int]:
+    milliseconds, _, sequence = event_id.partition('-')
+    return int(milliseconds), int(sequence or 0)
+
+
+def format_event(event_id: str, data: str) -> str:
+    event = json.loads(data)
+    return f'id: {event_id}\nevent: {event["model"]}.{event["action"]}\ndata: {data}\n\n'
+
+
+async def event_stream(user_id: int, last_event_id: str = None) -> AsyncIterator[str]:
+    """
+    Yields the change events of `user_id` formatted as server-sent events. The events recorded after
+    `last_event_id` (as long as they're still in the stream history) are sent first, then the live ones received
+    through pub/sub. A comment is sent every KEEPALIVE seconds without events so proxies keep the connection open.
+    """
+    event_settings = get_event_settings()
+    location = settings.CACHES[event_settings['CACHE_ALIAS']]['LOCATION']
+    client = redis.asyncio.from_url(location[0] if isinstance(location, (list, tuple)) else location)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    channel = event_channel(user_id)
+    try:
+        # Subscribed before reading the history, so no event falls in between (duplicates are skipped below)
+        await pubsub.subscribe(channel)
+        yield f'retry: {int(event_settings["RETRY"] * 1000)}\n\n'  # Reconnection delay of EventSource
+
+        last_sent = None
+        if last_event_id:
+            try:
+                last_sent = _stream_id(last_event_id)
+            except ValueError:
+                last_event_id = None
+        if last_event_id:
+            for event_id, fields in await client.xrange(channel, min=f'({last_event_id}', max='+'):
+                event_id = event_id.decode()
+                last_sent = _stream_id(event_id)
+                yield format_event(event_id, fields[b'data'].decode())
+
+        while True:
+            message = await pubsub.get_message(timeout=event_settings['KEEPALIVE'])
+            if message is None:
+                yield ': keepalive\n\n'
+                continue
+
+            event_id, _, data = message['data'].decode().partition(' ')
+            if last_sent is not None and _stream_id(event_id) <= last_sent:
+                continue
+            last_sent = _stream_id(event_id)
+            yield format_event(event_id, data)
+    finally:  # Also run when the client goes away
+        await pubsub.aclose()
+        await client.aclose()
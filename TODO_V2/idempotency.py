@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.core.cache import caches
+from functools import wraps
+from hashlib import sha256
+from rest_framework import status
+from rest_framework.response import Response
+from uuid import uuid4
+import json
+import time
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def get_idempotency_settings() -> dict:
+    idempotency_settings = {
+        'CACHE_ALIAS': 'default',
+        'TIMEOUT': 24 * 60 * 60,
+        'LOCK_TIMEOUT': 10,
+        'WAIT_TIMEOUT': 5,
+    }
+    idempotency_settings.update(getattr(settings, 'IDEMPOTENCY_SETTINGS', {}))
+
+    for key, value in idempotency_settings.items():
+        if hasattr(value, 'total_seconds'):
+            idempotency_settings[key] = value.total_seconds()
+
+    return idempotency_settings
+
+
+def request_fingerprint(request) -> str:
+    return sha256(json.dumps(request.data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def replay(stored: dict) -> Response:
+    response = Response(data=stored['data'], status=stored['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view_method):
+    """
+    Makes a view method safe to retry with an Idempotency-Key header: the first response (unless it's a server
+    error) is stored for TIMEOUT and replayed for every retry with the same key, instead of running the view again.
+    Concurrent duplicates wait up to WAIT_TIMEOUT for the first one to finish. Reusing a key with a different body
+    is refused.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            return view_method(self, request, *args, **kwargs)
+
+        if len(idempotency_key) > 255:
+            return self.build_response(
+                response_status=status.HTTP_400_BAD_REQUEST,
+                message=f'{IDEMPOTENCY_HEADER} must be at most 255 characters',
+            )
+
+        idempotency_settings = get_idempotency_settings()
+        cache = caches[idempotency_settings['CACHE_ALIAS']]
+        key = (
+            f'idempotency-{request.user.pk}-{request.method}-{request.path}'
+            f'-{sha256(idempotency_key.encode()).hexdigest()}'
+        )
+        lock_key = f'{key}-lock'
+        fingerprint = request_fingerprint(request)
+
+        def stored_response():
+            stored = cache.get(key)
+            if stored is None:
+                return None
+            if stored['fingerprint'] != fingerprint:
+                return self.build_response(
+                    response_status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    message=f'{IDEMPOTENCY_HEADER} was already used with a different request',
+                )
+            return replay(stored)
+
+        response = stored_response()
+        if response is not None:
+            return response
+
+        lock_token = uuid4().hex
+        if cache.add(lock_key, lock_token, idempotency_settings['LOCK_TIMEOUT']):
+            try:
+                response = stored_response()  # Finished between the first lookup and the lock
+                if response is not None:
+                    return response
+
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code < 500:
+                    cache.set(
+                        key,
+                        {'fingerprint': fingerprint, 'status': response.status_code, 'data': response.data},
+                        idempotency_settings['TIMEOUT'],
+                    )
+                return response
+            finally:
+                if cache.get(lock_key) == lock_token:
+                    cache.delete(lock_key)
+
+        deadline = time.monotonic() + idempotency_settings['WAIT_TIMEOUT']
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            response = stored_response()
+            if response is not None:
+                return response
+
+        return self.build_response(
+            response_status=status.HTTP_409_CONFLICT,
+            message=f'A request with this {IDEMPOTENCY_HEADER} is still in progress',
+        )
+
+    return wrapper
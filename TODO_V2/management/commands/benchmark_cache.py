@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+from django_redis.exceptions import CompressorError
+from TODO_V2.cache_backends import ThresholdCompressor
+from time import perf_counter, time
+from datetime import timedelta
+from contextlib import suppress
+
+
+def task_row(task_id: int) -> dict:
+    now = timezone.now() - timedelta(minutes=task_id)
+    return {
+        'id': task_id,
+        'progress': 0,
+        'title': f'Prepare the quarterly report #{task_id}',
+        'project': 'Work',
+        'notes': f'Collect the numbers from team {task_id} and draft the summary before the meeting.',
+        'is_done': task_id % 3 == 0,
+        'is_archived': False,
+        'remind_at': (now + timedelta(hours=3)).isoformat(),
+        'due_at': (now + timedelta(days=2)).isoformat(),
+        'created_at': now.isoformat(),
+        'updated_at': now.isoformat(),
+        'completed_at': None,
+        'user': 1,
+    }
+
+
+def sample_payloads(rows: int) -> dict:
+    return {
+        'otp': {'id': 1},  # the data of an OTP, its token is stored as a digest
+        'throttle': [time() - i * 2.5 for i in range(30)],
+        'task fragment': task_row(1),
+        f'task list ({rows} rows)': [task_row(i) for i in range(rows)],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compares Redis memory usage and round-trip latency of the cache serializers and compressors for our key types'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=1000, help='set/get round trips per combination')
+        parser.add_argument('--rows', type=int, default=50, help='rows in the sample task list')
+        parser.add_argument('--serializers', nargs='+', default=['pickle', 'json', 'msgpack'])
+        parser.add_argument('--compressors', nargs='+', default=['none', 'zlib'])
+        parser.add_argument('--min-length', type=int, default=256, help='COMPRESS_MIN_LENGTH to benchmark with')
+        parser.add_argument('--alias', default='default', help='cache alias whose Redis server is used')
+
+    def handle(self, *args, **options):
+        redis = get_redis_connection(options['alias'])
+
+        for name in options['serializers']:
+            if name not in settings.CACHE_SERIALIZERS:
+                raise CommandError(f'Unknown serializer "{name}" ({", ".join(settings.CACHE_SERIALIZERS)})')
+        for name in options['compressors']:
+            if name not in settings.CACHE_COMPRESSORS:
+                raise CommandError(f'Unknown compressor "{name}" ({", ".join(settings.CACHE_COMPRESSORS)})')
+
+        self.stdout.write(
+            f'{"key type":<22} {"serializer":<10} {"compressor":<10} {"bytes":>8} {"memory":>8} {"set+get µs":>11}'
+        )
+
+        for key_type, payload in sample_payloads(options['rows']).items():
+            for serializer_name in options['serializers']:
+                for compressor_name in options['compressors']:
+                    codec_options = {
+                        'COMPRESSOR_CLASS': settings.CACHE_COMPRESSORS[compressor_name],
+                        'COMPRESS_MIN_LENGTH': options['min_length'],
+                    }
+                    try:
+                        serializer = import_string(settings.CACHE_SERIALIZERS[serializer_name])(codec_options)
+                        compressor = ThresholdCompressor(codec_options)
+                    except ImportError as e:
+                        self.stderr.write(f'Skipping {serializer_name}/{compressor_name}: {e}')
+                        continue
+
+                    key = f'benchmark-cache-{serializer_name}-{compressor_name}'
+                    try:
+                        encoded = compressor.compress(serializer.dumps(payload))
+                    except TypeError as e:
+                        self.stderr.write(f'Skipping {key_type} with {serializer_name}: {e}')
+                        continue
+
+                    start = perf_counter()
+                    for _ in range(options['iterations']):
+                        redis.set(key, compressor.compress(serializer.dumps(payload)), ex=60)
+                        raw = redis.get(key)
+                        with suppress(CompressorError):  # Values under the threshold aren't compressed
+                            raw = compressor.decompress(raw)
+                        serializer.loads(raw)
+                    elapsed = (perf_counter() - start) / options['iterations'] * 1_000_000
+
+                    memory = redis.memory_usage(key)
+                    redis.delete(key)
+
+                    self.stdout.write(
+                        f'{key_type:<22} {serializer_name:<10} {compressor_name:<10} '
+                        f'{len(encoded):>8} {memory:>8} {elapsed:>11.1f}'
+                    )
@@ -0,0 +1,42 @@
+from cryptography.fernet import Fernet, InvalidToken
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Generates or rotates the Fernet key ring used by settings.CIPHER (CIPHER_KEYS)'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='action', required=True)
+
+        generate = subparsers.add_parser('generate', help='prints a new key ring')
+        generate.add_argument('--keys', type=int, default=1, help='number of keys in the new ring')
+
+        rotate = subparsers.add_parser(
+            'rotate',
+            help='prints CIPHER_KEYS with a new primary key, keeping the current keys for decryption'
+        )
+        rotate.add_argument(
+            '--keep', type=int, default=2,
+            help='how many of the current keys to keep after the new one (older keys are dropped)'
+        )
+
+    def handle(self, *args, **options):
+        if options['action'] == 'generate':
+            if options['keys'] < 1:
+                raise CommandError('--keys must be at least 1')
+            keys = [Fernet.generate_key().decode() for _ in range(options['keys'])]
+        else:
+            if options['keep'] < 0:
+                raise CommandError('--keep must not be negative')
+            current_keys = list(getattr(settings, 'CIPHER_KEYS', []))
+            for key in current_keys:
+                try:
+                    Fernet(key)
+                except (ValueError, InvalidToken) as e:
+                    raise CommandError(f'CIPHER_KEYS contains an invalid key: {e}')
+            if not current_keys:
+                self.stderr.write('CIPHER_KEYS is empty, starting a new key ring')
+            keys = [Fernet.generate_key().decode()] + current_keys[:options['keep']]
+
+        self.stdout.write(f'CIPHER_KEYS={",".join(keys)}')
@@ -20,7 +20,40 @@ class GetDataMixin:
     def is_id(self, value) -> bool:
         return (isinstance(value, str) and value.isdigit() and int(value) > 0) or (isinstance(value, int) and value > 0)
 
+    def get_expected_version(self, request) -> int | None:
+        # If-Match: "3" (or W/"3", 3) is the version the client last saw, "*" matches any version (RFC 9110)
+        if_match = request.headers.get('If-Match')
+        if not if_match or if_match.strip() == '*':
+            return None
+
+        version = if_match.removeprefix('W/').strip('"')
+        if not self.is_id(version):
+            raise ValidationError({'If-Match': 'must be the version of the row, e.g. "3"'})
+        return int(version)
+
 
 class ResponseBuilderMixin:
     def build_response(self, response_status: status = status.HTTP_200_OK, **kwargs):
-        return Response(data=kwargs, status=response_status)
\ No newline at end of file
+        return Response(data=kwargs, status=response_status)
+
+class CostBudgetMixin:
+    """
+    Charges the cost of the request to the budget checked by CostBudgetThrottle and reports it in the
+    X-Request-Cost, X-Cost-Budget-Limit and X-Cost-Budget-Remaining headers.
+    Must come before APIView in the bases.
+    """
+    def get_request_cost(self, request, response) -> int:
+        # One for the request plus one per returned row
+        data = response.data if isinstance(response.data, dict) else {}
+        return 1 + sum(len(value) for value in data.values() if isinstance(value, list))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        throttle = getattr(request, 'cost_budget_throttle', None)
+        if throttle is not None and response.status_code < 400:
+            cost = self.get_request_cost(request, response)
+            remaining = throttle.charge(cost)
+            response['X-Request-Cost'] = cost
+            response['X-Cost-Budget-Limit'] = throttle.num_requests
+            response['X-Cost-Budget-Remaining'] = max(remaining, 0)
+
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,217 @@
+from datetime import datetime
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, router
+from django.db.models import sql
+from django.dispatch import Signal
+from django.utils import timezone
+from typing import Iterable, List, Type
+
+
+class VersionConflict(Exception):
+    pass
+
+
+class VersionedModel(models.Model):
+    """
+    Adds a row version, incremented on every update. Setting `expected_version` before saving turns the save into
+    a conditional UPDATE (... WHERE id = %s AND version = %s) which raises VersionConflict when the row was changed
+    (or deleted) in the meantime, without reading or locking the row first. Other saves set version = version + 1
+    and read the new version back from the same UPDATE (... RETURNING version).
+    """
+    version = models.PositiveIntegerField('Version', default=1)
+
+    expected_version = None
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+
+        previous_version, expected_version = self.version, self.expected_version
+        # Without an expected version the database increments it, so concurrent saves can't write the same version
+        self.version = models.F('version') + 1 if expected_version is None else expected_version + 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+
+        self._previous_version, self._version_conflict = previous_version, False
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            self.version = previous_version
+            raise
+        finally:
+            self.expected_version = None
+
+        # Raised out here, as raising within save_base would break the surrounding transaction
+        if self._version_conflict:
+            self.version = previous_version
+            raise VersionConflict(f'{self._meta.label} {self.pk} is not at version {expected_version} anymore')
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if self.expected_version is None:
+            # Runs the UPDATE queryset.update() would (values always hold the version), returning the new version
+            query = base_qs.filter(pk=pk_val).query.chain(sql.UpdateQuery)
+            query.add_update_fields(values)
+            update_sql, params = query.get_compiler(using).as_sql()
+            connection = connections[using]
+            with connection.cursor() as cursor:
+                column = connection.ops.quote_name(self._meta.get_field('version').column)
+                cursor.execute(f'{update_sql} RETURNING {column}', params)
+                row = cursor.fetchone()
+            # Without a row save() falls back to an INSERT, which needs an actual version
+            self.version = self._previous_version if row is None else row[0]
+            return row is not None
+
+        updated = super()._do_update(
+            base_qs.filter(version=self.expected_version), using, pk_val, values, update_fields, forced_update
+        )
+        # Reported as updated so that save() doesn't fall back to an INSERT
+        self._version_conflict = not updated
+        return True
+
+
+# Sent with the primary keys of the rows moved to (or back from) the trash, as no delete signal is sent for them
+soft_deleted = Signal()
+restored = Signal()
+
+
+def get_trash_settings() -> dict:
+    trash_settings = {
+        'ENABLED': True,
+        'RETENTION': 30 * 24 * 60 * 60,
+        'BATCH_SIZE': 500,
+    }
+    trash_settings.update(getattr(settings, 'TRASH_SETTINGS', {}))
+
+    if hasattr(trash_settings['RETENTION'], 'total_seconds'):
+        trash_settings['RETENTION'] = trash_settings['RETENTION'].total_seconds()
+
+    return trash_settings
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Moves the rows to the trash with a single UPDATE (nothing is cascaded), they are purged for good by
+        TODO_V2.trash.purge_trash once TRASH_SETTINGS["RETENTION"] is over. Deletes them right away when
+        TRASH_SETTINGS["ENABLED"] is off.
+        """
+        if not get_trash_settings()['ENABLED']:
+            return self.hard_delete()
+
+        queryset = self.filter(deleted_at__isnull=True)
+        if not soft_deleted.has_listeners(self.model):
+            deleted = queryset.update(deleted_at=timezone.now())
+            return deleted, {self.model._meta.label: deleted}
+
+        pks = list(queryset.values_list('pk', flat=True))
+        deleted = queryset.filter(pk__in=pks).update(deleted_at=timezone.now())
+        soft_deleted.send(sender=self.model, pks=pks, using=self.db)
+        return deleted, {self.model._meta.label: deleted}
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def hard_delete(self):
+        return super().delete()
+
+    hard_delete.alters_data = True
+    hard_delete.queryset_only = True
+
+    def restore(self) -> int:
+        queryset = self.filter(deleted_at__isnull=False)
+        if not restored.has_listeners(self.model):
+            return queryset.update(deleted_at=None)
+
+        pks = list(queryset.values_list('pk', flat=True))
+        count = queryset.filter(pk__in=pks).update(deleted_at=None)
+        restored.send(sender=self.model, pks=pks, using=self.db)
+        return count
+
+    restore.alters_data = True
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class TrashManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=False)
+
+
+class SoftDeleteModel(models.Model):
+    """
+    Deleted rows are moved to the trash (deleted_at is set) instead of being removed. The default manager, and so
+    the related managers (user.tasks, tag.tasks, ...), only see the rows that aren't in the trash, `trash` only
+    sees the ones that are and `all_objects` sees both.
+    """
+    deleted_at = models.DateTimeField('Deleted at', blank=True, null=True, editable=False)
+
+    objects = SoftDeleteManager()
+    trash = TrashManager()
+    all_objects = models.Manager.from_queryset(SoftDeleteQuerySet)()
+
+    class Meta:
+        abstract = True
+
+    def delete(self, using=None, keep_parents=False):
+        if not get_trash_settings()['ENABLED']:
+            return self.hard_delete(using, keep_parents)
+
+        using = using or router.db_for_write(type(self), instance=self)
+        self.deleted_at = timezone.now()
+        type(self)._base_manager.using(using).filter(pk=self.pk).update(deleted_at=self.deleted_at)
+        soft_deleted.send(sender=type(self), pks=[self.pk], using=using)
+        return 1, {self._meta.label: 1}
+
+    def hard_delete(self, using=None, keep_parents=False):
+        return super().delete(using, keep_parents)
+
+    def restore(self):
+        self.deleted_at = None
+        type(self)._base_manager.filter(pk=self.pk).update(deleted_at=None)
+        restored.send(sender=type(self), pks=[self.pk], using=router.db_for_write(type(self), instance=self))
+
+
+class RowEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()  # DjangoJSONEncoder drops the microseconds
+        return super().default(o)
+
+
+def model_to_row(instance: models.Model) -> dict:
+    """
+    Returns the column values of `instance` (JSON serializable with RowEncoder), see row_to_model.
+    """
+    return {field.attname: field.value_from_object(instance) for field in instance._meta.concrete_fields}
+
+
+def row_to_model(model: Type[models.Model], row: dict) -> models.Model:
+    return model(**{
+        field.attname: field.to_python(row[field.attname])
+        for field in model._meta.concrete_fields if field.attname in row
+    })
+
+
+def insert_rows(instances: List[models.Model], keep: Iterable[str] = ('created_at', 'updated_at')) -> List[models.Model]:
+    """
+    Inserts instances built by row_to_model (ids included) with a single bulk_create, without signals, then puts
+    back the `keep` dates that auto_now and auto_now_add override.
+    """
+    if not instances:
+        return instances
+
+    model, keep = type(instances[0]), list(keep)
+    dates = [[getattr(instance, field) for field in keep] for instance in instances]
+    model._base_manager.bulk_create(instances)
+    for instance, values in zip(instances, dates):
+        for field, value in zip(keep, values):
+            setattr(instance, field, value)
+    model._base_manager.bulk_update(instances, keep)
+    return instances
@@ -12,8 +12,11 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
+from base64 import urlsafe_b64encode
 import environ
+import hashlib
+import hmac
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -54,7 +57,9 @@ INSTALLED_APPS = [
     'task.apps.TaskConfig',
     'step.apps.StepConfig',
     'tag.apps.TagConfig',
-    'contact.apps.ContactConfig'
+    'contact.apps.ContactConfig',
+    'jobs.apps.JobsConfig',
+    'TODO_V2.apps.TodoV2Config',
 ]
 
 MIDDLEWARE = [
@@ -102,14 +107,107 @@ DATABASES = {
 
 # Cache
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django_redis.cache.RedisCache',
-        'LOCATION': env('REDIS_LOCATION'),
+CACHE_SERIALIZERS = {
+    'pickle': 'django_redis.serializers.pickle.PickleSerializer',
+    'json': 'django_redis.serializers.json.JSONSerializer',
+    'msgpack': 'django_redis.serializers.msgpack.MSGPackSerializer',
+}
+
+CACHE_COMPRESSORS = {
+    'none': 'django_redis.compressors.identity.IdentityCompressor',
+    'zlib': 'django_redis.compressors.zlib.ZlibCompressor',
+    'gzip': 'django_redis.compressors.gzip.GzipCompressor',
+    'lzma': 'django_redis.compressors.lzma.LzmaCompressor',
+    'lz4': 'django_redis.compressors.lz4.Lz4Compressor',  # requires lz4
+    'zstd': 'django_redis.compressors.zstd.ZStdCompressor',  # requires pyzstd
+}
+
+CACHE_SERIALIZER = env('CACHE_SERIALIZER', default='pickle')
+CACHE_COMPRESSOR = env('CACHE_COMPRESSOR', default='none')
+
+CACHE_LOCAL_TIER = env.bool('CACHE_LOCAL_TIER', default=False)
+
+
+def redis_cache(alias: str, local_tier: bool = False) -> dict:
+    """
+    Builds a django_redis cache for `alias` with its own connection pool. REDIS_<ALIAS>_LOCATION and
+    CACHE_<ALIAS>_MAX_CONNECTIONS override the shared REDIS_LOCATION and CACHE_MAX_CONNECTIONS.
+    """
+    prefix = alias.upper()
+    pool_kwargs = {
+        'max_connections': env.int(
+            f'CACHE_{prefix}_MAX_CONNECTIONS', default=env.int('CACHE_MAX_CONNECTIONS', default=100)
+        ),
+        'health_check_interval': env.int('CACHE_HEALTH_CHECK_INTERVAL', default=30),
+    }
+    # A blocking pool makes callers wait up to CACHE_POOL_TIMEOUT for a free connection instead of opening new ones
+    if env.bool('CACHE_POOL_BLOCKING', default=False):
+        pool_class = 'redis.connection.BlockingConnectionPool'
+        pool_kwargs['timeout'] = env.float('CACHE_POOL_TIMEOUT', default=2)
+    else:
+        pool_class = 'redis.connection.ConnectionPool'
+
+    return {
+        # TwoTierRedisCache serves hot keys from an in-process LRU and invalidates it through Redis pub/sub
+        'BACKEND': (
+            'TODO_V2.cache_backends.TwoTierRedisCache' if local_tier and CACHE_LOCAL_TIER
+            else 'django_redis.cache.RedisCache'
+        ),
+        'LOCATION': env(f'REDIS_{prefix}_LOCATION', default=env('REDIS_LOCATION')),
+        # Values written with one codec can't be read with another, so each codec gets its own key space
+        'KEY_PREFIX': (
+            '' if (CACHE_SERIALIZER, CACHE_COMPRESSOR) == ('pickle', 'none')
+            else f'{CACHE_SERIALIZER}.{CACHE_COMPRESSOR}'
+        ),
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'SERIALIZER': CACHE_SERIALIZERS[CACHE_SERIALIZER],
+            'COMPRESSOR': 'TODO_V2.cache_backends.ThresholdCompressor',
+            'COMPRESSOR_CLASS': CACHE_COMPRESSORS[CACHE_COMPRESSOR],
+            'COMPRESS_MIN_LENGTH': env.int('CACHE_COMPRESS_MIN_LENGTH', default=256),
+            'CONNECTION_FACTORY': 'TODO_V2.cache_backends.NamedPoolConnectionFactory',
+            'CONNECTION_POOL_NAME': alias,
+            'CONNECTION_POOL_CLASS': pool_class,
+            'CONNECTION_POOL_KWARGS': pool_kwargs,
+            'SOCKET_CONNECT_TIMEOUT': env.float('CACHE_SOCKET_CONNECT_TIMEOUT', default=5),
+            'SOCKET_TIMEOUT': env.float('CACHE_SOCKET_TIMEOUT', default=5),
+            'LOCAL_CACHE': {
+                'MAX_ENTRIES': env.int('CACHE_LOCAL_MAX_ENTRIES', default=1024),
+                'TIMEOUT': env.int('CACHE_LOCAL_TIMEOUT', default=5),
+                'CHANNEL': f'cache-invalidation-{alias}',
+            },
         }
     }
+
+
+# Every workload has its own alias (and connection pool) so it can be moved to its own Redis server.
+# Recommended maxmemory-policy for dedicated servers:
+#   otp       -> noeviction     (an evicted OTP means a failed login)
+#   throttle  -> volatile-ttl   (every key has a TTL, the ones closest to expiring matter least)
+#   responses -> allkeys-lru    (fragments and single-flight entries can always be rebuilt)
+CACHES = {
+    'default': redis_cache('default', local_tier=True),
+    'otp': redis_cache('otp'),
+    'throttle': redis_cache('throttle'),
+    'responses': redis_cache('responses', local_tier=True),
+}
+
+# Fragment cache (per-row rendered representations of tasks and steps)
+
+FRAGMENT_CACHE_SETTINGS = {
+    'CACHE_ALIAS': 'responses',
+    'ENABLED': env.bool('FRAGMENT_CACHE_ENABLED', default=True),
+    'TIMEOUT': timedelta(hours=6),
+}
+
+# Single-flight recomputation of expensive cached values
+
+SINGLE_FLIGHT_SETTINGS = {
+    'CACHE_ALIAS': 'responses',
+    'LOCK_TIMEOUT': timedelta(seconds=10),
+    'WAIT_TIMEOUT': timedelta(seconds=2),
+    'STALE_TIMEOUT': timedelta(minutes=5),
+    'BETA': 1.0,
 }
 
 # Password validation
@@ -164,13 +262,14 @@ AUTH_USER_MODEL = 'user.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_THROTTLE_CLASSES': (
-        'rest_framework.throttling.ScopedRateThrottle',
+        'TODO_V2.throttling.SlidingWindowRateThrottle',
+        'TODO_V2.throttling.CostBudgetThrottle',
     ),
     'DEFAULT_THROTTLE_RATES': {
         'auth': '5/min',
@@ -181,10 +280,19 @@ REST_FRAMEWORK = {
         'steps': '30/min',
         'tags': '20/min',
         'contacts': '10/min',
+        'batch': '10/min',
     },
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Per user budgets charged by the rows every request returns (plus one for the request itself)
+THROTTLE_COST_BUDGETS = {
+    'tasks': '20000/hour',
+    'steps': '20000/hour',
+    'tags': '10000/hour',
+    'contacts': '10000/hour',
+}
+
 # JWT
 
 SIMPLE_JWT = {
@@ -238,15 +346,120 @@ LOGGING = {
 
 # Cryptography
 
-CIPHER = Fernet(Fernet.generate_key())
+# Comma separated Fernet keys, newest first (see `manage.py cipher_keys`). New values are encrypted with the first
+# key and any key in the ring can decrypt, so keys can be rotated without breaking values encrypted by other workers.
+CIPHER_KEYS = env.list('CIPHER_KEYS', default=[])
+
+# Without CIPHER_KEYS the key is derived from SECRET_KEY, so every worker and node shares it but it can't be rotated
+# without making the encrypted values (e.g. queued SMS) unreadable (checked on startup)
+CIPHER = MultiFernet(
+    [Fernet(key) for key in CIPHER_KEYS]
+    or [Fernet(urlsafe_b64encode(hmac.new(SECRET_KEY.encode(), b'TODO_V2.CIPHER', hashlib.sha256).digest()))]
+)
 
 # OTP
 
 OTP_SETTINGS = {
+    'CACHE_ALIAS': 'otp',
     'DIGITS': 4,
     'EXPIRATION_TIME': timedelta(minutes=2),
 }
 
+# Users authenticated by JWTAuthentication are loaded from this cache instead of the database
+
+USER_CACHE_SETTINGS = {
+    'CACHE_ALIAS': 'default',
+    'ENABLED': env.bool('USER_CACHE_ENABLED', default=True),
+    'TIMEOUT': timedelta(minutes=5),
+}
+
+# Job queue (run by "manage.py run_jobs")
+
+JOB_QUEUE_SETTINGS = {
+    'BATCH_SIZE': 10,
+    'CONCURRENCY': env.int('JOB_CONCURRENCY', default=4),  # jobs run in parallel per worker
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': timedelta(seconds=10),  # doubled after every failed attempt
+    'LEASE_TIME': timedelta(minutes=5),  # jobs running for longer are considered lost and run again
+}
+
+# Periodic jobs (run by "manage.py run_scheduler", on any number of nodes)
+
+SCHEDULER_SETTINGS = {
+    'CACHE_ALIAS': 'default',
+    'LOCK_TIMEOUT': timedelta(hours=1),  # a job running for longer may be started again by another node
+    'JOBS': {
+        'purge_tokens': {
+            'function': 'user.tokens.purge_expired_tokens',
+            'interval': timedelta(days=1),
+        },
+        'purge_finished_jobs': {
+            'function': 'jobs.queue.purge_finished_jobs',
+            'interval': timedelta(hours=1),
+            'kwargs': {'older_than': timedelta(days=7)},
+        },
+        'purge_trash': {
+            'function': 'TODO_V2.trash.purge_trash',
+            'interval': timedelta(hours=1),
+        },
+        'compact_steps': {
+            'function': 'step.compaction.compact_steps',
+            'interval': timedelta(days=1),
+        },
+        'archive_tasks': {
+            'function': 'task.archive.archive_tasks',
+            'interval': timedelta(days=1),
+        },
+        'remove_orphan_profiles': {
+            'function': 'contact.jobs.remove_orphan_profiles',
+            'interval': timedelta(days=1),
+        },
+    },
+}
+
+# Trash (deleted tasks and contacts can be restored until they are purged by the "purge_trash" periodic job)
+
+TRASH_SETTINGS = {
+    'ENABLED': env.bool('SOFT_DELETE', default=True),  # off: tasks and contacts are deleted right away
+    'RETENTION': timedelta(days=30),
+    'BATCH_SIZE': 500,  # rows purged per transaction
+}
+
+# Task archiving (applied by the "archive_tasks" periodic job, None turns a step off)
+
+TASK_ARCHIVE_SETTINGS = {
+    'ARCHIVE_AFTER': timedelta(days=30),  # done tasks are archived after
+    'OFFLOAD_AFTER': timedelta(days=180),  # archived tasks are moved to cold storage after
+    'BATCH_SIZE': 500,
+}
+
+# Step compaction (applied by the "compact_steps" periodic job)
+
+STEP_COMPACTION_SETTINGS = {
+    'COMPACT_AFTER': timedelta(days=30),  # steps of tasks done for longer are moved to Task.compacted_steps
+    'BATCH_SIZE': 500,
+}
+
+# Change events (pushed to clients by the "api/v2/events/" server-sent events stream, serve it under ASGI)
+
+EVENT_SETTINGS = {
+    'CACHE_ALIAS': 'default',
+    'HISTORY_SIZE': 1000,  # events kept per user for Last-Event-ID resumes
+    'HISTORY_TIMEOUT': timedelta(hours=1),
+    'KEEPALIVE': 15,  # seconds between two keepalive comments on an idle stream
+}
+
+# SMS outbox (sent by "manage.py process_sms_outbox")
+
+SMS_SETTINGS = {
+    'GATEWAY': env('SMS_GATEWAY', default='user.sms.ConsoleGateway'),
+    'BATCH_SIZE': env.int('SMS_BATCH_SIZE', default=50),
+    'CONCURRENCY': env.int('SMS_CONCURRENCY', default=4),  # gateway requests in flight per worker
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': timedelta(seconds=5),  # doubled after every failed attempt
+    'LEASE_TIME': timedelta(seconds=30),
+}
+
 # DRF Spectacular
 
 SPECTACULAR_SETTINGS = {
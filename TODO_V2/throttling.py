@@ -0,0 +1,159 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from rest_framework import throttling
+
+
+# Sliding window counter: the request count of the previous window is weighted by how much of it still overlaps
+# the sliding window. State is a single hash (window index and both counts) so memory is constant per key, and
+# the clock is Redis' own so every node sees the same windows.
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local current = math.floor(now / window)
+
+local state = redis.call('HMGET', KEYS[1], 'window', 'previous', 'current')
+local stored_window = tonumber(state[1])
+local previous_count, current_count = 0, 0
+if stored_window == current then
+    previous_count, current_count = tonumber(state[2]), tonumber(state[3])
+elseif stored_window == current - 1 then
+    previous_count = tonumber(state[3])
+end
+
+local elapsed = now - current * window
+if previous_count * (window - elapsed) / window + current_count + 1 > limit then
+    local wait = window - elapsed
+    if previous_count > 0 and current_count + 1 <= limit then
+        -- When previous_count * (window - elapsed) / window + current_count + 1 drops to the limit
+        wait = math.ceil(window - (limit - current_count - 1) * window / previous_count) - elapsed
+    end
+    return {0, wait}
+end
+
+redis.call('HSET', KEYS[1], 'window', current, 'previous', previous_count, 'current', current_count + 1)
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return {1, 0}
+"""
+
+
+def is_batch_operation(request) -> bool:
+    # Operations of a batch request (see BatchView) only count against the "batch" scope
+    return getattr(request, 'batch_operation', False)
+
+
+class ScopedRateThrottle(throttling.ScopedRateThrottle):
+    """
+    DRF's ScopedRateThrottle keeping its request history in the "throttle" cache alias instead of "default".
+    """
+    cache = ConnectionProxy(caches, 'throttle')
+
+    def allow_request(self, request, view):
+        if is_batch_operation(request):
+            return True
+        return super().allow_request(request, view)
+
+
+class SlidingWindowRateThrottle(ScopedRateThrottle):
+    """
+    ScopedRateThrottle counting the requests of each scope with a sliding window in a single atomic Redis script,
+    instead of reading, trimming and rewriting the list of request timestamps on every request.
+    """
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope or is_batch_operation(request):
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        client = self.cache.client.get_client(write=True)
+        allowed, self._wait = client.register_script(SLIDING_WINDOW_SCRIPT)(
+            keys=[self.cache.make_key(self.key)],
+            args=[self.num_requests, self.duration * 1000],
+        )
+        return bool(allowed)
+
+    def wait(self):
+        return self._wait / 1000
+
+
+# Token bucket refilled continuously at `capacity` per `period`. The balance may go negative: an expensive request
+# is always served once allowed, and the debt blocks the client until the bucket refills past zero.
+COST_BUDGET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'balance', 'updated_at')
+local balance = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+balance = math.min(capacity, balance + (now - updated_at) * capacity / period) - cost
+
+redis.call('HSET', KEYS[1], 'balance', balance, 'updated_at', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - balance) * period / capacity) + 1)
+
+local wait = 0
+if balance <= 0 then
+    wait = math.ceil((1 - balance) * period / capacity)
+end
+return {math.floor(balance), wait}
+"""
+
+
+class CostBudgetThrottle(ScopedRateThrottle):
+    """
+    Charges every request of a scope listed in THROTTLE_COST_BUDGETS by the work it did (the rows it returned by
+    default, see CostBudgetMixin) against a per-user budget, e.g. {'tasks': '20000/hour'}. Requests are refused
+    while the budget is exhausted, so a few heavy clients can't starve the light ones.
+
+    The cost is only known once the view has run, so this class only checks the budget, charging is done by
+    CostBudgetMixin.finalize_response.
+    """
+    cache_format = 'throttle_cost_%(scope)s_%(ident)s'
+
+    def get_rate(self):
+        return getattr(settings, 'THROTTLE_COST_BUDGETS', {}).get(self.scope)
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        request.cost_budget_throttle = self
+        return self.charge(0) > 0
+
+    def charge(self, cost: int) -> int:
+        """
+        Charges `cost` to the budget and returns the remaining balance.
+        """
+        client = self.cache.client.get_client(write=True)
+        self.balance, self._wait = client.register_script(COST_BUDGET_SCRIPT)(
+            keys=[self.cache.make_key(self.key)],
+            args=[self.num_requests, self.duration * 1000, cost],
+        )
+        return self.balance
+
+    def wait(self):
+        return self._wait / 1000
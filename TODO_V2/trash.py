@@ -0,0 +1,42 @@
+from datetime import timedelta
+from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
+from typing import Dict
+from .models import SoftDeleteModel, get_trash_settings
+from time import sleep
+
+
+def purge_trash(older_than: timedelta = None, batch_size: int = None, pause: float = 0) -> Dict[str, int]:
+    """
+    Deletes for good the rows that have been in the trash for longer than `older_than` (defaults to
+    TRASH_SETTINGS["RETENTION"]), with their cascades, `batch_size` rows at a time, each chunk in its own short
+    transaction. Returns the number of purged rows per model.
+    """
+    trash_settings = get_trash_settings()
+    batch_size = batch_size or trash_settings['BATCH_SIZE']
+    if older_than is None:
+        older_than = timedelta(seconds=trash_settings['RETENTION'])
+    deleted_before = timezone.now() - older_than
+
+    purged = {}
+    for model in apps.get_models():
+        if not issubclass(model, SoftDeleteModel):
+            continue
+
+        purged[model._meta.label] = 0
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    model.trash.filter(deleted_at__lte=deleted_before)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                model.all_objects.filter(pk__in=ids).hard_delete()
+            purged[model._meta.label] += len(ids)
+            if pause:
+                sleep(pause)
+
+    return purged
@@ -19,6 +19,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from TODO_V2.views import BatchView, EventStreamView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -29,6 +30,8 @@ urlpatterns = [
     path('api/v2/steps/', include('step.urls', namespace='step')),
     path('api/v2/tags/', include('tag.urls', namespace='tag')),
     path('api/v2/contacts/', include('contact.urls', namespace='contact')),
+    path('api/v2/batch/', BatchView.as_view(), name='batch'),
+    path('api/v2/events/', EventStreamView.as_view(), name='events'),
 ]
 
 if settings.DEBUG:
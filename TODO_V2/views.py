@@ -0,0 +1,249 @@
+from asgiref.sync import sync_to_async
+from contextlib import nullcontext
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.urls import resolve, Resolver404
+from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiExample, OpenApiResponse
+from io import BytesIO
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from urllib.parse import urlencode
+from TODO_V2.events import event_stream
+from TODO_V2.mixins import ResponseBuilderMixin
+from user.views import AUTHENTICATION_REQUIRED, UNAUTHORIZED_RESPONSE, TOO_MANY_REQUESTS_RESPONSE
+import json
+
+
+BATCH_METHODS = ('GET', 'POST', 'PATCH', 'DELETE')
+
+
+class RollbackBatch(Exception):
+    pass
+
+
+def get_batch_settings() -> dict:
+    batch_settings = {
+        'MAX_OPERATIONS': 50,
+        'NAMESPACES': ('task', 'step', 'tag', 'contact'),
+    }
+    batch_settings.update(getattr(settings, 'BATCH_SETTINGS', {}))
+    return batch_settings
+
+
+@extend_schema_view(
+    post=extend_schema(
+        tags=['Batch'],
+        summary='Batch operations',
+        description='Run an ordered list of task, step, tag and contact operations in a single request. '
+                    'With "atomic" (the default) they run in one transaction, which is rolled back and the remaining '
+                    'operations skipped as soon as one fails. Otherwise every operation is committed on its own. '
+                    'A batch only counts against the "batch" rate limit, not those of the endpoints it calls.'
+                    + AUTHENTICATION_REQUIRED,
+        request={
+            'application/json': {
+                'type': 'object',
+                'properties': {
+                    'atomic': {'type': 'boolean', 'example': True},
+                    'operations': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'method': {'type': 'string', 'enum': list(BATCH_METHODS)},
+                                'path': {'type': 'string', 'example': '/api/v2/tasks/'},
+                                'body': {'type': 'object', 'description': 'Request data (query parameters for GET)'},
+                            },
+                            'required': ['method', 'path'],
+                        }
+                    }
+                },
+                'required': ['operations'],
+                'examples': {
+                    'Create and complete a task': {
+                        'value': {
+                            'atomic': True,
+                            'operations': [
+                                {'method': 'POST', 'path': '/api/v2/tasks/', 'body': {'title': 'Task'}},
+                                {'method': 'PATCH', 'path': '/api/v2/tasks/', 'body': {'task_id': 1, 'is_done': True}},
+                            ]
+                        }
+                    }
+                }
+            }
+        },
+        responses={
+            200: OpenApiResponse(
+                description='Operations executed',
+                response=dict,
+                examples=[
+                    OpenApiExample(
+                        'Success Response',
+                        value={
+                            'message': 'Success',
+                            'committed': True,
+                            'results': [
+                                {'status': 201, 'body': {'message': 'Task created', 'task': {'id': 1}}},
+                                {'status': 200, 'body': {'message': 'Task updated', 'task': {'id': 1}}},
+                            ]
+                        }
+                    )
+                ]
+            ),
+            400: OpenApiResponse(
+                description='Invalid batch or atomic batch rolled back',
+                response=dict,
+                examples=[
+                    OpenApiExample(
+                        'Rolled back',
+                        value={
+                            'message': 'Operation 1 failed, no changes were saved',
+                            'committed': False,
+                            'results': [
+                                {'status': 201, 'body': {'message': 'Task created', 'task': {'id': 1}}},
+                                {'status': 404, 'body': {'message': 'Task not found'}},
+                            ]
+                        }
+                    ),
+                    OpenApiExample(
+                        'Invalid operations',
+                        value={
+                            'operations': 'this field is required.'
+                        }
+                    ),
+                ]
+            ),
+            401: UNAUTHORIZED_RESPONSE,
+            429: TOO_MANY_REQUESTS_RESPONSE,
+        }
+    )
+)
+class BatchView(APIView, ResponseBuilderMixin):
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'batch'
+
+    def post(self, request):
+        batch_settings = get_batch_settings()
+        operations = request.data.get('operations')
+        atomic = request.data.get('atomic', True)
+
+        if not isinstance(operations, list) or not operations:
+            return self.build_response(
+                response_status=status.HTTP_400_BAD_REQUEST,
+                operations='this field is required.',
+            )
+        if not isinstance(atomic, bool):
+            return self.build_response(
+                response_status=status.HTTP_400_BAD_REQUEST,
+                atomic='must be a boolean.',
+            )
+        if len(operations) > batch_settings['MAX_OPERATIONS']:
+            return self.build_response(
+                response_status=status.HTTP_400_BAD_REQUEST,
+                operations=f'at most {batch_settings["MAX_OPERATIONS"]} operations are allowed.',
+            )
+        for operation in operations:
+            if not isinstance(operation, dict) or not isinstance(operation.get('path'), str) \
+                    or str(operation.get('method', '')).upper() not in BATCH_METHODS \
+                    or not isinstance(operation.get('body', {}), dict):
+                return self.build_response(
+                    response_status=status.HTTP_400_BAD_REQUEST,
+                    operations=f'every operation needs a "method" ({", ".join(BATCH_METHODS)}), '
+                               f'a "path" and an optional "body" object.',
+                )
+
+        results = []
+        try:
+            with transaction.atomic() if atomic else nullcontext():
+                for operation in operations:
+                    results.append(self.run_operation(request, operation, batch_settings['NAMESPACES']))
+                    if atomic and results[-1]['status'] >= 400:
+                        raise RollbackBatch
+        except RollbackBatch:
+            return self.build_response(
+                response_status=status.HTTP_400_BAD_REQUEST,
+                message=f'Operation {len(results) - 1} failed, no changes were saved',
+                committed=False,
+                results=results,
+            )
+
+        return self.build_response(
+            response_status=status.HTTP_200_OK,
+            message='Success',
+            committed=True,
+            results=results,
+        )
+
+    def run_operation(self, request, operation: dict, namespaces) -> dict:
+        """
+        Dispatches `operation` to the view of its path, as the already authenticated user.
+        """
+        try:
+            match = resolve(operation['path'])
+        except Resolver404:
+            return {'status': status.HTTP_404_NOT_FOUND, 'body': {'message': 'Not found'}}
+        if match.namespace not in namespaces:
+            return {'status': status.HTTP_400_BAD_REQUEST, 'body': {'message': 'Operation not allowed in a batch'}}
+
+        response = match.func(self.build_request(request, operation), *match.args, **match.kwargs)
+        return {'status': response.status_code, 'body': response.data}
+
+    def build_request(self, request, operation: dict) -> WSGIRequest:
+        method = operation['method'].upper()
+        body = operation.get('body', {})
+        payload = b'' if method == 'GET' else json.dumps(body).encode()
+
+        environ = request.META.copy()
+        environ.pop('HTTP_IDEMPOTENCY_KEY', None)  # Belongs to the batch, not to its operations
+        environ.update({
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': operation['path'],
+            'QUERY_STRING': urlencode(body, doseq=True) if method == 'GET' else '',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(payload)),
+            'wsgi.input': BytesIO(payload),
+        })
+        sub_request = WSGIRequest(environ)
+
+        # Authenticated and rate limited once for the whole batch, the cost budgets are still charged
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        sub_request.batch_operation = True
+        return sub_request
+
+
+class EventStreamView(View):
+    """
+    Server-sent events stream of the changes to the tasks, steps, tags and contacts of the authenticated user,
+    see TODO_V2.events. An async view, so under ASGI an open stream doesn't hold a worker thread.
+
+    Events are {"model", "action", "ids"} (e.g. "task.updated"), clients fetch the rows they need. EventSource
+    sends the id of the last event it got in Last-Event-ID when it reconnects, the missed events are sent first.
+    """
+    async def get(self, request):
+        try:
+            user = await sync_to_async(self.authenticate)(request)
+        except APIException as e:
+            return JsonResponse({'detail': e.detail}, status=e.status_code)
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        response = StreamingHttpResponse(event_stream(user.id, last_event_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Or nginx buffers the events
+        return response
+
+    def authenticate(self, request):
+        # With the API's authentication classes (the stream isn't a DRF view)
+        user = Request(
+            request, authenticators=[authentication() for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        ).user
+        if not user.is_authenticated:
+            raise NotAuthenticated()
+        return user
@@ -5,8 +5,19 @@ from .models import Contact
 @admin.register(Contact)
 class ContactAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'user', 'created_at', 'updated_at')
-    list_filter = ('user', 'tasks', 'created_at', 'updated_at')
+    list_filter = ('user', 'tasks', 'created_at', 'updated_at', 'deleted_at')
     readonly_fields = ('id', 'created_at', 'updated_at')
     search_fields = ('id', 'name', 'user__name')
     ordering = ('-created_at',)
+    actions = ('restore',)
+
+    def get_queryset(self, request):
+        # Contacts in the trash are listed too (filter by "Deleted at"), so they can be restored
+        queryset = Contact.all_objects.all()
+        ordering = self.get_ordering(request)
+        return queryset.order_by(*ordering) if ordering else queryset
+
+    @admin.action(description='Restore selected contacts from the trash')
+    def restore(self, request, queryset):
+        queryset.restore()
 
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ContactConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'contact'
+
+    def ready(self):
+        import contact.signals
@@ -0,0 +1,39 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from jobs.queue import job
+import os
+
+
+@job
+def remove_profile(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:  # Already removed by a previous attempt
+        pass
+
+
+def remove_orphan_profiles(older_than: timedelta = timedelta(days=1)) -> int:
+    """
+    Removes the contact profile pictures no contact refers to anymore (e.g. left behind by a failed upload or a
+    contact deleted before its removal job was queued). Recent files are kept as they may belong to a contact
+    being saved. Returns the number of removed files.
+    """
+    from .models import Contact
+
+    directory = os.path.join(settings.MEDIA_ROOT, 'Profiles')
+    if not os.path.isdir(directory):
+        return 0
+
+    # Contacts in the trash keep their picture until they're purged, in case they're restored
+    referenced = set(Contact.all_objects.exclude(profile='').values_list('profile', flat=True))
+    cutoff = (timezone.now() - older_than).timestamp()
+    removed = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file() or f'Profiles/{entry.name}' in referenced or entry.stat().st_mtime > cutoff:
+                continue
+            remove_profile(entry.path)
+            removed += 1
+
+    return removed
@@ -1,8 +1,8 @@
 from django.db import models
+from TODO_V2.models import SoftDeleteModel, VersionedModel
 from user.models import User
 from task.models import Task
 from django.core.exceptions import ValidationError
-import os
 
 
 def profile_size_validator(value):
@@ -12,11 +12,14 @@ def profile_size_validator(value):
         raise ValidationError('Profile picture must be less than 3MB.')
 
 
-class Contact(models.Model):
+class Contact(VersionedModel, SoftDeleteModel):
     class Meta:
         verbose_name = 'Contact'
         verbose_name_plural = 'Contacts'
         ordering = ('-created_at',)
+        indexes = [
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False), name='contact_trash_idx'),
+        ]
 
     name = models.CharField('Name', max_length=60)
     profile = models.ImageField('Profile Picture', upload_to='Profiles', default='default.png', validators=[profile_size_validator], blank=True)
@@ -29,8 +32,3 @@ class Contact(models.Model):
 
     def __str__(self):
         return self.name
-
-    def delete(self, *args, **kwargs):
-        if self.profile and self.profile.name != 'default.png':
-            os.remove(self.profile.path)
-        return super().delete(*args, **kwargs)
@@ -6,4 +6,4 @@ class ContactSerializer(ModelSerializer):
     class Meta:
         model = Contact
         fields = '__all__'
-        read_only_fields = ('id', 'user', 'tasks', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'user', 'tasks', 'created_at', 'updated_at', 'version')
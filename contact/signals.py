@@ -0,0 +1,11 @@
+from django.dispatch.dispatcher import receiver
+from django.db.models.signals import post_delete
+from .jobs import remove_profile
+from .models import Contact
+
+
+@receiver(post_delete, sender=Contact)
+def contact_profile_removal(sender, instance: Contact, **kwargs):
+    # Only sent once the contact is deleted for good (purged from the trash or deleted with its user)
+    if instance.profile and instance.profile.name != 'default.png':
+        remove_profile.delay(instance.profile.path)
@@ -6,4 +6,5 @@ app_name = 'contact'
 
 urlpatterns = [
     path('', views.ContactAPI.as_view(), name='contact-endpoints'),
+    path('restore/', views.ContactRestoreAPI.as_view(), name='contact-restore'),
 ]
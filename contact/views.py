@@ -1,6 +1,8 @@
 from rest_framework.views import APIView
 from rest_framework import status
-from TODO_V2.mixins import GetDataMixin, ResponseBuilderMixin
+from TODO_V2.mixins import CostBudgetMixin, GetDataMixin, ResponseBuilderMixin
+from TODO_V2.idempotency import idempotent
+from TODO_V2.models import VersionConflict
 from drf_spectacular.utils import (
     extend_schema, extend_schema_view, OpenApiResponse, OpenApiParameter, OpenApiExample
 )
@@ -638,7 +640,7 @@ from user.views import AUTHENTICATION_REQUIRED, UNAUTHORIZED_RESPONSE, TOO_MANY_
     delete=extend_schema(
         tags=['Contacts'],
         summary='Delete contact(s)',
-        description='Delete contacts in 3 modes:\n\n1-Single contact by ID\n\n2-Multiple contacts by comma-separated IDs\n\n3-All contacts connected to authenticated user' + AUTHENTICATION_REQUIRED,
+        description='Delete contacts in 3 modes:\n\n1-Single contact by ID\n\n2-Multiple contacts by comma-separated IDs\n\n3-All contacts connected to authenticated user\n\nDeleted contacts are moved to the trash and can be restored until they are purged' + AUTHENTICATION_REQUIRED,
 
         parameters=[
             OpenApiParameter(
@@ -770,7 +772,7 @@ from user.views import AUTHENTICATION_REQUIRED, UNAUTHORIZED_RESPONSE, TOO_MANY_
     )
 
 )
-class ContactAPI(APIView, GetDataMixin, ResponseBuilderMixin):
+class ContactAPI(CostBudgetMixin, APIView, GetDataMixin, ResponseBuilderMixin):
     permission_classes = (IsAuthenticated,)
     throttle_scope = 'contacts'
 
@@ -855,6 +857,7 @@ class ContactAPI(APIView, GetDataMixin, ResponseBuilderMixin):
             message='Invalid "selector" parameter'
         )
 
+    @idempotent
     def post(self, request):
         try:
             action = self.get_data(request, 'action')['action']
@@ -956,6 +959,7 @@ class ContactAPI(APIView, GetDataMixin, ResponseBuilderMixin):
                 raise ValidationError({'contact_id': 'Invalid contact ID'})
 
             contact = request.user.contacts.get(id=contact_id)
+            contact.expected_version = self.get_expected_version(request)
         except ValidationError as e:
             return self.build_response(
                 status.HTTP_400_BAD_REQUEST,
@@ -975,7 +979,13 @@ class ContactAPI(APIView, GetDataMixin, ResponseBuilderMixin):
                 **serializer.errors
             )
 
-        serializer.save()
+        try:
+            serializer.save()
+        except VersionConflict:
+            return self.build_response(
+                status.HTTP_412_PRECONDITION_FAILED,
+                message='Contact was modified by another request'
+            )
 
         return self.build_response(
             status.HTTP_200_OK,
@@ -1009,32 +1019,28 @@ class ContactAPI(APIView, GetDataMixin, ResponseBuilderMixin):
         if ',' in selector:
             ids = filter(self.is_id, selector.split(','))
 
-            contacts = request.user.contacts.filter(id__in=ids)
+            to_delete, _ = request.user.contacts.filter(id__in=ids).delete()
 
-            if not contacts.exists():
+            if not to_delete:
                 return self.build_response(
                     status.HTTP_404_NOT_FOUND,
                     message='No contact was found to delete'
                 )
 
-            to_delete = contacts.count()
-            contacts.delete()
             return self.build_response(
                 status.HTTP_200_OK,
                 message=f'Deleted {to_delete} contact(s) successfully'
             )
 
         if selector == 'all':
-            contacts = request.user.contacts.all()
+            to_delete, _ = request.user.contacts.all().delete()
 
-            if not contacts.exists():
+            if not to_delete:
                 return self.build_response(
                     status.HTTP_404_NOT_FOUND,
                     message='You have no contacts to delete'
                 )
 
-            to_delete = contacts.count()
-            contacts.delete()
             return self.build_response(
                 status.HTTP_200_OK,
                 message=f'Deleted {to_delete} contact(s) successfully'
@@ -1044,3 +1050,122 @@ class ContactAPI(APIView, GetDataMixin, ResponseBuilderMixin):
             status.HTTP_400_BAD_REQUEST,
             message='Invalid "selector" parameter'
         )
+
+
+@extend_schema(
+    tags=['Contacts'],
+    summary='Restore deleted contact(s)',
+    description='Restore contacts from the trash in 3 modes:\n\n1-Single contact by ID\n\n2-Multiple contacts by comma-separated IDs\n\n3-All deleted contacts with "all" keyword\n\nContacts are purged from the trash once TRASH_SETTINGS["RETENTION"] is over' + AUTHENTICATION_REQUIRED,
+
+    request={
+        'application/json': {
+            'type': 'object',
+            'properties': {
+                'selector': {
+                    'type': 'string',
+                    'example': '1',
+                    'description': 'Contact ID, comma-separated contact IDs or "all"'
+                }
+            },
+            'required': ['selector'],
+            'examples': {
+                'Single contact': {
+                    'value': {
+                        'selector': '1'
+                    }
+                },
+                'Multiple contacts': {
+                    'value': {
+                        'selector': '1,2,3'
+                    }
+                },
+                'All deleted contacts': {
+                    'value': {
+                        'selector': 'all'
+                    }
+                },
+            }
+        }
+    },
+
+    responses={
+        200: OpenApiResponse(
+            description='Contact(s) restored successfully',
+            response=dict,
+            examples=[
+                OpenApiExample(
+                    'Contacts restored',
+                    value={
+                        'message': 'Restored <NUMBER_RESTORED_CONTACTS> contact(s) successfully'
+                    }
+                )
+            ]
+        ),
+        400: OpenApiResponse(
+            description='Bad request',
+            response=dict,
+            examples=[
+                OpenApiExample(
+                    'No selector was provided',
+                    value={
+                        'selector': 'this field is required'
+                    }
+                ),
+                OpenApiExample(
+                    'Invalid selector',
+                    value={
+                        'message': 'Invalid "selector" parameter'
+                    }
+                )
+            ]
+        ),
+        404: OpenApiResponse(
+            description='Contact not found in the trash',
+            response=dict,
+            examples=[
+                OpenApiExample(
+                    'Contact not found',
+                    value={
+                        'message': 'No deleted contact was found to restore'
+                    }
+                )
+            ]
+        ),
+        401: UNAUTHORIZED_RESPONSE,
+        429: TOO_MANY_REQUESTS_RESPONSE
+    }
+)
+class ContactRestoreAPI(CostBudgetMixin, APIView, GetDataMixin, ResponseBuilderMixin):
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'contacts'
+
+    def post(self, request):
+        try:
+            selector = self.get_data(request, 'selector')['selector']
+        except ValidationError as e:
+            return self.build_response(
+                status.HTTP_400_BAD_REQUEST,
+                **e.detail
+            )
+
+        contacts = Contact.trash.filter(user=request.user)
+        if self.is_id(selector):
+            contacts = contacts.filter(id=selector)
+        elif ',' in selector:
+            contacts = contacts.filter(id__in=filter(self.is_id, selector.split(',')))
+        elif selector != 'all':
+            return self.build_response(
+                status.HTTP_400_BAD_REQUEST,
+                message='Invalid "selector" parameter'
+            )
+
+        restored = contacts.restore()
+        if not restored:
+            return self.build_response(
+                status.HTTP_404_NOT_FOUND,
+                message='No deleted contact was found to restore'
+            )
+        return self.build_response(
+            status.HTTP_200_OK,
+            message=f'Restored {restored} contact(s) successfully'
+        )
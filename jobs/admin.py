@@ -0,0 +1,27 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Job, PeriodicJob
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'queue', 'status', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'queue']
+    search_fields = ['name']
+    readonly_fields = ['attempts', 'last_error', 'created_at', 'locked_until', 'started_at', 'finished_at']
+    actions = ['retry']
+
+    @admin.action(description='Retry selected jobs')
+    def retry(self, request, queryset):
+        queryset.filter(status=Job.FAILED).update(status=Job.QUEUED, attempts=0, run_at=timezone.now())
+
+
+@admin.register(PeriodicJob)
+class PeriodicJobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'last_status', 'last_run_at', 'last_duration', 'next_run_at', 'run_count']
+    readonly_fields = ['name', 'last_run_at', 'last_duration', 'last_status', 'last_error', 'run_count']
+    actions = ['run_now']
+
+    @admin.action(description='Run on the next scheduler tick')
+    def run_now(self, request, queryset):
+        queryset.update(next_run_at=timezone.now())
@@ -0,0 +1,30 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from jobs.models import PeriodicJob
+from jobs.queue import job_metrics
+
+
+class Command(BaseCommand):
+    help = 'Prints the job queue metrics (jobs per queue and status, lag, throughput and run time) and the last run of the periodic jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=60, help='window of the throughput and run time metrics')
+
+    def handle(self, *args, **options):
+        metrics = job_metrics(timedelta(minutes=options['minutes']))
+
+        for queue, counts in metrics['counts'].items():
+            self.stdout.write(f'{queue}: ' + ', '.join(f'{status} {count}' for status, count in counts.items()))
+        self.stdout.write(f'lag: {metrics["lag"]:.1f}s')
+        self.stdout.write(
+            f'last {options["minutes"]} minutes: done {metrics["done"]}, failed {metrics["failed"]}, '
+            f'run time avg {metrics["average_run_time"]:.3f}s max {metrics["max_run_time"]:.3f}s'
+        )
+
+        for periodic_job in PeriodicJob.objects.all():
+            self.stdout.write(
+                f'{periodic_job.name}: last run {periodic_job.last_run_at:%Y-%m-%d %H:%M:%S} '
+                f'({periodic_job.last_status}, {periodic_job.last_duration:.3f}s), '
+                f'next run {periodic_job.next_run_at:%Y-%m-%d %H:%M:%S}'
+                if periodic_job.last_run_at else f'{periodic_job.name}: never run'
+            )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from jobs.queue import run_jobs
+from time import sleep
+
+
+class Command(BaseCommand):
+    help = 'Runs the jobs of the Postgres job queue, run as many workers as needed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queues', nargs='+', default=['default'], help='queues to take jobs from')
+        parser.add_argument('--concurrency', type=int, help='jobs run in parallel, defaults to JOB_QUEUE_SETTINGS["CONCURRENCY"]')
+        parser.add_argument('--batch-size', type=int, help='defaults to JOB_QUEUE_SETTINGS["BATCH_SIZE"]')
+        parser.add_argument('--interval', type=float, default=1, help='seconds to wait when there is no due job')
+        parser.add_argument('--once', action='store_true', help='run a single batch and exit')
+
+    def handle(self, *args, **options):
+        for option in ('concurrency', 'batch_size'):
+            if options[option] is not None and options[option] < 1:
+                raise CommandError(f'--{option.replace("_", "-")} must be at least 1')
+
+        try:
+            while True:
+                close_old_connections()
+                result = run_jobs(options['queues'], options['batch_size'], options['concurrency'])
+                if any(result.values()):
+                    self.stdout.write(
+                        f'done: {result["done"]}, retrying: {result["queued"]}, failed: {result["failed"]}'
+                    )
+                if options['once']:
+                    break
+                if not any(result.values()):
+                    sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from jobs.scheduler import run_due_jobs
+from time import sleep
+
+
+class Command(BaseCommand):
+    help = 'Runs the periodic jobs of SCHEDULER_SETTINGS, can run on every node (each job is run by one of them)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=5, help='seconds between two checks for due jobs')
+        parser.add_argument('--once', action='store_true', help='run the due jobs once and exit')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                close_old_connections()
+                for name in run_due_jobs():
+                    self.stdout.write(f'Ran {name}')
+                if options['once']:
+                    break
+                sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
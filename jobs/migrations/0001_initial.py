@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Import path of the job function', max_length=255, verbose_name='Name')),
+                ('queue', models.CharField(default='default', max_length=50, verbose_name='Queue')),
+                ('args', models.JSONField(blank=True, default=list, verbose_name='Arguments')),
+                ('kwargs', models.JSONField(blank=True, default=dict, verbose_name='Keyword arguments')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=7, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5, verbose_name='Max attempts')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Last error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Run at')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Locked until')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished at')),
+            ],
+            options={
+                'verbose_name': 'Job',
+                'verbose_name_plural': 'Jobs',
+                'ordering': ('run_at',),
+                'indexes': [models.Index(condition=models.Q(('status', 'queued')), fields=['queue', 'run_at'], name='job_queued_idx'), models.Index(condition=models.Q(('status', 'running')), fields=['locked_until'], name='job_running_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodicJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Key in SCHEDULER_SETTINGS["JOBS"]', max_length=100, unique=True, verbose_name='Name')),
+                ('next_run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Next run at')),
+                ('last_run_at', models.DateTimeField(blank=True, null=True, verbose_name='Last run at')),
+                ('last_duration', models.FloatField(blank=True, help_text='Seconds', null=True, verbose_name='Last duration')),
+                ('last_status', models.CharField(blank=True, choices=[('ok', 'OK'), ('failed', 'Failed')], max_length=6, null=True, verbose_name='Last status')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Last error')),
+                ('run_count', models.PositiveIntegerField(default=0, verbose_name='Runs')),
+            ],
+            options={
+                'verbose_name': 'Periodic job',
+                'verbose_name_plural': 'Periodic jobs',
+                'ordering': ('name',),
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    class Meta:
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        ordering = ('run_at',)
+        indexes = [
+            models.Index(
+                fields=['queue', 'run_at'],
+                condition=models.Q(status='queued'),
+                name='job_queued_idx'
+            ),
+            models.Index(
+                fields=['locked_until'],
+                condition=models.Q(status='running'),
+                name='job_running_idx'
+            ),
+        ]
+
+    name = models.CharField('Name', max_length=255, help_text='Import path of the job function')
+    queue = models.CharField('Queue', max_length=50, default='default')
+    args = models.JSONField('Arguments', default=list, blank=True)
+    kwargs = models.JSONField('Keyword arguments', default=dict, blank=True)
+
+    status = models.CharField('Status', max_length=7, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField('Attempts', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Max attempts', default=5)
+    last_error = models.TextField('Last error', blank=True, null=True)
+
+    created_at = models.DateTimeField('Created at', auto_now_add=True)
+    run_at = models.DateTimeField('Run at', default=timezone.now)
+    locked_until = models.DateTimeField('Locked until', blank=True, null=True)
+    started_at = models.DateTimeField('Started at', blank=True, null=True)
+    finished_at = models.DateTimeField('Finished at', blank=True, null=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+
+class PeriodicJob(models.Model):
+    OK = 'ok'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (OK, 'OK'),
+        (FAILED, 'Failed'),
+    )
+
+    class Meta:
+        verbose_name = 'Periodic job'
+        verbose_name_plural = 'Periodic jobs'
+        ordering = ('name',)
+
+    name = models.CharField('Name', max_length=100, unique=True, help_text='Key in SCHEDULER_SETTINGS["JOBS"]')
+    next_run_at = models.DateTimeField('Next run at', default=timezone.now)
+    last_run_at = models.DateTimeField('Last run at', blank=True, null=True)
+    last_duration = models.FloatField('Last duration', blank=True, null=True, help_text='Seconds')
+    last_status = models.CharField('Last status', max_length=6, choices=STATUS_CHOICES, blank=True, null=True)
+    last_error = models.TextField('Last error', blank=True, null=True)
+    run_count = models.PositiveIntegerField('Runs', default=0)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,194 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F, Max, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from typing import Any, Callable, Dict, Iterable, List
+from .models import Job
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_job_queue_settings() -> dict:
+    job_queue_settings = {
+        'BATCH_SIZE': 10,
+        'CONCURRENCY': 4,
+        'MAX_ATTEMPTS': 5,
+        'RETRY_DELAY': 10,
+        'LEASE_TIME': 5 * 60,
+    }
+    job_queue_settings.update(getattr(settings, 'JOB_QUEUE_SETTINGS', {}))
+
+    for key, value in job_queue_settings.items():
+        if hasattr(value, 'total_seconds'):
+            job_queue_settings[key] = value.total_seconds()
+
+    return job_queue_settings
+
+
+class JobFunction:
+    """
+    A function that can be run by the job queue worker, see job().
+    """
+    def __init__(self, func: Callable, queue: str, max_attempts: int = None):
+        self.func = func
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs) -> Job:
+        """
+        Queues the function to be run by a worker as soon as possible with the given (JSON serializable) arguments.
+        The job is part of the current transaction, it's only queued if the transaction commits.
+        """
+        return self.schedule(timezone.now(), *args, **kwargs)
+
+    def schedule(self, run_at: datetime | timedelta, *args, **kwargs) -> Job:
+        """
+        Queues the function to be run at `run_at` (a datetime, or a timedelta from now).
+        """
+        if isinstance(run_at, timedelta):
+            run_at = timezone.now() + run_at
+        return Job.objects.create(
+            name=self.name,
+            queue=self.queue,
+            args=list(args),
+            kwargs=kwargs,
+            run_at=run_at,
+            max_attempts=self.max_attempts or get_job_queue_settings()['MAX_ATTEMPTS'],
+        )
+
+
+def job(func: Callable = None, *, queue: str = 'default', max_attempts: int = None):
+    """
+    Turns `func` into a job function, that still runs inline when called and is queued with func.delay(...) or
+    func.schedule(run_at, ...). Jobs may run more than once (a worker can die after running it), so they should
+    be idempotent.
+
+        @job(max_attempts=3)
+        def remove_file(path): ...
+
+        remove_file.delay('/path/to/file')
+    """
+    if func is None:
+        return lambda func: JobFunction(func, queue, max_attempts)
+    return JobFunction(func, queue, max_attempts)
+
+
+def claim_jobs(queues: Iterable[str], batch_size: int, lease_time: float) -> List[Job]:
+    """
+    Locks up to `batch_size` due jobs of `queues` (skipping the ones locked by other workers) and leases them for
+    `lease_time` seconds. Running jobs whose lease is over (their worker died) are claimed again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(queue__in=list(queues))
+            .filter(Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now))
+            .order_by('run_at')[:batch_size]
+        )
+        if jobs:
+            Job.objects.filter(id__in=[job.id for job in jobs]).update(
+                status=Job.RUNNING,
+                attempts=F('attempts') + 1,
+                locked_until=now + timedelta(seconds=lease_time),
+                started_at=now,
+            )
+    for claimed in jobs:
+        claimed.status, claimed.attempts, claimed.started_at = Job.RUNNING, claimed.attempts + 1, now
+    return jobs
+
+
+def run_job(claimed: Job) -> Exception | None:
+    try:
+        function = import_string(claimed.name)
+        getattr(function, 'func', function)(*claimed.args, **claimed.kwargs)
+    except Exception as e:
+        return e
+
+
+def run_jobs(queues: Iterable[str] = ('default',), batch_size: int = None, concurrency: int = None) -> Dict[str, int]:
+    """
+    Runs one batch of due jobs of `queues`, CONCURRENCY at a time. Failed jobs are retried with an exponential
+    backoff and marked as failed after their max_attempts.
+    """
+    job_queue_settings = get_job_queue_settings()
+    jobs = claim_jobs(queues, batch_size or job_queue_settings['BATCH_SIZE'], job_queue_settings['LEASE_TIME'])
+    result = {Job.DONE: 0, Job.QUEUED: 0, Job.FAILED: 0}
+    if not jobs:
+        return result
+
+    concurrency = concurrency or job_queue_settings['CONCURRENCY']
+    if concurrency == 1:
+        errors = [run_job(claimed) for claimed in jobs]
+    else:
+        def run_in_thread(claimed: Job):
+            try:
+                return run_job(claimed)
+            finally:
+                connection.close()  # Every thread has its own connection
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            errors = list(executor.map(run_in_thread, jobs))
+
+    now = timezone.now()
+    for claimed, error in zip(jobs, errors):
+        claimed.locked_until = None
+        if error is None:
+            claimed.status, claimed.finished_at, claimed.last_error = Job.DONE, now, None
+        elif claimed.attempts >= claimed.max_attempts:
+            logger.error(f'Job {claimed.id} ({claimed.name}) failed after {claimed.attempts} attempts: {error!r}')
+            claimed.status, claimed.finished_at, claimed.last_error = Job.FAILED, now, repr(error)
+        else:
+            logger.warning(f'Job {claimed.id} ({claimed.name}) failed (attempt {claimed.attempts}): {error!r}')
+            delay = job_queue_settings['RETRY_DELAY'] * 2 ** (claimed.attempts - 1)
+            claimed.status, claimed.run_at, claimed.last_error = Job.QUEUED, now + timedelta(seconds=delay), repr(error)
+        result[claimed.status] += 1
+
+    Job.objects.bulk_update(jobs, ['status', 'run_at', 'locked_until', 'finished_at', 'last_error'])
+    return result
+
+
+def job_metrics(since: timedelta = timedelta(hours=1)) -> Dict[str, Any]:
+    """
+    Returns the number of jobs per queue and status, the lag of the oldest due job and the throughput, failures
+    and run time of the jobs finished within `since`.
+    """
+    now = timezone.now()
+    counts = {}
+    for row in Job.objects.values('queue', 'status').annotate(count=Count('id')).order_by('queue', 'status'):
+        counts.setdefault(row['queue'], {})[row['status']] = row['count']
+
+    oldest = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).aggregate(run_at=Min('run_at'))['run_at']
+    finished = Job.objects.filter(finished_at__gte=now - since).aggregate(
+        done=Count('id', filter=Q(status=Job.DONE)),
+        failed=Count('id', filter=Q(status=Job.FAILED)),
+        average_run_time=Avg(F('finished_at') - F('started_at')),
+        max_run_time=Max(F('finished_at') - F('started_at')),
+    )
+
+    return {
+        'counts': counts,
+        'lag': (now - oldest).total_seconds() if oldest else 0,
+        'done': finished['done'],
+        'failed': finished['failed'],
+        'average_run_time': finished['average_run_time'].total_seconds() if finished['average_run_time'] else 0,
+        'max_run_time': finished['max_run_time'].total_seconds() if finished['max_run_time'] else 0,
+    }
+
+
+def purge_finished_jobs(older_than: timedelta = timedelta(days=7)) -> int:
+    """
+    Deletes the jobs that finished successfully more than `older_than` ago, failed jobs are kept for inspection.
+    """
+    deleted, _ = Job.objects.filter(status=Job.DONE, finished_at__lt=timezone.now() - older_than).delete()
+    return deleted
@@ -0,0 +1,89 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from typing import Dict, List
+from uuid import uuid4
+from .models import PeriodicJob
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_scheduler_settings() -> dict:
+    scheduler_settings = {
+        'CACHE_ALIAS': 'default',
+        'LOCK_TIMEOUT': 60 * 60,
+        'JOBS': {},
+    }
+    scheduler_settings.update(getattr(settings, 'SCHEDULER_SETTINGS', {}))
+
+    if hasattr(scheduler_settings['LOCK_TIMEOUT'], 'total_seconds'):
+        scheduler_settings['LOCK_TIMEOUT'] = scheduler_settings['LOCK_TIMEOUT'].total_seconds()
+
+    jobs = {}
+    for name, definition in scheduler_settings['JOBS'].items():
+        interval = definition['interval']
+        jobs[name] = {
+            'function': definition['function'],
+            'interval': interval if isinstance(interval, timedelta) else timedelta(seconds=interval),
+            'kwargs': definition.get('kwargs', {}),
+        }
+    scheduler_settings['JOBS'] = jobs
+
+    return scheduler_settings
+
+
+def run_due_jobs() -> List[str]:
+    """
+    Runs the periodic jobs of SCHEDULER_SETTINGS["JOBS"] that are due. Every job is run under a Redis lock, so
+    however many nodes run the scheduler, a due job is run by exactly one of them. The outcome, time and duration
+    of the last run are recorded in PeriodicJob. Returns the names of the jobs run by this node.
+    """
+    scheduler_settings = get_scheduler_settings()
+    cache = caches[scheduler_settings['CACHE_ALIAS']]
+    periodic_jobs = {
+        periodic_job.name: periodic_job
+        for periodic_job in PeriodicJob.objects.filter(name__in=scheduler_settings['JOBS'])
+    }
+
+    ran = []
+    for name, definition in scheduler_settings['JOBS'].items():
+        periodic_job = periodic_jobs.get(name)
+        if periodic_job is not None and periodic_job.next_run_at > timezone.now():
+            continue
+
+        lock_key, lock_token = f'scheduler-{name}-lock', uuid4().hex
+        if not cache.add(lock_key, lock_token, scheduler_settings['LOCK_TIMEOUT']):
+            continue  # Running on another node
+        try:
+            # Another node may have run it between the first check and the lock
+            periodic_job, _ = PeriodicJob.objects.get_or_create(name=name)
+            if periodic_job.next_run_at > timezone.now():
+                continue
+            run_periodic_job(periodic_job, definition)
+            ran.append(name)
+        finally:
+            if cache.get(lock_key) == lock_token:
+                cache.delete(lock_key)
+
+    return ran
+
+
+def run_periodic_job(periodic_job: PeriodicJob, definition: Dict):
+    started_at, start = timezone.now(), time.perf_counter()
+    try:
+        import_string(definition['function'])(**definition['kwargs'])
+        periodic_job.last_status, periodic_job.last_error = PeriodicJob.OK, None
+    except Exception as e:
+        logger.exception(f'Periodic job {periodic_job.name} failed')
+        periodic_job.last_status, periodic_job.last_error = PeriodicJob.FAILED, repr(e)
+
+    periodic_job.last_duration = time.perf_counter() - start
+    periodic_job.last_run_at = started_at
+    periodic_job.next_run_at = started_at + definition['interval']
+    periodic_job.run_count += 1
+    periodic_job.save()
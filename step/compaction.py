@@ -0,0 +1,120 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, QuerySet
+from django.utils import timezone
+from task.models import Task
+from TODO_V2.events import queue_events, suppress_events
+from TODO_V2.models import insert_rows, model_to_row, row_to_model
+from typing import Iterable, List
+from .models import Step
+
+
+def get_step_compaction_settings() -> dict:
+    compaction_settings = {
+        'COMPACT_AFTER': timedelta(days=30),
+        'BATCH_SIZE': 500,
+    }
+    compaction_settings.update(getattr(settings, 'STEP_COMPACTION_SETTINGS', {}))
+
+    return compaction_settings
+
+
+def compact_steps(done_for: timedelta = None, batch_size: int = None) -> int:
+    """
+    Moves the steps of the tasks completed more than `done_for` ago (defaults to
+    STEP_COMPACTION_SETTINGS["COMPACT_AFTER"]) from the step table to the compacted_steps column of their task,
+    `batch_size` tasks per transaction, so the step table and its indexes only hold the steps of active work.
+    Returns the number of compacted steps.
+    """
+    compaction_settings = get_step_compaction_settings()
+    done_for = compaction_settings['COMPACT_AFTER'] if done_for is None else done_for
+    batch_size = batch_size or compaction_settings['BATCH_SIZE']
+
+    compacted, skipped = 0, set()
+    while True:
+        with transaction.atomic():
+            tasks = list(
+                Task.objects.filter(is_done=True, completed_at__lte=timezone.now() - done_for)
+                .filter(Exists(Step.objects.filter(task_id=OuterRef('pk'))))
+                .exclude(pk__in=skipped)
+                .select_for_update(skip_locked=True)
+                .order_by('pk')[:batch_size]
+            )
+            if not tasks:
+                return compacted
+
+            rows = {}
+            for step in Step.objects.filter(task__in=tasks).order_by('-created_at'):
+                rows.setdefault(step.task_id, []).append(model_to_row(step))
+
+            # Versioned like any other change of the task, so a save based on a copy read before the compaction
+            # conflicts and cached representations are rebuilt
+            step_ids = []
+            for task in tasks:
+                task_rows = rows.get(task.id, [])
+                updated = Task.objects.filter(pk=task.pk, version=task.version).update(
+                    compacted_steps=(task.compacted_steps or []) + task_rows,
+                    version=F('version') + 1,
+                    updated_at=timezone.now(),
+                )
+                if not updated:
+                    skipped.add(task.pk)
+                    continue
+                step_ids += [row['id'] for row in task_rows]
+                queue_events(Task, 'updated', [task.pk], user_id=task.user_id)
+
+            # The steps still exist as far as clients are concerned, only the task is reported as updated
+            with suppress_events(Step):
+                Step.objects.filter(pk__in=step_ids).delete()  # Not by task, steps may have been added since
+        compacted += len(step_ids)
+
+
+def compacted_steps(tasks: QuerySet | Iterable[Task]) -> List[Step]:
+    """
+    Returns the compacted steps of `tasks` as (unsaved) Step instances.
+    """
+    if isinstance(tasks, QuerySet):
+        tasks = tasks.filter(compacted_steps__isnull=False).only('id', 'compacted_steps')
+    return [row_to_model(Step, row) for task in tasks for row in task.compacted_steps or []]
+
+
+def with_compacted_steps(steps: QuerySet, tasks: QuerySet | Iterable[Task]) -> List[Step]:
+    """
+    Returns the `steps` rows and the compacted steps of `tasks`, most recent first like the step table.
+    """
+    return sorted([*steps, *compacted_steps(tasks)], key=lambda step: step.created_at, reverse=True)
+
+
+def tasks_with_compacted_steps(tasks: QuerySet, step_ids: Iterable[int]) -> QuerySet:
+    """
+    Filters `tasks` down to the ones having one of `step_ids` in their compacted steps.
+    """
+    condition = Q()
+    for step_id in step_ids:
+        condition |= Q(compacted_steps__contains=[{'id': int(step_id)}])
+    return tasks.filter(condition) if condition else tasks.none()
+
+
+def expand_steps(tasks: QuerySet | Iterable[Task]) -> int:
+    """
+    Moves the compacted steps of `tasks` back to the step table (with their ids and dates), e.g. before they are
+    changed. Returns the number of expanded steps.
+    """
+    expanded = 0
+    for task in tasks:
+        if not task.compacted_steps:
+            continue
+        with transaction.atomic():
+            # Read again under lock, the steps may have been expanded by a concurrent request
+            rows = (
+                Task.all_objects.select_for_update().filter(pk=task.pk)
+                .values_list('compacted_steps', flat=True).first()
+            )
+            if rows:
+                with suppress_events(Step):  # Not new to clients
+                    insert_rows([row_to_model(Step, row) for row in rows])
+                Task.all_objects.filter(pk=task.pk).update(compacted_steps=None)
+                expanded += len(rows)
+        task.compacted_steps = None
+    return expanded
@@ -1,8 +1,9 @@
 from django.db import models
+from TODO_V2.models import VersionedModel
 from task.models import Task
 
 
-class Step(models.Model):
+class Step(VersionedModel):
     class Meta:
         verbose_name = 'Step'
         verbose_name_plural = 'Steps'
@@ -6,4 +6,4 @@ class StepSerializer(ModelSerializer):
     class Meta:
         model = Step
         fields = '__all__'
-        read_only_fields = ('created_at', 'updated_at', 'id', 'task', 'completed_at')
+        read_only_fields = ('created_at', 'updated_at', 'id', 'task', 'completed_at', 'version')
@@ -1,6 +1,8 @@
 from django.dispatch.dispatcher import receiver
 from django.db.models.signals import pre_save
 from django.utils import timezone
+from task.models import Task
+from .compaction import expand_steps
 from .models import Step
 
 
@@ -10,4 +12,14 @@ def step_completed_at(sender, instance: Step, **kwargs):
         instance.completed_at = timezone.now()
 
     if instance.pk and not Step.objects.get(pk=instance.pk).is_done and instance.is_done:
-        instance.completed_at = timezone.now()
\ No newline at end of file
+        instance.completed_at = timezone.now()
+
+@receiver(pre_save, sender=Task)
+def task_steps_expansion(sender, instance: Task, **kwargs):
+    # The steps compacted while the task was done go back to the step table once it's reopened. Looked up in the
+    # database, the instance may have been loaded before its steps were compacted.
+    if instance.pk and not instance.is_done:
+        expand_steps(
+            Task.all_objects.filter(pk=instance.pk, compacted_steps__isnull=False).only('id', 'compacted_steps')
+        )
+        instance.compacted_steps = None
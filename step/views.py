@@ -4,7 +4,11 @@ from rest_framework import status
 from task.models import Task
 from .models import Step
 from .serializers import StepSerializer
-from TODO_V2.mixins import GetDataMixin, ResponseBuilderMixin
+from .compaction import compacted_steps, expand_steps, tasks_with_compacted_steps, with_compacted_steps
+from TODO_V2.mixins import CostBudgetMixin, GetDataMixin, ResponseBuilderMixin
+from TODO_V2.idempotency import idempotent
+from TODO_V2.models import VersionConflict
+from TODO_V2.cache import render_fragments
 from rest_framework.permissions import IsAuthenticated
 from user.views import AUTHENTICATION_REQUIRED, UNAUTHORIZED_RESPONSE, TOO_MANY_REQUESTS_RESPONSE
 from drf_spectacular.utils import (
@@ -646,7 +650,7 @@ from drf_spectacular.utils import (
         }
     )
 )
-class StepView(APIView, GetDataMixin, ResponseBuilderMixin):
+class StepView(CostBudgetMixin, APIView, GetDataMixin, ResponseBuilderMixin):
     permission_classes = (IsAuthenticated,)
     throttle_scope = 'steps'
 
@@ -660,18 +664,20 @@ class StepView(APIView, GetDataMixin, ResponseBuilderMixin):
             )
 
         if self.is_id(get):
-            try:
-                step = Step.objects.get(id=get, task__user=request.user)
-                return self.build_response(
-                    response_status=status.HTTP_200_OK,
-                    message='Success',
-                    step=StepSerializer(step).data,
-                )
-            except Step.DoesNotExist:
+            step = Step.objects.filter(id=get, task__user=request.user, task__deleted_at__isnull=True).first()
+            if step is None:  # May have been compacted into its task
+                tasks = tasks_with_compacted_steps(request.user.tasks.all(), [get])
+                step = next((step for step in compacted_steps(tasks) if step.id == int(get)), None)
+            if step is None:
                 return self.build_response(
                     response_status=status.HTTP_404_NOT_FOUND,
                     message='Step not found'
                 )
+            return self.build_response(
+                response_status=status.HTTP_200_OK,
+                message='Success',
+                step=StepSerializer(step).data,
+            )
 
         if 'task:' in get:
             task_id = get.split(':')[1]
@@ -687,7 +693,7 @@ class StepView(APIView, GetDataMixin, ResponseBuilderMixin):
                 return self.build_response(
                     response_status=status.HTTP_200_OK,
                     message='Success',
-                    steps=StepSerializer(task.steps.all(), many=True).data,
+                    steps=render_fragments(with_compacted_steps(task.steps.all(), [task]), StepSerializer),
                 )
             except Task.DoesNotExist:
                 return self.build_response(
@@ -696,11 +702,13 @@ class StepView(APIView, GetDataMixin, ResponseBuilderMixin):
                 )
 
         if get == 'all':
-            steps = Step.objects.filter(task__user=request.user)
+            steps = with_compacted_steps(
+                Step.objects.filter(task__user=request.user, task__deleted_at__isnull=True), request.user.tasks.all()
+            )
             return self.build_response(
                 response_status=status.HTTP_200_OK,
                 message='Success',
-                steps=StepSerializer(steps, many=True).data
+                steps=render_fragments(steps, StepSerializer)
             )
 
         return self.build_response(
@@ -709,6 +717,7 @@ class StepView(APIView, GetDataMixin, ResponseBuilderMixin):
         )
 
 
+    @idempotent
     def post(self, request):
         try:
             data = self.get_data(request, 'title', 'task_id')
@@ -751,6 +760,7 @@ class StepView(APIView, GetDataMixin, ResponseBuilderMixin):
     def patch(self, request):
         try:
             step_id = self.get_data(request, 'step_id')['step_id']
+            expected_version = self.get_expected_version(request)
         except ValidationError as e:
             return self.build_response(
                 response_status=status.HTTP_400_BAD_REQUEST,
@@ -763,14 +773,19 @@ class StepView(APIView, GetDataMixin, ResponseBuilderMixin):
                 message='Invalid "step_id" parameter'
             )
 
+        # A compacted step is moved back to the step table to be changed
+        steps = Step.objects.filter(task__user=request.user, task__deleted_at__isnull=True)
+        if not steps.filter(id=step_id).exists():
+            expand_steps(tasks_with_compacted_steps(request.user.tasks.all(), [step_id]))
         try:
-            step = Step.objects.get(id=step_id, task__user=request.user)
+            step = steps.get(id=step_id)
         except Step.DoesNotExist:
             return self.build_response(
                 response_status=status.HTTP_404_NOT_FOUND,
                 message='Step not found'
             )
 
+        step.expected_version = expected_version
         serializer = StepSerializer(instance=step, data=request.data, partial=True)
 
         if not serializer.is_valid():
@@ -779,7 +794,13 @@ class StepView(APIView, GetDataMixin, ResponseBuilderMixin):
                 **serializer.errors
             )
 
-        serializer.save()
+        try:
+            serializer.save()
+        except VersionConflict:
+            return self.build_response(
+                response_status=status.HTTP_412_PRECONDITION_FAILED,
+                message='Step was modified by another request'
+            )
 
         return self.build_response(
             response_status=status.HTTP_200_OK,
@@ -798,7 +819,10 @@ class StepView(APIView, GetDataMixin, ResponseBuilderMixin):
 
         if self.is_id(selector):
             try:
-                step = Step.objects.get(id=selector, task__user=request.user)
+                steps = Step.objects.filter(task__user=request.user, task__deleted_at__isnull=True)
+                if not steps.filter(id=selector).exists():
+                    expand_steps(tasks_with_compacted_steps(request.user.tasks.all(), [selector]))
+                step = steps.get(id=selector)
                 step.delete()
                 return self.build_response(
                     response_status=status.HTTP_200_OK,
@@ -811,8 +835,9 @@ class StepView(APIView, GetDataMixin, ResponseBuilderMixin):
                 )
 
         if ',' in selector:
-            ids = filter(self.is_id, selector.split(','))
-            steps = Step.objects.filter(id__in=ids, task__user=request.user)
+            ids = list(filter(self.is_id, selector.split(',')))
+            expand_steps(tasks_with_compacted_steps(request.user.tasks.all(), ids))
+            steps = Step.objects.filter(id__in=ids, task__user=request.user, task__deleted_at__isnull=True)
             if not steps.exists():
                 return self.build_response(
                     response_status=status.HTTP_404_NOT_FOUND,
@@ -837,8 +862,10 @@ class StepView(APIView, GetDataMixin, ResponseBuilderMixin):
             try:
                 task = request.user.tasks.get(id=task_id)
                 steps = task.steps.all()
-                to_delete = steps.count()
+                to_delete = steps.count() + len(task.compacted_steps or [])
                 steps.delete()
+                if task.compacted_steps:
+                    Task.objects.filter(id=task.id).update(compacted_steps=None)
                 return self.build_response(
                     response_status=status.HTTP_200_OK,
                     message=f'Deleted {to_delete} step(s) successfully'
@@ -850,9 +877,11 @@ class StepView(APIView, GetDataMixin, ResponseBuilderMixin):
                 )
 
         if selector == 'all':
-            steps = Step.objects.filter(task__user=request.user)
-            to_delete = steps.count()
+            steps = Step.objects.filter(task__user=request.user, task__deleted_at__isnull=True)
+            compacted_tasks = request.user.tasks.filter(compacted_steps__isnull=False)
+            to_delete = steps.count() + len(compacted_steps(compacted_tasks))
             steps.delete()
+            compacted_tasks.update(compacted_steps=None)
             return self.build_response(
                 response_status=status.HTTP_200_OK,
                 message=f'Deleted all({to_delete}) step(s) successfully'
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tag', '0003_tag_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='version',
+            field=models.PositiveIntegerField(default=1, verbose_name='Version'),
+        ),
+    ]
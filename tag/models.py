@@ -1,9 +1,10 @@
 from django.db import models
+from TODO_V2.models import VersionedModel
 from task.models import Task
 from user.models import User
 
 
-class Tag(models.Model):
+class Tag(VersionedModel):
     class Meta:
         verbose_name = 'Tag'
         verbose_name_plural = 'Tags'
@@ -6,4 +6,4 @@ class TagSerializer(ModelSerializer):
     class Meta:
         model = Tag
         fields = '__all__'
-        read_only_fields = ('id', 'tasks', 'user', 'created_at', 'updated_at')
\ No newline at end of file
+        read_only_fields = ('id', 'tasks', 'user', 'created_at', 'updated_at', 'version')
\ No newline at end of file
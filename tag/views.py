@@ -3,7 +3,9 @@ from task.models import Task
 from .serializers import TagSerializer
 from .models import Tag
 from rest_framework import status
-from TODO_V2.mixins import GetDataMixin, ResponseBuilderMixin
+from TODO_V2.mixins import CostBudgetMixin, GetDataMixin, ResponseBuilderMixin
+from TODO_V2.idempotency import idempotent
+from TODO_V2.models import VersionConflict
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import ValidationError
 from user.views import AUTHENTICATION_REQUIRED, UNAUTHORIZED_RESPONSE, TOO_MANY_REQUESTS_RESPONSE
@@ -714,7 +716,7 @@ from drf_spectacular.utils import (
         }
     )
 )
-class TagView(APIView, GetDataMixin, ResponseBuilderMixin):
+class TagView(CostBudgetMixin, APIView, GetDataMixin, ResponseBuilderMixin):
     permission_classes = (IsAuthenticated,)
     throttle_scope = 'tags'
 
@@ -775,6 +777,7 @@ class TagView(APIView, GetDataMixin, ResponseBuilderMixin):
             message='Invalid "selector" parameter'
         )
 
+    @idempotent
     def post(self, request):
         try:
             action = self.get_data(request, 'action')['action']
@@ -922,6 +925,7 @@ class TagView(APIView, GetDataMixin, ResponseBuilderMixin):
                     message='Invalid "tag_id" parameter'
                 )
             tag = request.user.tags.get(id=data['tag_id'])
+            tag.expected_version = self.get_expected_version(request)
         except ValidationError as e:
             return self.build_response(
                 status.HTTP_400_BAD_REQUEST,
@@ -941,7 +945,13 @@ class TagView(APIView, GetDataMixin, ResponseBuilderMixin):
                 **serializer.errors
             )
 
-        serializer.save()
+        try:
+            serializer.save()
+        except VersionConflict:
+            return self.build_response(
+                status.HTTP_412_PRECONDITION_FAILED,
+                message='Tag was modified by another request'
+            )
 
         return self.build_response(
             status.HTTP_200_OK,
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Task
+from .models import ColdTask, Task
 from step.models import Step
 
 
@@ -20,14 +20,34 @@ class TaskAdmin(admin.ModelAdmin):
     get_tags.short_description = 'Tags'
 
     list_display = ('title', 'project', 'user', 'is_done', 'is_archived', 'remind_at', 'due_at')
-    list_filter = ('user', 'project', 'is_done', 'is_archived', 'created_at', 'remind_at', 'due_at', 'tags')
+    list_filter = ('user', 'project', 'is_done', 'is_archived', 'created_at', 'remind_at', 'due_at', 'tags', 'deleted_at')
     readonly_fields = ('created_at', 'updated_at', 'get_progress', 'get_tags')
     search_fields = ('title', 'user__name', 'project')
     ordering = ('user', '-completed_at')
     inlines = (StepInline,)
+    actions = ('restore',)
 
     fieldsets = (
         ('General', {'fields': ('user', 'title', 'project', 'notes', 'get_tags')}),
         ('Status', {'fields': ('get_progress', 'is_done', 'is_archived')}),
         ('Dates', {'fields': ('remind_at', 'due_at', 'created_at', 'updated_at', 'completed_at')}),
     )
+
+    def get_queryset(self, request):
+        # Tasks in the trash are listed too (filter by "Deleted at"), so they can be restored
+        queryset = Task.all_objects.all()
+        ordering = self.get_ordering(request)
+        return queryset.order_by(*ordering) if ordering else queryset
+
+    @admin.action(description='Restore selected tasks from the trash')
+    def restore(self, request, queryset):
+        queryset.restore()
+
+
+@admin.register(ColdTask)
+class ColdTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'title', 'user', 'completed_at', 'offloaded_at')
+    list_filter = ('user', 'offloaded_at')
+    search_fields = ('id', 'title')
+    exclude = ('data',)
+    readonly_fields = ('id', 'user', 'title', 'completed_at', 'offloaded_at')
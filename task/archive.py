@@ -0,0 +1,160 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from step.models import Step
+from TODO_V2.events import queue_events, suppress_events
+from TODO_V2.models import RowEncoder, insert_rows, model_to_row, row_to_model
+from typing import Dict, List
+from .models import ColdTask, Task
+import json
+import zlib
+
+
+def get_task_archive_settings() -> dict:
+    archive_settings = {
+        'ARCHIVE_AFTER': timedelta(days=30),
+        'OFFLOAD_AFTER': timedelta(days=180),
+        'BATCH_SIZE': 500,
+    }
+    archive_settings.update(getattr(settings, 'TASK_ARCHIVE_SETTINGS', {}))
+
+    return archive_settings
+
+
+def archive_completed_tasks(done_for: timedelta, batch_size: int) -> int:
+    """
+    Sets is_archived on the tasks completed (and left untouched) more than `done_for` ago, `batch_size` rows per
+    UPDATE.
+    Returns the number of archived tasks.
+    """
+    archived = 0
+    while True:
+        ids = list(
+            Task.objects.filter(
+                is_done=True, is_archived=False, completed_at__lte=timezone.now() - done_for,
+                updated_at__lte=timezone.now() - done_for,  # e.g. just brought back from cold storage
+            )
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return archived
+        # updated_at is bumped so the cached fragments of the tasks are rebuilt and the offload countdown starts
+        with transaction.atomic():
+            # Locked and re-selected so only the tasks actually archived here (not meanwhile by another run) are
+            # reported
+            ids = list(
+                Task.objects.filter(pk__in=ids, is_archived=False).select_for_update().values_list('pk', flat=True)
+            )
+            archived += Task.objects.filter(pk__in=ids).update(
+                is_archived=True, updated_at=timezone.now(), version=F('version') + 1
+            )
+            queue_events(Task, 'updated', ids)
+
+
+def freeze_task(task: Task, steps: List[Step], tag_ids: List[int], contact_ids: List[int]) -> ColdTask:
+    data = {
+        'task': model_to_row(task),
+        'steps': [model_to_row(step) for step in steps],
+        'tags': tag_ids,
+        'contacts': contact_ids,
+    }
+    return ColdTask(
+        id=task.id,
+        user_id=task.user_id,
+        title=task.title,
+        completed_at=task.completed_at,
+        data=zlib.compress(json.dumps(data, cls=RowEncoder).encode()),
+    )
+
+
+def load_cold_task(cold_task: ColdTask) -> Dict:
+    """
+    Returns the task (as an unsaved Task), its steps (unsaved Steps) and the ids of its tags and contacts.
+    """
+    data = json.loads(zlib.decompress(cold_task.data))
+    return {
+        'task': row_to_model(Task, data['task']),
+        'steps': [row_to_model(Step, row) for row in data['steps']],
+        'tags': data['tags'],
+        'contacts': data['contacts'],
+    }
+
+
+def offload_archived_tasks(idle_for: timedelta, batch_size: int) -> int:
+    """
+    Moves the archived tasks left untouched for more than `idle_for`, with their steps, from the task and step
+    tables to ColdTask, `batch_size` tasks per transaction. Returns the number of offloaded tasks.
+    """
+    offloaded = 0
+    while True:
+        with transaction.atomic():
+            tasks = list(
+                Task.objects.filter(is_archived=True, updated_at__lte=timezone.now() - idle_for)
+                .select_for_update(skip_locked=True)
+                .order_by('pk')[:batch_size]
+            )
+            if not tasks:
+                return offloaded
+            ids = [task.id for task in tasks]
+
+            steps, tags, contacts = {}, {}, {}
+            for step in Step.objects.filter(task_id__in=ids).order_by('pk'):
+                steps.setdefault(step.task_id, []).append(step)
+            for task_id, tag_id in Task.tags.through.objects.filter(task_id__in=ids).values_list('task_id', 'tag_id'):
+                tags.setdefault(task_id, []).append(tag_id)
+            for task_id, contact_id in (
+                Task.contacts.through.objects.filter(task_id__in=ids).values_list('task_id', 'contact_id')
+            ):
+                contacts.setdefault(task_id, []).append(contact_id)
+
+            ColdTask.objects.bulk_create([
+                freeze_task(task, steps.get(task.id, []), tags.get(task.id, []), contacts.get(task.id, []))
+                for task in tasks
+            ])
+            # Reported as offloaded below, not deleted
+            with suppress_events(Task):
+                Task.objects.filter(pk__in=ids).hard_delete()
+            for task in tasks:
+                queue_events(Task, 'offloaded', [task.id], user_id=task.user_id)
+        offloaded += len(tasks)
+
+
+def thaw_task(cold_task: ColdTask) -> Task:
+    """
+    Moves a cold task back to the task and step tables, unarchived, with the tags and contacts it had that still
+    exist.
+    """
+    from contact.models import Contact
+    from tag.models import Tag
+
+    loaded = load_cold_task(cold_task)
+    task, steps = loaded['task'], loaded['steps']
+    task.is_archived = False
+    with transaction.atomic():
+        # Inserted without save() (no signals, no version bump), updated_at is left to now
+        insert_rows([task], keep=['created_at'])
+        insert_rows(steps)
+
+        task.tags.set(Tag.objects.filter(id__in=loaded['tags'], user_id=task.user_id))
+        task.contacts.set(Contact.objects.filter(id__in=loaded['contacts'], user_id=task.user_id))
+        cold_task.delete()
+        queue_events(Task, 'created', [task.id], user_id=task.user_id)
+
+    return task
+
+
+def archive_tasks() -> Dict[str, int]:
+    """
+    Periodic job applying TASK_ARCHIVE_SETTINGS: archives the tasks done for ARCHIVE_AFTER, then offloads the
+    ones archived (and untouched) for OFFLOAD_AFTER to cold storage. Either step is skipped when set to None.
+    """
+    archive_settings = get_task_archive_settings()
+    result = {'archived': 0, 'offloaded': 0}
+    if archive_settings['ARCHIVE_AFTER'] is not None:
+        result['archived'] = archive_completed_tasks(archive_settings['ARCHIVE_AFTER'], archive_settings['BATCH_SIZE'])
+    if archive_settings['OFFLOAD_AFTER'] is not None:
+        result['offloaded'] = offload_archived_tasks(archive_settings['OFFLOAD_AFTER'], archive_settings['BATCH_SIZE'])
+    return result
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0005_task_deleted_at_task_task_trash_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColdTask',
+            fields=[
+                ('id', models.BigIntegerField(help_text='ID of the task in the task table', primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=50, verbose_name='Title')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Completed at')),
+                ('offloaded_at', models.DateTimeField(auto_now_add=True, verbose_name='Offloaded at')),
+                ('data', models.BinaryField(verbose_name='Data')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cold_tasks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Cold task',
+                'verbose_name_plural': 'Cold tasks',
+                'ordering': ['-completed_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:29
+
+import TODO_V2.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0006_coldtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='compacted_steps',
+            field=models.JSONField(blank=True, editable=False, encoder=TODO_V2.models.RowEncoder, null=True, verbose_name='Compacted steps'),
+        ),
+    ]
@@ -1,8 +1,9 @@
 from django.db import models
+from TODO_V2.models import RowEncoder, SoftDeleteModel, VersionedModel
 from user.models import User
 
 
-class Task(models.Model):
+class Task(VersionedModel, SoftDeleteModel):
     class Meta:
         verbose_name = 'Task'
         verbose_name_plural = 'Tasks'
@@ -10,6 +11,7 @@ class Task(models.Model):
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['-completed_at']),
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False), name='task_trash_idx'),
         ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tasks')
@@ -27,9 +29,45 @@ class Task(models.Model):
     updated_at = models.DateTimeField('Updated at', auto_now=True)
     completed_at = models.DateTimeField('Completed at', blank=True, null=True)
 
+    # Rows of the steps of a task completed long ago, moved out of the step table by step.compaction.compact_steps
+    compacted_steps = models.JSONField('Compacted steps', blank=True, null=True, editable=False, encoder=RowEncoder)
+
+    def save(self, *args, **kwargs):
+        # compacted_steps is only written by step compaction and expansion, with their own UPDATEs, so an instance
+        # loaded before the steps were compacted (or expanded) can't write back a stale copy of them
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred and field.name != 'compacted_steps'
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def progress(self):
         return 0  # temporary
 
     def __str__(self):
         return self.title
+
+
+class ColdTask(models.Model):
+    """
+    Archived task moved out of the task table, with its steps, by task.archive.offload_archived_tasks. The rows are
+    stored as zlib compressed JSON in `data` and only read on demand (see task.archive.thaw_task).
+    """
+    class Meta:
+        verbose_name = 'Cold task'
+        verbose_name_plural = 'Cold tasks'
+        ordering = ['-completed_at']
+
+    id = models.BigIntegerField('ID', primary_key=True, help_text='ID of the task in the task table')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cold_tasks')
+
+    title = models.CharField('Title', max_length=50)
+    completed_at = models.DateTimeField('Completed at', blank=True, null=True)
+    offloaded_at = models.DateTimeField('Offloaded at', auto_now_add=True)
+    data = models.BinaryField('Data')
+
+    def __str__(self):
+        return self.title
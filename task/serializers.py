@@ -1,24 +1,33 @@
 from rest_framework.serializers import ModelSerializer, ReadOnlyField
-from .models import Task
+from .models import ColdTask, Task
 
 
 class NormalTaskSerializer(ModelSerializer):
     progress = ReadOnlyField()
     class Meta:
         model = Task
-        fields = '__all__'
+        exclude = ('compacted_steps', 'deleted_at')
+        read_only_fields = ('version',)
 
 
 class QuickTaskSerializer(ModelSerializer):
     progress = ReadOnlyField()
     class Meta:
         model = Task
-        fields = ('id', 'title', 'project', 'progress', 'is_done', 'is_archived', 'remind_at', 'due_at')
+        fields = ('id', 'title', 'project', 'progress', 'is_done', 'is_archived', 'remind_at', 'due_at', 'version')
 
 
 class CreateTaskSerializer(ModelSerializer):
     class Meta:
         model = Task
-        fields = ('id', 'title', 'project', 'notes', 'is_done', 'is_archived', 'remind_at', 'due_at', 'completed_at')
-        read_only_fields = ('id',)
+        fields = (
+            'id', 'title', 'project', 'notes', 'is_done', 'is_archived', 'remind_at', 'due_at', 'completed_at', 'version'
+        )
+        read_only_fields = ('id', 'version')
         extra_kwargs = {'id': {'read_only': True}, 'completed_at': {'read_only': True}}
+
+
+class ColdTaskSerializer(ModelSerializer):
+    class Meta:
+        model = ColdTask
+        fields = ('id', 'title', 'completed_at', 'offloaded_at')
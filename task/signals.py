@@ -9,6 +9,6 @@ def task_completed_at(sender, instance: Task, **kwargs):
     if not instance.pk and instance.is_done:
         instance.completed_at = timezone.now()
 
-    if instance.pk and not Task.objects.get(pk=instance.pk).is_done and instance.is_done:
+    if instance.pk and not Task.all_objects.get(pk=instance.pk).is_done and instance.is_done:
         instance.completed_at = timezone.now()
 
@@ -6,4 +6,6 @@ app_name = 'task'
 
 urlpatterns = [
     path('', views.TaskView.as_view(), name='task-endpoints'),
-]
\ No newline at end of file
+    path('restore/', views.TaskRestoreView.as_view(), name='task-restore'),
+    path('archive/', views.TaskArchiveView.as_view(), name='task-archive'),
+]
@@ -2,11 +2,17 @@ from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiPara
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
-from .serializers import NormalTaskSerializer, QuickTaskSerializer, CreateTaskSerializer
-from .models import Task
+from .serializers import NormalTaskSerializer, QuickTaskSerializer, CreateTaskSerializer, ColdTaskSerializer
+from .models import ColdTask, Task
+from .archive import load_cold_task, thaw_task
+from step.serializers import StepSerializer
+from step.compaction import compacted_steps
 from user.models import User
 from rest_framework.views import APIView
-from TODO_V2.mixins import GetDataMixin, ResponseBuilderMixin
+from TODO_V2.mixins import CostBudgetMixin, GetDataMixin, ResponseBuilderMixin
+from TODO_V2.idempotency import idempotent
+from TODO_V2.models import VersionConflict
+from TODO_V2.cache import render_fragments
 from user.views import AUTHENTICATION_REQUIRED, UNAUTHORIZED_RESPONSE, TOO_MANY_REQUESTS_RESPONSE
 import logging
 
@@ -602,7 +608,7 @@ logger = logging.getLogger(__name__)
     delete=extend_schema(
         tags=['Tasks'],
         summary='Delete task(s)',
-        description='Delete tasks in 3 modes\n\n1-Single task by ID\n\n2-Multiple tasks by comma-separated IDs\n\n3-All tasks with "all" keyword' + AUTHENTICATION_REQUIRED,
+        description='Delete tasks in 3 modes\n\n1-Single task by ID\n\n2-Multiple tasks by comma-separated IDs\n\n3-All tasks with "all" keyword\n\nDeleted tasks are moved to the trash and can be restored until they are purged' + AUTHENTICATION_REQUIRED,
 
         parameters=[
             OpenApiParameter(
@@ -738,7 +744,7 @@ logger = logging.getLogger(__name__)
         }
     )
 )
-class TaskView(APIView, GetDataMixin, ResponseBuilderMixin):
+class TaskView(CostBudgetMixin, APIView, GetDataMixin, ResponseBuilderMixin):
     permission_classes = (IsAuthenticated,)
     throttle_scope = 'tasks'
 
@@ -763,7 +769,7 @@ class TaskView(APIView, GetDataMixin, ResponseBuilderMixin):
             return self.build_response(
                 response_status=status.HTTP_200_OK,
                 message='Success',
-                tasks=serializer(request.user.tasks.all(), many=True).data,
+                tasks=render_fragments(request.user.tasks.all(), serializer),
             )
 
         try:
@@ -779,6 +785,7 @@ class TaskView(APIView, GetDataMixin, ResponseBuilderMixin):
                 message='Task not found',
             )
 
+    @idempotent
     def post(self, request):
         try:
             data = self.get_data(request, 'title')
@@ -809,6 +816,7 @@ class TaskView(APIView, GetDataMixin, ResponseBuilderMixin):
             data = self.get_data(request, 'task_id')
             if not self.is_id(data['task_id']):
                 raise ValidationError({'task_id': 'Invalid ID'})
+            expected_version = self.get_expected_version(request)
         except ValidationError as e:
             return self.build_response(
                 response_status=status.HTTP_400_BAD_REQUEST,
@@ -817,6 +825,7 @@ class TaskView(APIView, GetDataMixin, ResponseBuilderMixin):
 
         try:
             task = request.user.tasks.get(id=data['task_id'])
+            task.expected_version = expected_version
             serializer = CreateTaskSerializer(instance=task, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -835,6 +844,11 @@ class TaskView(APIView, GetDataMixin, ResponseBuilderMixin):
                 response_status=status.HTTP_404_NOT_FOUND,
                 message='Task not found',
             )
+        except VersionConflict:
+            return self.build_response(
+                response_status=status.HTTP_412_PRECONDITION_FAILED,
+                message='Task was modified by another request',
+            )
 
     def delete(self, request):
         try:
@@ -861,28 +875,24 @@ class TaskView(APIView, GetDataMixin, ResponseBuilderMixin):
 
         if ',' in data['task_id']:
             ids = filter(self.is_id, data['task_id'].split(','))
-            tasks = request.user.tasks.filter(id__in=ids)
-            if not tasks.exists():
+            to_delete_count, _ = request.user.tasks.filter(id__in=ids).delete()
+            if not to_delete_count:
                 return self.build_response(
                     response_status=status.HTTP_404_NOT_FOUND,
                     message='No task found to delete',
                 )
-            to_delete_count = tasks.count()
-            tasks.delete()
             return self.build_response(
                 response_status=status.HTTP_200_OK,
                 message=f'Deleted {to_delete_count} tasks successfully',
             )
 
         if data['task_id'] == 'all':
-            tasks = request.user.tasks.all()
-            if not tasks.exists():
+            task_count, _ = request.user.tasks.all().delete()
+            if not task_count:
                 return self.build_response(
                     response_status=status.HTTP_404_NOT_FOUND,
                     message='There is no task to delete',
                 )
-            task_count = tasks.count()
-            tasks.delete()
             return self.build_response(
                 response_status=status.HTTP_200_OK,
                 message=f'Deleted all({task_count}) tasks successfully',
@@ -892,3 +902,348 @@ class TaskView(APIView, GetDataMixin, ResponseBuilderMixin):
             response_status=status.HTTP_400_BAD_REQUEST,
             message='Invalid task_id parameter',
         )
+
+
+@extend_schema(
+    tags=['Tasks'],
+    summary='Restore deleted task(s)',
+    description='Restore tasks from the trash in 3 modes\n\n1-Single task by ID\n\n2-Multiple tasks by comma-separated IDs\n\n3-All deleted tasks with "all" keyword\n\nTasks are purged from the trash (with their steps) once TRASH_SETTINGS["RETENTION"] is over' + AUTHENTICATION_REQUIRED,
+
+    request={
+        'application/json': {
+            'type': 'object',
+            'properties': {
+                'task_id': {
+                    'type': 'string',
+                    'example': '1',
+                    'description': 'Task(s) ID(s)'
+                }
+            },
+            'required': ['task_id'],
+            'examples': {
+                'Single task restore request': {
+                    'value': {
+                        'task_id': '1'
+                    }
+                },
+                'Multiple tasks restore request': {
+                    'value': {
+                        'task_id': '1,2,3'
+                    }
+                },
+                'All tasks restore request': {
+                    'value': {
+                        'task_id': 'all'
+                    }
+                },
+            }
+        }
+    },
+
+    responses={
+        200: OpenApiResponse(
+            description='Task(s) restored successfully',
+            response=dict,
+            examples=[
+                OpenApiExample(
+                    'Tasks restored response',
+                    value={
+                        'message': 'Restored <NUMBER_RESTORED_TASKS> task(s) successfully'
+                    }
+                )
+            ]
+        ),
+        400: OpenApiResponse(
+            description='Failed to restore task(s)',
+            response=dict,
+            examples=[
+                OpenApiExample(
+                    'No task_id was provided',
+                    value={
+                        'task_id': 'this field is required'
+                    }
+                ),
+                OpenApiExample(
+                    'Bad task_id value',
+                    value={
+                        'message': 'Invalid task_id parameter'
+                    }
+                )
+            ]
+        ),
+        404: OpenApiResponse(
+            description='Task not found in the trash',
+            response=dict,
+            examples=[
+                OpenApiExample(
+                    'Task not found',
+                    value={
+                        'message': 'No deleted task found to restore'
+                    }
+                )
+            ]
+        ),
+        401: UNAUTHORIZED_RESPONSE,
+        429: TOO_MANY_REQUESTS_RESPONSE
+    }
+)
+class TaskRestoreView(CostBudgetMixin, APIView, GetDataMixin, ResponseBuilderMixin):
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'tasks'
+
+    def post(self, request):
+        try:
+            data = self.get_data(request, 'task_id')
+        except ValidationError as e:
+            return self.build_response(
+                response_status=status.HTTP_400_BAD_REQUEST,
+                **e.detail,
+            )
+
+        tasks = Task.trash.filter(user=request.user)
+        if self.is_id(data['task_id']):
+            tasks = tasks.filter(id=data['task_id'])
+        elif ',' in data['task_id']:
+            tasks = tasks.filter(id__in=filter(self.is_id, data['task_id'].split(',')))
+        elif data['task_id'] != 'all':
+            return self.build_response(
+                response_status=status.HTTP_400_BAD_REQUEST,
+                message='Invalid task_id parameter',
+            )
+
+        restored = tasks.restore()
+        if not restored:
+            return self.build_response(
+                response_status=status.HTTP_404_NOT_FOUND,
+                message='No deleted task found to restore',
+            )
+        return self.build_response(
+            response_status=status.HTTP_200_OK,
+            message=f'Restored {restored} task(s) successfully',
+        )
+
+
+@extend_schema_view(
+    get=extend_schema(
+        tags=['Tasks'],
+        summary='Get offloaded task(s)',
+        description='Archived tasks left untouched for TASK_ARCHIVE_SETTINGS["OFFLOAD_AFTER"] are moved to cold storage '
+                    'and no longer returned by the tasks endpoint. "all" lists them (without their content), '
+                    '"<ID>" returns a single one with its steps' + AUTHENTICATION_REQUIRED,
+
+        parameters=[
+            OpenApiParameter(
+                name='get',
+                description='"all" or "<ID>"',
+                required=True,
+                type=str,
+                examples=[
+                    OpenApiExample(
+                        'All offloaded tasks',
+                        value='all'
+                    ),
+                    OpenApiExample(
+                        'Single offloaded task',
+                        value='<ID>'
+                    )
+                ]
+            )
+        ],
+
+        responses={
+            200: OpenApiResponse(
+                description='Offloaded task(s) returned successfully',
+                response=dict,
+                examples=[
+                    OpenApiExample(
+                        'All offloaded tasks',
+                        value={
+                            'message': 'Success',
+                            'tasks': [
+                                {
+                                    'id': 1,
+                                    'title': 'Task 1',
+                                    'completed_at': '2025-01-01T12:00:00Z',
+                                    'offloaded_at': '2025-07-01T12:00:00Z'
+                                }
+                            ]
+                        }
+                    ),
+                    OpenApiExample(
+                        'Single offloaded task',
+                        value={
+                            'message': 'Success',
+                            'task': {
+                                'id': 1,
+                                'title': 'Task 1',
+                                'is_done': True,
+                                'is_archived': True,
+                                'completed_at': '2025-01-01T12:00:00Z',
+                            },
+                            'steps': []
+                        }
+                    )
+                ]
+            ),
+            400: OpenApiResponse(
+                description='Bad request',
+                response=dict,
+                examples=[
+                    OpenApiExample(
+                        'Invalid get parameter',
+                        value={
+                            'message': 'Invalid "get" parameter ("all" or "task_id")'
+                        }
+                    )
+                ]
+            ),
+            404: OpenApiResponse(
+                description='Task not found in cold storage',
+                response=dict,
+                examples=[
+                    OpenApiExample(
+                        'Task not found',
+                        value={
+                            'message': 'Task not found'
+                        }
+                    )
+                ]
+            ),
+            401: UNAUTHORIZED_RESPONSE,
+            429: TOO_MANY_REQUESTS_RESPONSE
+        }
+    ),
+    post=extend_schema(
+        tags=['Tasks'],
+        summary='Bring an offloaded task back',
+        description='Moves a task from cold storage back to the tasks endpoint, unarchived, with its steps' + AUTHENTICATION_REQUIRED,
+
+        request={
+            'application/json': {
+                'type': 'object',
+                'properties': {
+                    'task_id': {
+                        'type': 'string',
+                        'example': '1',
+                        'description': 'Task ID'
+                    }
+                },
+                'required': ['task_id'],
+            }
+        },
+
+        responses={
+            200: OpenApiResponse(
+                description='Task brought back successfully',
+                response=dict,
+                examples=[
+                    OpenApiExample(
+                        'Task brought back',
+                        value={
+                            'message': 'Task was brought back successfully',
+                            'task': {
+                                'id': 1,
+                                'title': 'Task 1',
+                                'is_done': True,
+                                'is_archived': False,
+                            }
+                        }
+                    )
+                ]
+            ),
+            400: OpenApiResponse(
+                description='Bad request',
+                response=dict,
+                examples=[
+                    OpenApiExample(
+                        'Invalid task_id',
+                        value={
+                            'message': 'Invalid task_id parameter'
+                        }
+                    )
+                ]
+            ),
+            404: OpenApiResponse(
+                description='Task not found in cold storage',
+                response=dict,
+                examples=[
+                    OpenApiExample(
+                        'Task not found',
+                        value={
+                            'message': 'Task not found'
+                        }
+                    )
+                ]
+            ),
+            401: UNAUTHORIZED_RESPONSE,
+            429: TOO_MANY_REQUESTS_RESPONSE
+        }
+    )
+)
+class TaskArchiveView(CostBudgetMixin, APIView, GetDataMixin, ResponseBuilderMixin):
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'tasks'
+
+    def get(self, request):
+        try:
+            data = self.get_data(request, 'get')
+        except ValidationError as e:
+            return self.build_response(
+                response_status=status.HTTP_400_BAD_REQUEST,
+                **e.detail,
+            )
+
+        if data['get'] == 'all':
+            return self.build_response(
+                response_status=status.HTTP_200_OK,
+                message='Success',
+                tasks=ColdTaskSerializer(request.user.cold_tasks.defer('data'), many=True).data,
+            )
+
+        if not self.is_id(data['get']):
+            return self.build_response(
+                response_status=status.HTTP_400_BAD_REQUEST,
+                message='Invalid "get" parameter ("all" or "task_id")',
+            )
+
+        try:
+            loaded = load_cold_task(request.user.cold_tasks.get(id=data['get']))
+        except ColdTask.DoesNotExist:
+            return self.build_response(
+                response_status=status.HTTP_404_NOT_FOUND,
+                message='Task not found',
+            )
+        return self.build_response(
+            response_status=status.HTTP_200_OK,
+            message='Success',
+            task=NormalTaskSerializer(loaded['task']).data,
+            steps=StepSerializer(loaded['steps'] + compacted_steps([loaded['task']]), many=True).data,
+        )
+
+    def post(self, request):
+        try:
+            data = self.get_data(request, 'task_id')
+        except ValidationError as e:
+            return self.build_response(
+                response_status=status.HTTP_400_BAD_REQUEST,
+                **e.detail,
+            )
+
+        if not self.is_id(data['task_id']):
+            return self.build_response(
+                response_status=status.HTTP_400_BAD_REQUEST,
+                message='Invalid task_id parameter',
+            )
+
+        try:
+            task = thaw_task(request.user.cold_tasks.get(id=data['task_id']))
+        except ColdTask.DoesNotExist:
+            return self.build_response(
+                response_status=status.HTTP_404_NOT_FOUND,
+                message='Task not found',
+            )
+        return self.build_response(
+            response_status=status.HTTP_200_OK,
+            message='Task was brought back successfully',
+            task=NormalTaskSerializer(task).data,
+        )
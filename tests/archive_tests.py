@@ -0,0 +1,163 @@
+from contextlib import contextmanager
+from datetime import timedelta
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from django_redis import get_redis_connection
+from rest_framework import status
+from rest_framework.test import APIClient
+from contact.models import Contact
+from step.models import Step
+from tag.models import Tag
+from task.archive import archive_tasks, archive_completed_tasks, offload_archived_tasks
+from task.models import ColdTask, Task
+from TODO_V2.events import event_channel
+from user.models import User
+import json
+import pytest
+
+
+TASK_URL = reverse('task:task-endpoints')
+ARCHIVE_URL = reverse('task:task-archive')
+
+
+@pytest.fixture
+def user():
+    user = User.objects.create_user(phone='09123456789')
+    yield user
+    get_redis_connection('default').delete(event_channel(user.id))
+
+
+def recorded_events(user):
+    return [
+        json.loads(fields[b'data']) for _, fields in get_redis_connection('default').xrange(event_channel(user.id))
+    ]
+
+
+@pytest.fixture
+def client(db, user, settings):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['tasks'] = '1000/sec'
+    return client
+
+
+def age(task, days):
+    # completed_at and updated_at `days` ago
+    moment = timezone.now() - timedelta(days=days)
+    Task.objects.filter(pk=task.pk).update(completed_at=moment, updated_at=moment)
+
+
+@pytest.fixture
+def old_task(user):
+    task = Task.objects.create(user=user, title='Old task', is_done=True)
+    Step.objects.create(task=task, title='Step 1', is_done=True)
+    Step.objects.create(task=task, title='Step 2', is_done=True)
+    task.tags.add(Tag.objects.create(user=user, name='Tag'))
+    task.contacts.add(Contact.objects.create(user=user, name='Contact'))
+    age(task, 40)
+    return Task.objects.get(pk=task.pk)
+
+
+@pytest.mark.django_db
+def test_archive_completed_tasks(user, old_task):
+    recent = Task.objects.create(user=user, title='Recent', is_done=True)
+    undone = Task.objects.create(user=user, title='Undone')
+    age(undone, 40)
+
+    assert archive_completed_tasks(timedelta(days=30), batch_size=1) == 1
+
+    archived = Task.objects.get(pk=old_task.pk)
+    assert archived.is_archived and archived.version == old_task.version + 1
+    assert archived.updated_at > old_task.updated_at, 'Cached fragments of archived tasks should be rebuilt'
+    assert not Task.objects.get(pk=recent.pk).is_archived
+    assert not Task.objects.get(pk=undone.pk).is_archived
+
+
+@pytest.mark.django_db
+def test_only_archived_tasks_are_reported(monkeypatch, user, old_task, django_capture_on_commit_callbacks):
+    other = Task.objects.create(user=user, title='Other task', is_done=True)
+    age(other, 40)
+    get_redis_connection('default').delete(event_channel(user.id))
+
+    atomic = transaction.atomic
+
+    @contextmanager
+    def archived_meanwhile():
+        # Another run archives one of the selected tasks first
+        Task.objects.filter(pk=other.pk).update(is_archived=True)
+        with atomic():
+            yield
+
+    monkeypatch.setattr('task.archive.transaction.atomic', archived_meanwhile)
+    with django_capture_on_commit_callbacks(execute=True):
+        assert archive_completed_tasks(timedelta(days=30), batch_size=10) == 1
+
+    assert recorded_events(user) == [{'model': 'task', 'action': 'updated', 'ids': [old_task.id]}]
+
+
+@pytest.mark.django_db
+def test_offloaded_tasks_are_not_reported_deleted(user, old_task, django_capture_on_commit_callbacks):
+    Task.objects.filter(pk=old_task.pk).update(is_archived=True)
+    get_redis_connection('default').delete(event_channel(user.id))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert offload_archived_tasks(timedelta(days=30), batch_size=10) == 1
+
+    assert recorded_events(user) == [{'model': 'task', 'action': 'offloaded', 'ids': [old_task.id]}]
+
+
+@pytest.mark.django_db
+def test_offload_and_fetch_on_demand(client, user, old_task):
+    Task.objects.filter(pk=old_task.pk).update(is_archived=True)
+    active = Task.objects.create(user=user, title='Active', is_archived=True)
+
+    assert offload_archived_tasks(timedelta(days=30), batch_size=10) == 1
+    assert list(Task.objects.values_list('id', flat=True)) == [active.id]
+    assert not Step.objects.exists(), 'Steps should move to cold storage with their task'
+
+    response = client.get(TASK_URL, data={'get': old_task.id, 'quick': 'false'})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    response = client.get(ARCHIVE_URL, data={'get': 'all'})
+    assert [task['id'] for task in response.json()['tasks']] == [old_task.id]
+
+    response = client.get(ARCHIVE_URL, data={'get': old_task.id})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['task']['title'] == 'Old task'
+    assert sorted(step['title'] for step in response.json()['steps']) == ['Step 1', 'Step 2']
+
+    response = client.get(ARCHIVE_URL, data={'get': 'a'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_bring_task_back(client, user, old_task):
+    Task.objects.filter(pk=old_task.pk).update(is_archived=True)
+    offload_archived_tasks(timedelta(days=30), batch_size=10)
+
+    response = client.post(ARCHIVE_URL, data={'task_id': old_task.id}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert not ColdTask.objects.exists()
+
+    task = Task.objects.get(pk=old_task.pk)
+    assert not task.is_archived and task.is_done
+    assert task.created_at == old_task.created_at and task.completed_at == old_task.completed_at
+    assert task.steps.count() == 2
+    assert list(task.tags.values_list('name', flat=True)) == ['Tag']
+    assert list(task.contacts.values_list('name', flat=True)) == ['Contact']
+
+    assert archive_completed_tasks(timedelta(days=30), batch_size=10) == 0, 'Tasks just brought back stay active'
+
+    response = client.post(ARCHIVE_URL, data={'task_id': old_task.id}, format='json')
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_archive_tasks_policy(settings, user, old_task):
+    settings.TASK_ARCHIVE_SETTINGS = {'ARCHIVE_AFTER': timedelta(days=30), 'OFFLOAD_AFTER': None}
+    assert archive_tasks() == {'archived': 1, 'offloaded': 0}
+
+    settings.TASK_ARCHIVE_SETTINGS = {'ARCHIVE_AFTER': None, 'OFFLOAD_AFTER': timedelta(0)}
+    assert archive_tasks() == {'archived': 0, 'offloaded': 1}
+    assert ColdTask.objects.get().user == user
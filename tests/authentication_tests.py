@@ -2,9 +2,15 @@ from datetime import timedelta
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
-from rest_framework_simplejwt.tokens import RefreshToken
-from user.models import User
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+from django.utils import timezone
+from user.models import SMS, User
 from user.otp import OTP
+from user.tokens import TOKEN_VERSION_CLAIM, RefreshToken, purge_expired_tokens, revoke_user_tokens
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
 from django.conf import settings
 from PIL import Image
 import pytest, tempfile, os
@@ -18,6 +24,12 @@ COMPLETE_AUTH_URL = reverse('user:complete-authentication')
 TOKEN_RENEW_URL = reverse('user:renew-token')
 EDIT_PROFILE_URL = reverse('user:edit-profile')
 
+def sent_token(phone):
+    # Only a digest of the token is stored, it's read back from the SMS sent to the user
+    sms = SMS.objects.filter(phone=phone).latest('id')
+    return settings.CIPHER.decrypt(sms.message.encode()).decode().rsplit(' ', 1)[-1]
+
+
 @pytest.fixture
 def client(db):
     settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['auth'] = '1000/sec'
@@ -141,9 +153,7 @@ def test_complete_authentication(client):
 
     # Test Valid Token
     otp = OTP(VALID_PHONE)
-    success, encrypted_token, extra = otp.restore_token()
-    assert success
-    decrypted = otp.encoder.decrypt(encrypted_token).decode()
+    decrypted = sent_token(VALID_PHONE)
 
     response = client.post(
         COMPLETE_AUTH_URL,
@@ -174,9 +184,7 @@ def test_token_renewal(client):
     )
     assert response.status_code == status.HTTP_200_OK
 
-    otp = OTP(VALID_PHONE)
-    success, encrypted_token, extra = otp.restore_token()
-    decrypted = otp.encoder.decrypt(encrypted_token).decode()
+    decrypted = sent_token(VALID_PHONE)
 
     response = client.post(
         COMPLETE_AUTH_URL,
@@ -284,4 +292,160 @@ def test_edit_profile(client):
         if os.path.exists(tmp_file_path):
             os.unlink(tmp_file_path)
         if hasattr(user, 'profile') and user.profile:
-            user.profile.delete()
\ No newline at end of file
+            user.profile.delete()
+
+@pytest.mark.django_db
+def test_outstanding_token_has_the_version_claim():
+    user = User.objects.create_user(phone=VALID_PHONE)
+    revoke_user_tokens(user)
+    refresh = RefreshToken.for_user(user)
+
+    stored = RefreshToken(OutstandingToken.objects.get(jti=refresh['jti']).token)
+    assert stored[TOKEN_VERSION_CLAIM] == user.token_version == 1, 'Stored token should carry the version claim'
+    assert stored.access_token[TOKEN_VERSION_CLAIM] == 1
+
+
+def login(client, user):
+    otp = OTP(user.phone)
+    otp.cancel_otp()
+    token = otp.generate_token()
+    otp.save_token(token, id=user.id)
+
+    response = client.post(COMPLETE_AUTH_URL, data={'phone': user.phone, 'token': token}, content_type=CONTENT_TYPE)
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()['auth']
+
+
+@pytest.mark.django_db
+def test_login_revokes_previous_tokens(client, django_assert_num_queries):
+    user = User.objects.create_user(phone=VALID_PHONE)
+    old_refresh = RefreshToken.for_user(user)
+    old_access = old_refresh.access_token
+    for _ in range(20):
+        RefreshToken.for_user(user)
+
+    with django_assert_num_queries(2):  # UPDATE + reading the new version back
+        assert revoke_user_tokens(user) == 1
+    assert not BlacklistedToken.objects.exists(), 'Revoking should not write a row per token'
+
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {old_access}')
+    response = client.patch(EDIT_PROFILE_URL, data={'name': 'name'})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.post(TOKEN_RENEW_URL, data={'refresh': str(old_refresh)}, content_type=CONTENT_TYPE)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    # Login revokes the tokens issued after the previous login
+    client.credentials()
+    first = login(client, user)
+    second = login(client, user)
+
+    response = client.post(TOKEN_RENEW_URL, data={'refresh': first['refresh']}, content_type=CONTENT_TYPE)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.post(TOKEN_RENEW_URL, data={'refresh': second['refresh']}, content_type=CONTENT_TYPE)
+    assert response.status_code == status.HTTP_200_OK
+
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.json()["auth"]["access"]}')
+    response = client.patch(EDIT_PROFILE_URL, data={'name': 'name'})
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_logout_everywhere(client):
+    user = User.objects.create_user(phone=VALID_PHONE)
+    refresh = RefreshToken.for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    response = client.post(reverse('user:logout-everywhere'))
+    assert response.status_code == status.HTTP_200_OK
+    user.refresh_from_db()
+    assert user.token_version == 1
+
+    response = client.post(reverse('user:logout-everywhere'))
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.post(TOKEN_RENEW_URL, data={'refresh': str(refresh)}, content_type=CONTENT_TYPE)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_purge_expired_tokens():
+    user = User.objects.create_user(phone=VALID_PHONE)
+    for _ in range(5):
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=RefreshToken.for_user(user)['jti']))
+    active = RefreshToken.for_user(user)
+    OutstandingToken.objects.exclude(jti=active['jti']).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    assert purge_expired_tokens(batch_size=2) == (5, 5)
+    assert list(OutstandingToken.objects.values_list('jti', flat=True)) == [active['jti']]
+    assert purge_expired_tokens(batch_size=2) == (0, 0)
+
+    out = StringIO()
+    call_command('purge_tokens', '--no-vacuum', stdout=out)
+    assert 'Removed 0 outstanding and 0 blacklisted tokens' in out.getvalue()
+    assert OutstandingToken._meta.db_table in out.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_purge_tokens_vacuums_tables():
+    out = StringIO()
+    call_command('purge_tokens', stdout=out)
+    assert 'Removed 0 outstanding and 0 blacklisted tokens' in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_token_renewal_looks_up_jti(client):
+    user = User.objects.create_user(phone=VALID_PHONE)
+    refresh = RefreshToken.for_user(user)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(TOKEN_RENEW_URL, data={'refresh': str(refresh)}, content_type=CONTENT_TYPE)
+    assert response.status_code == status.HTTP_200_OK
+    assert not any(str(refresh) in query['sql'] for query in queries), 'Tokens should be looked up by their jti'
+
+    # Purged (or never issued) tokens can't be renewed
+    OutstandingToken.objects.filter(jti=refresh['jti']).delete()
+    response = client.post(TOKEN_RENEW_URL, data={'refresh': str(refresh)}, content_type=CONTENT_TYPE)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_authenticated_user_is_cached(client, settings):
+    user = User.objects.create_user(phone=VALID_PHONE)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    url = reverse('task:task-endpoints')
+
+    def count_queries():
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(url, {'get': 'all', 'quick': 'false'}).status_code == status.HTTP_200_OK
+        return len(queries)
+
+    settings.USER_CACHE_SETTINGS = {**settings.USER_CACHE_SETTINGS, 'ENABLED': False}
+    uncached = count_queries()
+
+    settings.USER_CACHE_SETTINGS = {**settings.USER_CACHE_SETTINGS, 'ENABLED': True}
+    count_queries()
+    assert count_queries() == uncached - 1, 'User should be loaded from the cache'
+
+    # Saves invalidate the cached user
+    user.is_active = False
+    user.save()
+    assert client.get(url, {'get': 'all', 'quick': 'false'}).status_code == status.HTTP_401_UNAUTHORIZED
+
+    user.is_active = True
+    user.save()
+    assert client.get(url, {'get': 'all', 'quick': 'false'}).status_code == status.HTTP_200_OK
+
+    user.delete()
+    assert client.get(url, {'get': 'all', 'quick': 'false'}).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_phone_change_invalidates_cached_user(client):
+    user = User.objects.create_user(phone=VALID_PHONE)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    url = reverse('task:task-endpoints')
+    assert client.get(url, {'get': 'all', 'quick': 'false'}).status_code == status.HTTP_200_OK
+
+    user.phone = '09987654321'
+    user.save()
+    assert client.get(url, {'get': 'all', 'quick': 'false'}).status_code == status.HTTP_401_UNAUTHORIZED, \
+        'Tokens of the old phone number should stop working right away'
@@ -0,0 +1,138 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from task.models import Task
+from tag.models import Tag
+from user.models import User
+from django.conf import settings
+import pytest
+
+
+BATCH_URL = reverse('batch')
+TASK_URL = reverse('task:task-endpoints')
+TAG_URL = reverse('tag:tag-endpoints')
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(phone='09123456789')
+
+
+@pytest.fixture
+def client(user):
+    for scope in ('batch', 'tasks', 'tags'):
+        settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope] = '1000/sec'
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.mark.django_db
+def test_batch_runs_operations_in_order(client, user):
+    response = client.post(BATCH_URL, {
+        'operations': [
+            {'method': 'POST', 'path': TASK_URL, 'body': {'title': 'Task 1'}},
+            {'method': 'POST', 'path': TASK_URL, 'body': {'title': 'Task 2'}},
+            {'method': 'POST', 'path': TAG_URL, 'body': {'action': 'create', 'name': 'Tag'}},
+            {'method': 'GET', 'path': TASK_URL, 'body': {'get': 'all', 'quick': 'true'}},
+        ]
+    }, format='json')
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data['committed']
+    assert [result['status'] for result in data['results']] == [201, 201, 201, 200]
+    assert sorted(task['title'] for task in data['results'][3]['body']['tasks']) == ['Task 1', 'Task 2']
+    assert user.tasks.count() == 2
+    assert Tag.objects.filter(user=user).count() == 1
+
+    task_id = data['results'][0]['body']['task']['id']
+    response = client.post(BATCH_URL, {
+        'operations': [
+            {'method': 'PATCH', 'path': TASK_URL, 'body': {'task_id': task_id, 'title': 'Changed'}},
+            {'method': 'DELETE', 'path': TASK_URL, 'body': {'task_id': task_id}},
+        ]
+    }, format='json')
+    assert [result['status'] for result in response.json()['results']] == [200, 200]
+    assert list(user.tasks.values_list('title', flat=True)) == ['Task 2']
+
+
+@pytest.mark.django_db
+def test_atomic_batch_is_rolled_back(client, user):
+    response = client.post(BATCH_URL, {
+        'operations': [
+            {'method': 'POST', 'path': TASK_URL, 'body': {'title': 'Task'}},
+            {'method': 'PATCH', 'path': TASK_URL, 'body': {'task_id': 10 ** 6, 'title': 'Missing'}},
+            {'method': 'POST', 'path': TASK_URL, 'body': {'title': 'Skipped'}},
+        ]
+    }, format='json')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    data = response.json()
+    assert not data['committed']
+    assert [result['status'] for result in data['results']] == [201, 404], 'Operations after a failure are skipped'
+    assert not user.tasks.exists(), 'Changes of an atomic batch should be rolled back'
+
+
+@pytest.mark.django_db
+def test_non_atomic_batch_commits_each_operation(client, user):
+    response = client.post(BATCH_URL, {
+        'atomic': False,
+        'operations': [
+            {'method': 'POST', 'path': TASK_URL, 'body': {'title': 'Task'}},
+            {'method': 'PATCH', 'path': TASK_URL, 'body': {'task_id': 10 ** 6, 'title': 'Missing'}},
+            {'method': 'POST', 'path': TASK_URL, 'body': {}},
+            {'method': 'POST', 'path': TASK_URL, 'body': {'title': 'Task 2'}},
+        ]
+    }, format='json')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [result['status'] for result in response.json()['results']] == [201, 404, 400, 201]
+    assert user.tasks.count() == 2
+
+
+@pytest.mark.django_db
+def test_batch_rejects_invalid_operations(client):
+    assert client.post(BATCH_URL, {}, format='json').status_code == status.HTTP_400_BAD_REQUEST
+    assert client.post(BATCH_URL, {'operations': [{'method': 'PUT', 'path': TASK_URL}]}, format='json') \
+        .status_code == status.HTTP_400_BAD_REQUEST
+    assert client.post(BATCH_URL, {'operations': [{'method': 'GET', 'path': TASK_URL}] * 51}, format='json') \
+        .status_code == status.HTTP_400_BAD_REQUEST
+    for atomic in ('false', 0, '0', None):
+        response = client.post(BATCH_URL, {'atomic': atomic, 'operations': [{'method': 'GET', 'path': TASK_URL}]},
+                               format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {'atomic': 'must be a boolean.'}
+
+    response = client.post(BATCH_URL, {
+        'atomic': False,
+        'operations': [
+            {'method': 'POST', 'path': reverse('user:logout-everywhere')},
+            {'method': 'POST', 'path': BATCH_URL, 'body': {'operations': []}},
+            {'method': 'GET', 'path': '/api/v2/missing/'},
+        ]
+    }, format='json')
+    assert [result['status'] for result in response.json()['results']] == [400, 400, 404]
+
+
+@pytest.mark.django_db
+def test_batch_operations_are_not_rate_limited_per_scope(client, user, monkeypatch):
+    monkeypatch.setitem(settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'tasks', '2/min')
+
+    response = client.post(BATCH_URL, {
+        'operations': [{'method': 'POST', 'path': TASK_URL, 'body': {'title': f'Task {i}'}} for i in range(20)]
+    }, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert [result['status'] for result in response.json()['results']] == [201] * 20
+    assert user.tasks.count() == 20
+
+    # The batch didn't use up the tasks rate
+    for _ in range(2):
+        assert client.post(TASK_URL, {'title': 'Task'}, format='json').status_code == status.HTTP_201_CREATED
+    assert client.post(TASK_URL, {'title': 'Task'}, format='json').status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+
+@pytest.mark.django_db
+def test_batch_requires_authentication():
+    response = APIClient().post(BATCH_URL, {'operations': [{'method': 'GET', 'path': TASK_URL}]}, format='json')
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
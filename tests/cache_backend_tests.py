@@ -0,0 +1,157 @@
+from django.conf import settings
+from django.core.cache import caches
+from django_redis import get_redis_connection
+from TODO_V2.throttling import ScopedRateThrottle
+from user.otp import OTP
+from django_redis.exceptions import CompressorError
+from TODO_V2.cache_backends import TwoTierRedisCache, LocalMemoryTier, ThresholdCompressor
+from time import sleep
+import pytest
+
+
+def build_cache(options=None, **local_cache):
+    return TwoTierRedisCache(
+        settings.CACHES['default']['LOCATION'],
+        {
+            'KEY_PREFIX': 'test-two-tier',
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'LOCAL_CACHE': {'CHANNEL': 'test-cache-invalidation', **local_cache},
+                **(options or {}),
+            },
+        }
+    )
+
+
+def wait_for_subscription(*caches):
+    for cache in caches:
+        cache.get('warm-up')
+        assert cache._subscribed.wait(2), 'Failed to subscribe to the invalidation channel'
+
+
+@pytest.fixture
+def cache():
+    cache = build_cache()
+    wait_for_subscription(cache)
+    yield cache
+    cache.delete_pattern('*')
+
+
+def test_local_tier_lru_and_expiration():
+    local = LocalMemoryTier(max_entries=2, timeout=0.2)
+    local.set('a', 1)
+    local.set('b', 2)
+    local.get('a')
+    local.set('c', 3)
+
+    assert local.get('a') == (True, 1)
+    assert local.get('b') == (False, None), 'Least recently used entry should be evicted'
+    assert len(local) == 2
+
+    sleep(.3)
+    assert local.get('a') == (False, None), 'Entries should expire after the local timeout'
+
+
+def test_get_is_served_locally(cache):
+    cache.set('key', {'value': 1})
+    assert cache.get('key') == {'value': 1}
+
+    # Bypass the backend so no invalidation is published
+    cache.client.get_client().set(cache.client.make_key('key'), cache.client.encode({'value': 2}))
+    assert cache.get('key') == {'value': 1}, 'Hot key should be served from process memory'
+
+    cache.set('key', {'value': 3})
+    assert cache.get('key') == {'value': 3}
+
+
+def test_local_values_are_not_shared(cache):
+    cache.set('otp', {'token': 'secret', 'id': 1})
+    data = cache.get('otp')
+    data.pop('token')
+
+    assert cache.get('otp') == {'token': 'secret', 'id': 1}
+
+
+def test_local_tier_respects_redis_ttl(cache):
+    cache.set('short', 'value', timeout=0.5)
+    assert cache.get('short') == 'value'
+    sleep(.6)
+    assert cache.get('short') is None
+
+
+def test_local_tier_survives_idle_channel():
+    # The socket timeout of the pool shouldn't break the subscription while nothing is published
+    cache = build_cache({
+        'CONNECTION_FACTORY': 'TODO_V2.cache_backends.NamedPoolConnectionFactory',
+        'CONNECTION_POOL_NAME': 'test-idle-channel',
+        'SOCKET_TIMEOUT': 0.3,
+    }, TIMEOUT=10)
+    wait_for_subscription(cache)
+    try:
+        cache.set('idle', 'value')
+        assert cache.get('idle') == 'value'
+        generation = cache._generation
+
+        sleep(1.5)
+        cache.client.get_client().set(cache.client.make_key('idle'), cache.client.encode('changed'))
+        assert cache._subscribed.is_set() and cache._generation == generation
+        assert cache.get('idle') == 'value', 'Local tier should not be dropped while the channel is idle'
+    finally:
+        cache.delete_pattern('*')
+
+
+def test_get_many(cache):
+    cache.set_many({'a': 1, 'b': 'two'})
+    cache.get('a')
+
+    assert cache.get_many(['a', 'b', 'c']) == {'a': 1, 'b': 'two'}
+
+
+def test_invalidation_across_processes(cache):
+    other = build_cache()
+    wait_for_subscription(other)
+
+    cache.set('shared', 'old')
+    assert other.get('shared') == 'old'
+
+    cache.set('shared', 'new')
+    sleep(.1)
+    assert other.get('shared') == 'new', 'Write on one node should invalidate the others'
+
+    cache.delete('shared')
+    sleep(.1)
+    assert other.get('shared') is None
+
+    other.set('counter', 1)
+    assert cache.get('counter') == 1
+    other.incr('counter')
+    sleep(.1)
+    assert cache.get('counter') == 2
+
+
+def test_threshold_compressor():
+    compressor = ThresholdCompressor({
+        'COMPRESSOR_CLASS': 'django_redis.compressors.zlib.ZlibCompressor',
+        'COMPRESS_MIN_LENGTH': 100,
+    })
+    small = b'x' * 100
+    large = b'x' * 1000
+
+    assert compressor.compress(small) == small, 'Values under the threshold should be stored as is'
+    with pytest.raises(CompressorError):
+        compressor.decompress(small)
+
+    compressed = compressor.compress(large)
+    assert len(compressed) < len(large)
+    assert compressor.decompress(compressed) == large
+
+
+def test_workloads_use_their_own_alias_and_pool():
+    assert OTP('09123456789').cache is caches['otp']
+    assert ScopedRateThrottle.cache._alias == 'throttle'
+
+    pools = {
+        alias: get_redis_connection(alias).connection_pool
+        for alias in ('default', 'otp', 'throttle', 'responses')
+    }
+    assert len({id(pool) for pool in pools.values()}) == len(pools), 'Every alias should have its own pool'
@@ -0,0 +1,125 @@
+from django.core.cache import caches
+from step.models import Step
+from step.serializers import StepSerializer
+from task.models import Task
+from task.serializers import NormalTaskSerializer, QuickTaskSerializer
+from user.models import User
+from TODO_V2.cache import render_fragments, fragment_key, single_flight, invalidate_single_flight
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep, time
+import pytest
+
+
+cache = caches['responses']
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(phone='09123456789')
+
+
+@pytest.fixture
+def tasks(user):
+    for i in range(3):
+        Task.objects.create(title=f'Task {i}', user=user)
+    tasks = user.tasks.all()
+    yield tasks
+    cache.delete_many([fragment_key(task, s) for task in tasks for s in (NormalTaskSerializer, QuickTaskSerializer)])
+
+
+@pytest.mark.django_db
+def test_render_fragments_matches_serializer(tasks):
+    assert render_fragments(tasks, NormalTaskSerializer) == NormalTaskSerializer(tasks, many=True).data
+    assert render_fragments(tasks, QuickTaskSerializer) == QuickTaskSerializer(tasks, many=True).data
+
+
+@pytest.mark.django_db
+def test_render_fragments_stores_each_row(tasks):
+    render_fragments(tasks, NormalTaskSerializer)
+
+    for task in tasks:
+        assert cache.get(fragment_key(task, NormalTaskSerializer)) == NormalTaskSerializer(task).data
+        assert cache.get(fragment_key(task, QuickTaskSerializer)) is None
+
+
+@pytest.mark.django_db
+def test_render_fragments_rerenders_changed_rows(tasks):
+    render_fragments(tasks, NormalTaskSerializer)
+
+    task = tasks[0]
+    old_key = fragment_key(task, NormalTaskSerializer)
+    task.title = 'Changed'
+    task.save()
+
+    assert fragment_key(task, NormalTaskSerializer) != old_key
+
+    result = render_fragments(Task.objects.filter(user=task.user), NormalTaskSerializer)
+    assert [row['title'] for row in result] == [t.title for t in Task.objects.filter(user=task.user)]
+    cache.delete(fragment_key(task, NormalTaskSerializer))
+
+
+@pytest.mark.django_db
+def test_render_fragments_steps(user):
+    task = Task.objects.create(title='Task', user=user)
+    Step.objects.create(title='Step 1', task=task)
+    Step.objects.create(title='Step 2', task=task)
+
+    steps = task.steps.all()
+    assert render_fragments(steps, StepSerializer) == StepSerializer(steps, many=True).data
+    cache.delete_many([fragment_key(step, StepSerializer) for step in steps])
+
+
+@pytest.fixture
+def flight_key(request):
+    key = f'test-single-flight-{request.node.name[:30]}'
+    invalidate_single_flight(key)
+    yield key
+    invalidate_single_flight(key)
+    cache.delete(f'{key}-lock')
+
+
+def test_single_flight_caches_value(flight_key):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'count': len(calls)}
+
+    assert single_flight(flight_key, compute, timeout=60) == {'count': 1}
+    assert single_flight(flight_key, compute, timeout=60) == {'count': 1}
+    assert len(calls) == 1
+
+
+def test_single_flight_rebuilds_once_under_concurrency(flight_key):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        sleep(.3)
+        return 'value'
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(lambda _: single_flight(flight_key, compute, timeout=60), range(10)))
+
+    assert results == ['value'] * 10
+    assert len(calls) == 1, 'Only one worker should rebuild the key'
+
+
+def test_single_flight_serves_stale_value_while_rebuilding(flight_key):
+    cache.set(flight_key, {'value': 'stale', 'delta': 0, 'expires_at': time() - 1}, 60)
+    cache.add(f'{flight_key}-lock', 'another-worker', 10)
+
+    assert single_flight(flight_key, lambda: 'fresh', timeout=60) == 'stale'
+
+    cache.delete(f'{flight_key}-lock')
+    assert single_flight(flight_key, lambda: 'fresh', timeout=60) == 'fresh'
+
+
+def test_single_flight_early_expiration(flight_key):
+    # A slow computation close to its expiration is almost certainly rebuilt early
+    cache.set(flight_key, {'value': 'old', 'delta': 10 ** 6, 'expires_at': time() + 1}, 60)
+    assert single_flight(flight_key, lambda: 'new', timeout=60) == 'new'
+
+    # With beta=0 values are only rebuilt once they expire
+    cache.set(flight_key, {'value': 'old', 'delta': 100, 'expires_at': time() + 1}, 60)
+    assert single_flight(flight_key, lambda: 'new', timeout=60, beta=0) == 'old'
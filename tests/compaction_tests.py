@@ -0,0 +1,148 @@
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from step.compaction import compact_steps, expand_steps
+from step.models import Step
+from task.models import Task
+from user.models import User
+from TODO_V2.models import VersionConflict
+import pytest
+
+
+STEPS_URL = reverse('step:step-endpoints')
+TASK_URL = reverse('task:task-endpoints')
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(phone='09123456789')
+
+
+@pytest.fixture
+def client(db, user, settings):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['tasks'] = '1000/sec'
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['steps'] = '1000/sec'
+    return client
+
+
+@pytest.fixture
+def done_task(user):
+    task = Task.objects.create(user=user, title='Done task', is_done=True)
+    for i in range(3):
+        Step.objects.create(task=task, title=f'Step {i}', is_done=True)
+    Task.objects.filter(pk=task.pk).update(completed_at=timezone.now() - timedelta(days=40))
+    return Task.objects.get(pk=task.pk)
+
+
+@pytest.fixture
+def active_task(user):
+    task = Task.objects.create(user=user, title='Active task')
+    Step.objects.create(task=task, title='Active step')
+    return task
+
+
+@pytest.fixture
+def compacted(done_task, active_task):
+    steps = list(done_task.steps.all())
+    assert compact_steps(timedelta(days=30), batch_size=1) == 3
+    return steps
+
+
+@pytest.mark.django_db
+def test_compact_steps(done_task, active_task, compacted):
+    assert list(Step.objects.values_list('title', flat=True)) == ['Active step']
+
+    task = Task.objects.get(pk=done_task.pk)
+    assert [row['id'] for row in task.compacted_steps] == [step.id for step in compacted]
+    assert task.updated_at > done_task.updated_at and task.version == done_task.version + 1
+
+    assert compact_steps(timedelta(days=30)) == 0
+
+    assert expand_steps([task]) == 3
+    assert task.compacted_steps is None and Task.objects.get(pk=task.pk).compacted_steps is None
+    assert [(step.id, step.created_at, step.updated_at) for step in done_task.steps.all()] == [
+        (step.id, step.created_at, step.updated_at) for step in compacted
+    ]
+
+
+@pytest.mark.django_db
+def test_stale_save_keeps_compacted_steps(done_task, active_task):
+    stale = Task.objects.get(pk=done_task.pk)
+    conditional = Task.objects.get(pk=done_task.pk)
+    assert compact_steps(timedelta(days=30)) == 3
+
+    stale.title = 'Renamed'
+    stale.save()
+    task = Task.objects.get(pk=done_task.pk)
+    assert task.title == 'Renamed'
+    assert len(task.compacted_steps) == 3, 'A save of a copy read before the compaction should not drop the steps'
+
+    conditional.expected_version = conditional.version
+    conditional.title = 'Stale'
+    with pytest.raises(VersionConflict):
+        conditional.save()
+
+    # Reopening a stale copy still brings the steps back
+    stale.is_done = False
+    stale.save()
+    assert done_task.steps.count() == 3 and Task.objects.get(pk=done_task.pk).compacted_steps is None
+
+
+@pytest.mark.django_db
+def test_compacted_steps_are_returned(client, done_task, compacted):
+    expected = [(step.id, step.title) for step in compacted]
+
+    response = client.get(STEPS_URL, data={'get': f'task:{done_task.id}'})
+    assert [(step['id'], step['title']) for step in response.json()['steps']] == expected
+
+    response = client.get(STEPS_URL, data={'get': 'all'})
+    assert [step['title'] for step in response.json()['steps']] == ['Active step'] + [title for _, title in expected]
+
+    response = client.get(STEPS_URL, data={'get': compacted[0].id})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['step']['title'] == compacted[0].title
+
+    response = client.get(TASK_URL, data={'get': done_task.id, 'quick': 'false'})
+    assert 'compacted_steps' not in response.json()['task']
+
+
+@pytest.mark.django_db
+def test_uncomplete_expands_steps(client, done_task, compacted):
+    response = client.patch(TASK_URL, data={'task_id': done_task.id, 'is_done': False}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+
+    assert done_task.steps.count() == 3
+    assert Task.objects.get(pk=done_task.pk).compacted_steps is None
+
+
+@pytest.mark.django_db
+def test_changing_a_compacted_step(client, done_task, compacted):
+    response = client.patch(STEPS_URL, data={'step_id': compacted[0].id, 'title': 'Changed'}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert Step.objects.get(pk=compacted[0].id).title == 'Changed'
+    assert done_task.steps.count() == 3, 'The steps of the task should be expanded'
+
+    compact_steps(timedelta(days=30))
+    response = client.delete(STEPS_URL, data={'selector': compacted[1].id}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert sorted(done_task.steps.values_list('id', flat=True)) == sorted([compacted[0].id, compacted[2].id])
+
+    compact_steps(timedelta(days=30))
+    response = client.delete(STEPS_URL, data={'selector': 'all'}, format='json')
+    assert response.json()['message'] == 'Deleted all(3) step(s) successfully'
+    assert not Step.objects.exists() and Task.objects.get(pk=done_task.pk).compacted_steps is None
+
+
+@pytest.mark.django_db
+def test_compacted_steps_follow_their_task_to_cold_storage(client, done_task, compacted):
+    from task.archive import offload_archived_tasks
+
+    Task.objects.filter(pk=done_task.pk).update(is_archived=True)
+    assert offload_archived_tasks(timedelta(0), batch_size=10) == 1
+
+    response = client.get(reverse('task:task-archive'), data={'get': done_task.id})
+    assert [step['id'] for step in response.json()['steps']] == [step.id for step in compacted]
@@ -1,6 +1,13 @@
 from time import sleep
 from django.core.cache import cache
 from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from cryptography.fernet import Fernet, MultiFernet
+from base64 import urlsafe_b64encode
+from io import StringIO
+import hashlib
+import hmac
 import pytest
 
 
@@ -30,3 +37,33 @@ def test_encryption(data, expected):
     decrypted_data = CIPHER.decrypt(encrypted_data).decode()
 
     assert decrypted_data == expected
+
+
+def test_cipher_key_rotation():
+    out = StringIO()
+    call_command('cipher_keys', 'generate', stdout=out)
+    old_keys = out.getvalue().strip().removeprefix('CIPHER_KEYS=').split(',')
+    assert len(old_keys) == 1
+
+    old_cipher = MultiFernet([Fernet(key) for key in old_keys])
+    encrypted_data = old_cipher.encrypt(b'1234')
+
+    out = StringIO()
+    with override_settings(CIPHER_KEYS=old_keys):
+        call_command('cipher_keys', 'rotate', stdout=out)
+    new_keys = out.getvalue().strip().removeprefix('CIPHER_KEYS=').split(',')
+    assert len(new_keys) == 2
+    assert new_keys[1:] == old_keys, 'Current keys should be kept after the new primary key'
+
+    new_cipher = MultiFernet([Fernet(key) for key in new_keys])
+    assert new_cipher.decrypt(encrypted_data) == b'1234', 'Rotated ring should decrypt values of the old ring'
+    assert Fernet(new_keys[0]).decrypt(new_cipher.rotate(encrypted_data)) == b'1234', \
+        'Rotated values should be encrypted with the new primary key'
+
+
+def test_cipher_key_is_derived_from_secret_key():
+    assert not settings.CIPHER_KEYS
+    # What another process with the same SECRET_KEY would use
+    key = urlsafe_b64encode(hmac.new(settings.SECRET_KEY.encode(), b'TODO_V2.CIPHER', hashlib.sha256).digest())
+    assert Fernet(key).decrypt(CIPHER.encrypt(b'1234')) == b'1234', \
+        'Every process should share the key when CIPHER_KEYS is not set'
@@ -0,0 +1,195 @@
+from asgiref.sync import async_to_sync
+from django.db import transaction
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django_redis import get_redis_connection
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework import status
+from step.compaction import compact_steps, expand_steps
+from step.models import Step
+from tag.models import Tag
+from contact.models import Contact
+from task.models import Task
+from user.models import User
+from user.tokens import RefreshToken
+from TODO_V2.events import event_channel, event_stream, publish_event
+from TODO_V2.trash import purge_trash
+import asyncio
+import json
+import pytest
+
+
+EVENTS_URL = reverse('events')
+
+
+@pytest.fixture
+def user():
+    user = User.objects.create_user(phone='09123456789')
+    yield user
+    get_redis_connection('default').delete(event_channel(user.id))
+
+
+def recorded_events(user):
+    return [
+        json.loads(fields[b'data']) for _, fields in get_redis_connection('default').xrange(event_channel(user.id))
+    ]
+
+
+async def read_events(stream, count):
+    events = []
+    while len(events) < count:
+        chunk = await asyncio.wait_for(anext(stream), 2)
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith('id:'):
+            events.append(chunk)
+    return events
+
+
+@pytest.mark.django_db
+def test_changes_are_published_on_commit(user, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            task = Task.objects.create(user=user, title='Task')
+            steps = [Step.objects.create(task=task, title=f'Step {i}') for i in range(2)]
+            task.title = 'Changed'
+            task.save()
+
+    assert recorded_events(user) == [
+        {'model': 'task', 'action': 'created', 'ids': [task.id]},
+        {'model': 'step', 'action': 'created', 'ids': [step.id for step in steps]},
+        {'model': 'task', 'action': 'updated', 'ids': [task.id]},
+    ], 'Events of a transaction should be grouped by model and action'
+
+    step_id = steps[0].id
+    with django_capture_on_commit_callbacks(execute=True):
+        tag = Tag.objects.create(user=user, name='Tag')
+        tag.tasks.add(task)
+        Task.objects.filter(user=user).delete()
+        Task.trash.filter(user=user).restore()
+        steps[0].delete()
+
+    assert recorded_events(user)[3:] == [
+        {'model': 'tag', 'action': 'created', 'ids': [tag.id]},
+        {'model': 'tag', 'action': 'updated', 'ids': [tag.id]},
+        {'model': 'task', 'action': 'deleted', 'ids': [task.id]},
+        {'model': 'task', 'action': 'restored', 'ids': [task.id]},
+        {'model': 'step', 'action': 'deleted', 'ids': [step_id]},
+    ]
+
+
+@pytest.mark.django_db
+def test_rolled_back_changes_are_not_published(user, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        task = Task.objects.create(user=user, title='Task')
+        try:
+            with transaction.atomic():
+                Step.objects.create(task=task, title='Step')
+                raise ValueError
+        except ValueError:
+            pass
+
+    assert recorded_events(user) == [{'model': 'task', 'action': 'created', 'ids': [task.id]}]
+
+
+@pytest.mark.django_db
+def test_hard_deletes_are_published(user, settings, django_capture_on_commit_callbacks):
+    settings.TRASH_SETTINGS = {**settings.TRASH_SETTINGS, 'ENABLED': False}
+    with django_capture_on_commit_callbacks(execute=True):
+        task = Task.objects.create(user=user, title='Task')
+        Step.objects.create(task=task, title='Step')
+        contacts = [Contact.objects.create(user=user, name=f'Contact {i}') for i in range(2)]
+    get_redis_connection('default').delete(event_channel(user.id))
+
+    task_id = task.id
+    with django_capture_on_commit_callbacks(execute=True):
+        task.delete()
+        Contact.objects.filter(user=user).delete()
+
+    assert recorded_events(user) == [
+        {'model': 'task', 'action': 'deleted', 'ids': [task_id]},
+        {'model': 'contact', 'action': 'deleted', 'ids': [contact.id for contact in contacts]},
+    ], 'Steps deleted along with their task should not be reported'
+
+
+@pytest.mark.django_db
+def test_purged_rows_are_not_reported_twice(user, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        task = Task.objects.create(user=user, title='Task')
+        task.delete()
+    with django_capture_on_commit_callbacks(execute=True):
+        Task.trash.filter(pk=task.pk).update(deleted_at=timezone.now() - timedelta(days=40))
+        assert purge_trash(older_than=timedelta(days=30)) == {'task.Task': 1, 'contact.Contact': 0}
+
+    assert recorded_events(user) == [
+        {'model': 'task', 'action': 'created', 'ids': [task.id]},
+        {'model': 'task', 'action': 'deleted', 'ids': [task.id]},
+    ]
+
+
+@pytest.mark.django_db
+def test_compaction_only_reports_the_task(user, django_capture_on_commit_callbacks):
+    task = Task.objects.create(user=user, title='Task', is_done=True)
+    for i in range(3):
+        Step.objects.create(task=task, title=f'Step {i}')
+    Task.objects.filter(pk=task.pk).update(completed_at=timezone.now() - timedelta(days=40))
+    get_redis_connection('default').delete(event_channel(user.id))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert compact_steps(timedelta(days=30)) == 3
+    assert recorded_events(user) == [{'model': 'task', 'action': 'updated', 'ids': [task.id]}], \
+        'Compacted steps still exist for clients'
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert expand_steps(Task.objects.filter(pk=task.pk)) == 3
+    assert len(recorded_events(user)) == 1, 'Expanded steps are not new to clients'
+
+
+@pytest.mark.django_db
+def test_event_stream_resumes_after_last_event_id(user):
+    first = publish_event(user.id, 'task', 'created', [1])
+    publish_event(user.id, 'task', 'updated', [1])
+
+    @async_to_sync
+    async def read():
+        stream = event_stream(user.id, last_event_id=first)
+        try:
+            assert (await anext(stream)).startswith('retry:')
+            missed = await read_events(stream, 1)
+
+            # Published from another worker while the stream is open
+            await asyncio.get_running_loop().run_in_executor(None, publish_event, user.id, 'task', 'deleted', [1])
+            live = await read_events(stream, 1)
+        finally:
+            await stream.aclose()
+        return missed + live
+
+    events = read()
+    assert [event.split('\n')[1] for event in events] == ['event: task.updated', 'event: task.deleted']
+    assert json.loads(events[1].split('\n')[2].removeprefix('data: ')) == {
+        'model': 'task', 'action': 'deleted', 'ids': [1]
+    }
+
+
+@pytest.mark.django_db
+def test_events_endpoint(user):
+    assert Client().get(EVENTS_URL).status_code == status.HTTP_401_UNAUTHORIZED
+
+    publish_event(user.id, 'task', 'created', [1])
+    access = RefreshToken.for_user(user).access_token
+
+    @async_to_sync
+    async def read():
+        response = await AsyncClient().get(
+            EVENTS_URL, headers={'Authorization': f'Bearer {access}', 'Last-Event-ID': '0-0'}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'text/event-stream'
+        stream = aiter(response.streaming_content)
+        try:
+            return await read_events(stream, 1)
+        finally:
+            await stream.aclose()
+
+    events = read()
+    assert 'event: task.created' in events[0]
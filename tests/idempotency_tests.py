@@ -0,0 +1,115 @@
+from django.core.cache import caches
+from django.db import connection
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from task.models import Task
+from user.models import User
+from django.conf import settings
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+import pytest
+
+
+TASK_URL = reverse('task:task-endpoints')
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(phone='09123456789')
+
+
+@pytest.fixture
+def throttle_rates(monkeypatch):
+    # Set in place (the throttles hold on to the DEFAULT_THROTTLE_RATES dict) and restored after each test
+    for scope in ('tasks', 'batch'):
+        monkeypatch.setitem(settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], scope, '1000/sec')
+
+
+@pytest.fixture
+def client(user, throttle_rates):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.fixture
+def key():
+    key = uuid4().hex
+    yield key
+    caches['default'].delete_pattern('idempotency-*')
+
+
+@pytest.mark.django_db
+def test_retries_are_replayed(client, user, key, django_assert_num_queries):
+    response = client.post(TASK_URL, {'title': 'Task'}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert 'Idempotent-Replayed' not in response
+
+    with django_assert_num_queries(0):
+        retry = client.post(TASK_URL, {'title': 'Task'}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+    assert retry.status_code == status.HTTP_201_CREATED
+    assert retry['Idempotent-Replayed'] == 'true'
+    assert retry.json() == response.json()
+    assert user.tasks.count() == 1
+
+    response = client.post(TASK_URL, {'title': 'Task'}, format='json', HTTP_IDEMPOTENCY_KEY=uuid4().hex)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert user.tasks.count() == 2, 'Other keys should create new rows'
+
+    response = client.post(TASK_URL, {'title': 'Task'}, format='json')
+    assert response.status_code == status.HTTP_201_CREATED
+    assert user.tasks.count() == 3, 'Requests without a key should not be replayed'
+
+
+@pytest.mark.django_db
+def test_key_reused_with_different_request(client, key):
+    client.post(TASK_URL, {'title': 'Task'}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+    response = client.post(TASK_URL, {'title': 'Other'}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.django_db
+def test_keys_are_scoped_by_user(client, key):
+    client.post(TASK_URL, {'title': 'Task'}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    other = User.objects.create_user(phone='09123456788')
+    other_client = APIClient()
+    other_client.force_authenticate(user=other)
+    response = other_client.post(TASK_URL, {'title': 'Task'}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert 'Idempotent-Replayed' not in response
+    assert other.tasks.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_duplicates_wait_for_the_first_request(key, throttle_rates):
+    user = User.objects.create_user(phone='09123456789')
+
+    def post(_):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        try:
+            return client.post(TASK_URL, {'title': 'Task'}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        responses = list(executor.map(post, range(5)))
+
+    assert [response.status_code for response in responses] == [status.HTTP_201_CREATED] * 5
+    assert Task.objects.filter(user=user).count() == 1
+    assert len({response.json()['task']['id'] for response in responses}) == 1
+
+
+@pytest.mark.django_db
+def test_batch_operations_ignore_the_batch_key(client, user, key):
+    response = client.post(reverse('batch'), {
+        'operations': [
+            {'method': 'POST', 'path': TASK_URL, 'body': {'title': 'Task'}},
+            {'method': 'POST', 'path': TASK_URL, 'body': {'title': 'Task'}},
+        ]
+    }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert user.tasks.count() == 2
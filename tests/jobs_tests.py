@@ -0,0 +1,150 @@
+from datetime import timedelta
+from django.core.management import call_command
+from django.utils import timezone
+from contact.models import Contact
+from jobs.models import Job
+from user.models import User
+from jobs.queue import job, run_jobs, job_metrics
+from TODO_V2.trash import purge_trash
+from io import StringIO
+import pytest
+
+
+calls = []
+
+
+@job
+def record(value, suffix=''):
+    calls.append(f'{value}{suffix}')
+
+
+@job(max_attempts=2)
+def fail():
+    raise ValueError('Job failed')
+
+
+@pytest.fixture(autouse=True)
+def queue_settings(settings):
+    settings.JOB_QUEUE_SETTINGS = {**settings.JOB_QUEUE_SETTINGS, 'RETRY_DELAY': timedelta(0), 'CONCURRENCY': 1}
+    calls.clear()
+    yield
+    calls.clear()
+
+
+@pytest.mark.django_db
+def test_jobs_run_in_batches():
+    assert record('inline') is None and calls == ['inline'], 'Job functions can still be called directly'
+    calls.clear()
+
+    for i in range(5):
+        queued = record.delay(i, suffix='!')
+    assert queued.name.endswith('jobs_tests.record') and queued.args == [4] and queued.kwargs == {'suffix': '!'}
+
+    assert run_jobs(batch_size=3) == {'done': 3, 'queued': 0, 'failed': 0}
+    assert run_jobs(batch_size=3) == {'done': 2, 'queued': 0, 'failed': 0}
+    assert run_jobs() == {'done': 0, 'queued': 0, 'failed': 0}
+    assert sorted(calls) == [f'{i}!' for i in range(5)]
+    assert Job.objects.filter(status=Job.DONE, finished_at__isnull=False).count() == 5
+
+
+@pytest.mark.django_db
+def test_scheduled_jobs_wait_for_their_time():
+    record.schedule(timedelta(minutes=5), 'later')
+    record.schedule(timezone.now(), 'now')
+
+    assert run_jobs()['done'] == 1
+    assert calls == ['now']
+
+    Job.objects.filter(status=Job.QUEUED).update(run_at=timezone.now())
+    assert run_jobs()['done'] == 1
+    assert calls == ['now', 'later']
+
+
+@pytest.mark.django_db
+def test_failed_jobs_are_retried_with_backoff(settings):
+    queued = fail.delay()
+
+    assert run_jobs() == {'done': 0, 'queued': 1, 'failed': 0}
+    queued.refresh_from_db()
+    assert queued.attempts == 1 and 'Job failed' in queued.last_error
+
+    assert run_jobs() == {'done': 0, 'queued': 0, 'failed': 1}
+    queued.refresh_from_db()
+    assert queued.status == Job.FAILED and queued.attempts == 2
+
+    settings.JOB_QUEUE_SETTINGS['RETRY_DELAY'] = timedelta(minutes=1)
+    fail.delay()
+    assert run_jobs()['queued'] == 1
+    assert run_jobs() == {'done': 0, 'queued': 0, 'failed': 0}, 'Retry should wait for the backoff'
+
+
+@pytest.mark.django_db
+def test_lost_jobs_are_run_again():
+    queued = record.delay('lost')
+    Job.objects.filter(id=queued.id).update(
+        status=Job.RUNNING, attempts=1, locked_until=timezone.now() + timedelta(minutes=1)
+    )
+    assert run_jobs()['done'] == 0, 'Jobs leased to another worker should not be claimed'
+
+    Job.objects.filter(id=queued.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+    assert run_jobs()['done'] == 1
+    assert calls == ['lost']
+
+
+@pytest.mark.django_db
+def test_job_queues():
+    record.delay('default')
+    job(queue='slow')(record.func).delay('slow')
+
+    assert run_jobs(['slow'])['done'] == 1
+    assert calls == ['slow']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_workers(settings):
+    settings.JOB_QUEUE_SETTINGS['CONCURRENCY'] = 4
+    for i in range(8):
+        record.delay(i)
+
+    out = StringIO()
+    call_command('run_jobs', '--once', '--batch-size', '8', stdout=out)
+    assert 'done: 8' in out.getvalue()
+    assert sorted(calls) == [str(i) for i in range(8)]
+
+
+@pytest.mark.django_db
+def test_job_metrics():
+    record.delay('a')
+    fail.delay()
+    Job.objects.update(run_at=timezone.now() - timedelta(seconds=30))
+    assert job_metrics()['lag'] >= 30
+
+    run_jobs()
+    metrics = job_metrics()
+    assert metrics['counts'] == {'default': {'done': 1, 'queued': 1}}
+    assert metrics['done'] == 1 and metrics['failed'] == 0
+    assert metrics['lag'] < 1, 'Only the retried job is due'
+
+    out = StringIO()
+    call_command('job_stats', stdout=out)
+    assert 'default: done 1, queued 1' in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_contact_profile_is_removed_by_a_job(tmp_path, settings):
+    settings.MEDIA_ROOT = tmp_path
+    profile = tmp_path / 'profile.png'
+    profile.write_bytes(b'png')
+    contact = Contact.objects.create(name='Contact', user=User.objects.create_user(phone='09123456789'))
+    Contact.objects.filter(id=contact.id).update(profile='profile.png')
+    contact.refresh_from_db()
+
+    contact.delete()
+    assert not Job.objects.exists(), 'Contacts in the trash should keep their profile'
+
+    purge_trash(older_than=timedelta(0))
+    assert profile.exists(), 'File should be removed off the request path'
+    assert Job.objects.get().name == 'contact.jobs.remove_profile'
+
+    assert run_jobs()['done'] == 1
+    assert not profile.exists()
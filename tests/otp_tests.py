@@ -1,11 +1,15 @@
 from time import sleep
 
 from user.otp import OTP
-from django.core.cache import cache
+from django.core.cache import caches
 from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 
 
+cache = caches['otp']
+
+
 @pytest.fixture
 def otp(request):
     # Create unique indicator for each test
@@ -35,89 +39,44 @@ def test_token_generation(otp, digits, expected_length):
     # Verify numeric range
     assert 10**(expected_length-1) <= int(token) <= 10**expected_length - 1
 
+def stored(otp):
+    client = cache.client.get_client()
+    return client.hgetall(cache.client.make_key(otp.key))
+
+
 def test_save_token(otp):
     token = otp.generate_token()
 
     # Test initial save
-    assert otp.save_token(token), "Failed to save initial token"
-
-    # Verify cache contents using the same indicator the fixture uses
-    saved_data = cache.get(f'{otp.indicator}-otp')
-    assert saved_data is not None, "Data not saved to cache"
-    assert 'token' in saved_data, "Token not stored in cache data"
+    assert otp.save_token(token, meta='data'), "Failed to save initial token"
 
-    # Verify encryption
-    decrypted = otp.encoder.decrypt(saved_data['token']).decode()
-    assert decrypted == token, "Encryption/decryption mismatch"
+    # Only the digest of the token and the data are stored
+    saved_data = stored(otp)
+    assert set(saved_data) == {b'digest', b'data'}
+    assert saved_data[b'digest'].decode() == otp.token_digest(token)
+    assert token.encode() not in saved_data[b'digest'], 'Token should not be stored as is'
+    assert cache.client.decode(saved_data[b'data']) == {'meta': 'data'}
+    assert 0 < cache.ttl(otp.key) <= otp.expiration_time
 
     # Test duplicate prevention
     assert not otp.save_token(otp.generate_token()), "Should prevent new token when one exists"
 
-def test_restore_token(otp):
-    # No active OTP scenario
-    success, result, extra = otp.restore_token()
-    assert not success
-    assert result == 'NO_ACTIVE_OTP'
-    assert extra == {}
-
-    # Invalid format scenario
-    cache.set(f'{otp.indicator}-otp', 'invalid_data')
-    success, result, extra = otp.restore_token()
-    assert not success
-    assert result == 'OTP_MISMATCH'
-    assert extra == {}
-
-    # No token scenario
-    cache.set(f'{otp.indicator}-otp', {'valid': 'data'})
-    success, result, extra = otp.restore_token()
-    assert not success
-    assert result == 'NO_TOKEN_FOUND'
-    assert extra == {'valid': 'data'}
-    cache.delete(f'{otp.indicator}-otp')
-
-    # Successful scenario
-    test_data = {'meta': 'data'}
-    token = otp.generate_token()
-    assert otp.save_token(token, **test_data)
-
-    success, encrypted_token, extra = otp.restore_token()
-    assert success
-    decrypted = otp.encoder.decrypt(encrypted_token).decode()
-    assert decrypted == token
-    assert extra == test_data
-
 
-def test_validate_otp(otp):
+def test_token_digest(otp):
     token = otp.generate_token()
-    test_data = {'meta': 'data'}
-    assert otp.save_token(token, **test_data), 'Failed to save initial token'
-
-    # Invalid token
-    success, extra = otp.validate_otp('1234')
-    assert not success
-    assert extra == 'INVALID_OTP_TOKEN'
-
-    # Success
-    success, extra = otp.validate_otp(token)
-    assert success
-    assert extra == test_data
-
-    cache.delete(f'{otp.indicator}-otp')
-
-    # No Token
-    success, extra = otp.validate_otp(token)
-    assert not success
-    assert extra == 'NO_ACTIVE_OTP'
+    assert otp.token_digest(token) == otp.token_digest(token)
+    assert OTP('09000000000').token_digest(token) != otp.token_digest(token), \
+        'Digest should be bound to the indicator'
 
 
 def test_cancel_otp(otp):
     assert otp.save_token(otp.generate_token()), 'Failed to save initial token'
 
-    assert cache.get(f'{otp.indicator}-otp') is not None, 'Cache backend failed'
+    assert cache.has_key(otp.key), 'Cache backend failed'
 
     assert otp.cancel_otp(), 'Failed to cancel OTP'
 
-    assert cache.get(f'{otp.indicator}-otp') is None, 'Failed to remove OTP data'
+    assert not cache.has_key(otp.key), 'Failed to remove OTP data'
 
     assert not otp.cancel_otp(), 'Should fail when no OTP exists'
 
@@ -130,17 +89,64 @@ def test_otp_expire(otp):
     # Success
     assert otp.save_token(token, **test_data), 'Failed to save initial token'
     sleep(.1)
-    success, result = otp.validate_otp(token)
+    success, result = otp.consume_otp(token)
     assert success, 'Failed to validate OTP in time'
     assert result == test_data, 'Failed to retrieve extra data'
 
-    assert otp.cancel_otp(), 'Failed to finish OTP validation'
-
     # Fail
     assert otp.save_token(token, **test_data), 'Failed to save token'
     sleep(1.1)
-    success, result = otp.validate_otp(token)
+    success, result = otp.consume_otp(token)
     assert not success, 'Should fail when passes the expiration time'
     assert result == 'NO_ACTIVE_OTP'
 
 
+
+
+def test_consume_otp(otp):
+    token = otp.generate_token()
+    test_data = {'meta': 'data'}
+    assert otp.save_token(token, **test_data), 'Failed to save initial token'
+
+    # Invalid token keeps the OTP for its remaining lifetime
+    wrong_token = '1' * len(token) if token != '1' * len(token) else '2' * len(token)
+    success, result = otp.consume_otp(wrong_token)
+    assert not success
+    assert result == 'INVALID_OTP_TOKEN'
+    assert stored(otp), 'Invalid token should not consume the OTP'
+    assert 0 < cache.ttl(otp.key) <= otp.expiration_time
+
+    # Valid token consumes it
+    success, result = otp.consume_otp(token)
+    assert success
+    assert result == test_data
+    assert not stored(otp), 'Valid token should consume the OTP'
+
+    success, result = otp.consume_otp(token)
+    assert not success
+    assert result == 'NO_ACTIVE_OTP'
+
+
+def test_otp_concurrency(otp):
+    tokens = [otp.generate_token() for _ in range(10)]
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        saved = list(executor.map(lambda token: otp.save_token(token), tokens))
+    assert saved.count(True) == 1, 'Only one concurrent OTP should be started'
+
+    token = tokens[saved.index(True)]
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(lambda _: otp.consume_otp(token)[0], range(10)))
+    assert results.count(True) == 1, 'An OTP should only be consumed once'
+
+
+def test_wrong_tokens_dont_block_the_right_one(otp):
+    token = otp.generate_token()
+    assert otp.save_token(token, meta='data')
+    wrong_token = '1' * len(token) if token != '1' * len(token) else '2' * len(token)
+
+    attempts = [wrong_token] * 20 + [token] + [wrong_token] * 20
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(otp.consume_otp, attempts))
+
+    assert results[20] == (True, {'meta': 'data'}), 'Wrong guesses should never hide the OTP from the right one'
+    assert results.count((False, 'INVALID_OTP_TOKEN')) + results.count((False, 'NO_ACTIVE_OTP')) == 40
@@ -0,0 +1,167 @@
+from datetime import timedelta
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from jobs.models import Job, PeriodicJob
+from jobs.scheduler import run_due_jobs
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from time import sleep
+import os
+import pytest
+
+
+calls = []
+
+
+def record(value='run'):
+    calls.append(value)
+
+
+def slow():
+    sleep(.3)
+    calls.append('slow')
+
+
+def fail():
+    raise ValueError('Periodic job failed')
+
+
+@pytest.fixture(autouse=True)
+def scheduled(settings):
+    settings.SCHEDULER_SETTINGS = {
+        'JOBS': {
+            'record': {'function': 'scheduler_tests.record', 'interval': timedelta(hours=1), 'kwargs': {'value': 'a'}},
+            'fail': {'function': 'scheduler_tests.fail', 'interval': 60},
+        },
+    }
+    calls.clear()
+    yield
+    calls.clear()
+    caches['default'].delete_many([f'scheduler-{name}-lock' for name in ('record', 'fail', 'slow')])
+
+
+@pytest.mark.django_db
+def test_due_jobs_run_once_per_interval():
+    assert sorted(run_due_jobs()) == ['fail', 'record']
+    assert calls == ['a']
+    assert run_due_jobs() == [], 'Jobs should wait for their interval'
+    assert calls == ['a']
+
+    PeriodicJob.objects.filter(name='record').update(next_run_at=timezone.now())
+    assert run_due_jobs() == ['record']
+    assert calls == ['a', 'a']
+
+
+@pytest.mark.django_db
+def test_runs_are_recorded():
+    before = timezone.now()
+    run_due_jobs()
+
+    record = PeriodicJob.objects.get(name='record')
+    assert record.last_status == PeriodicJob.OK and record.last_error is None and record.run_count == 1
+    assert before <= record.last_run_at <= timezone.now()
+    assert record.last_duration >= 0
+    assert record.next_run_at == record.last_run_at + timedelta(hours=1)
+
+    failed = PeriodicJob.objects.get(name='fail')
+    assert failed.last_status == PeriodicJob.FAILED and 'Periodic job failed' in failed.last_error
+    assert failed.next_run_at == failed.last_run_at + timedelta(seconds=60), 'Failed jobs wait for their interval too'
+
+
+@pytest.mark.django_db
+def test_locked_jobs_are_skipped():
+    caches['default'].add('scheduler-record-lock', 'another-node', 60)
+
+    assert run_due_jobs() == ['fail']
+    assert calls == []
+    assert caches['default'].get('scheduler-record-lock') == 'another-node', 'Locks of other nodes should be kept'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_each_job_runs_on_one_node(settings):
+    settings.SCHEDULER_SETTINGS = {'JOBS': {'slow': {'function': 'scheduler_tests.slow', 'interval': 60}}}
+    PeriodicJob.objects.create(name='slow')
+
+    def node(_):
+        try:
+            return run_due_jobs()
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(node, range(4)))
+
+    assert sorted(results) == [[], [], [], ['slow']]
+    assert calls == ['slow']
+    assert PeriodicJob.objects.get(name='slow').run_count == 1
+
+
+@pytest.mark.django_db(transaction=True)  # run_scheduler closes the connections left in a transaction
+def test_run_scheduler_and_job_stats_commands():
+    out = StringIO()
+    call_command('run_scheduler', '--once', stdout=out)
+    assert 'Ran record' in out.getvalue() and 'Ran fail' in out.getvalue()
+
+    out = StringIO()
+    call_command('job_stats', stdout=out)
+    assert 'record: last run' in out.getvalue() and '(failed' in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_purge_finished_jobs(settings):
+    settings.SCHEDULER_SETTINGS = {'JOBS': {'purge': {
+        'function': 'jobs.queue.purge_finished_jobs', 'interval': 60, 'kwargs': {'older_than': timedelta(days=7)},
+    }}}
+    old = timezone.now() - timedelta(days=8)
+    Job.objects.create(name='done-old', status=Job.DONE, finished_at=old)
+    Job.objects.create(name='failed-old', status=Job.FAILED, finished_at=old)
+    Job.objects.create(name='done-recent', status=Job.DONE, finished_at=timezone.now())
+
+    assert run_due_jobs() == ['purge']
+    assert sorted(Job.objects.values_list('name', flat=True)) == ['done-recent', 'failed-old']
+    caches['default'].delete('scheduler-purge-lock')
+
+
+@pytest.mark.django_db
+def test_remove_orphan_profiles(tmp_path, settings):
+    from contact.jobs import remove_orphan_profiles
+    from contact.models import Contact
+    from user.models import User
+
+    settings.MEDIA_ROOT = tmp_path
+    (tmp_path / 'Profiles').mkdir()
+    for name in ('used.png', 'orphan.png', 'recent.png'):
+        (tmp_path / 'Profiles' / name).write_bytes(b'image')
+    old = (timezone.now() - timedelta(days=2)).timestamp()
+    for name in ('used.png', 'orphan.png'):
+        os.utime(tmp_path / 'Profiles' / name, (old, old))
+
+    user = User.objects.create_user(phone='09123456789')
+    Contact.objects.create(user=user, name='Contact', profile='Profiles/used.png')
+
+    assert remove_orphan_profiles() == 1
+    assert sorted(os.listdir(tmp_path / 'Profiles')) == ['recent.png', 'used.png']
+
+
+@pytest.mark.django_db
+def test_remove_orphan_profiles_keeps_trashed_contacts_profile(tmp_path, settings):
+    from contact.jobs import remove_orphan_profiles
+    from contact.models import Contact
+    from user.models import User
+
+    settings.MEDIA_ROOT = tmp_path
+    (tmp_path / 'Profiles').mkdir()
+    path = tmp_path / 'Profiles' / 'trashed.png'
+    path.write_bytes(b'image')
+    old = (timezone.now() - timedelta(days=2)).timestamp()
+    os.utime(path, (old, old))
+
+    user = User.objects.create_user(phone='09123456789')
+    contact = Contact.objects.create(user=user, name='Contact', profile='Profiles/trashed.png')
+    contact.delete()
+
+    assert remove_orphan_profiles() == 0
+    contact.restore()
+    assert os.path.exists(Contact.objects.get(id=contact.id).profile.path), 'Restored contact lost its profile'
@@ -0,0 +1,135 @@
+from cryptography.fernet import Fernet
+from datetime import timedelta
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from user.models import SMS
+from user.otp import OTP
+from user.sms import LocalGateway, enqueue_sms, process_outbox
+from io import StringIO
+import pytest
+
+
+VALID_PHONE = '09123456789'
+FAILING_PHONE = '09120000000'
+
+
+@pytest.fixture(autouse=True)
+def gateway(settings):
+    settings.SMS_SETTINGS = {
+        **settings.SMS_SETTINGS,
+        'GATEWAY': 'user.sms.LocalGateway',
+        'MAX_ATTEMPTS': 2,
+        'RETRY_DELAY': timedelta(0),
+    }
+    LocalGateway.outbox = []
+    LocalGateway.failing_numbers = {FAILING_PHONE}
+    yield LocalGateway
+    LocalGateway.outbox = []
+    LocalGateway.failing_numbers = set()
+
+
+@pytest.mark.django_db
+def test_start_authentication_enqueues_sms(gateway, settings):
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['auth'] = '1000/sec'
+    OTP(VALID_PHONE).cancel_otp()
+
+    response = APIClient().post(reverse('user:start-authentication'), data={'phone': VALID_PHONE})
+    assert response.status_code == status.HTTP_200_OK
+    assert gateway.outbox == [], 'SMS should not be sent inside the request'
+
+    sms = SMS.objects.get(phone=VALID_PHONE)
+    assert sms.status == SMS.PENDING
+    assert 'register with' not in sms.message, 'Message should be stored encrypted'
+
+    assert process_outbox() == {'sent': 1, 'pending': 0, 'dead': 0}
+    assert len(gateway.outbox) == 1
+    assert gateway.outbox[0][0] == VALID_PHONE
+    assert gateway.outbox[0][1].startswith('register with ')
+
+    sms.refresh_from_db()
+    assert sms.status == SMS.SENT and sms.sent_at is not None
+    OTP(VALID_PHONE).cancel_otp()
+
+
+@pytest.mark.django_db
+def test_process_outbox_in_batches(gateway):
+    for i in range(5):
+        enqueue_sms(VALID_PHONE, f'message {i}')
+
+    assert process_outbox(batch_size=3)['sent'] == 3
+    assert process_outbox(batch_size=3)['sent'] == 2
+    assert process_outbox(batch_size=3) == {'sent': 0, 'pending': 0, 'dead': 0}
+    assert sorted(message for _, message in gateway.outbox) == [f'message {i}' for i in range(5)]
+
+
+@pytest.mark.django_db
+def test_failed_sms_is_retried_then_dead_lettered(gateway):
+    sms = enqueue_sms(FAILING_PHONE, 'hello')
+
+    assert process_outbox() == {'sent': 0, 'pending': 1, 'dead': 0}
+    sms.refresh_from_db()
+    assert sms.attempts == 1 and sms.last_error
+
+    assert process_outbox() == {'sent': 0, 'pending': 0, 'dead': 1}
+    sms.refresh_from_db()
+    assert sms.status == SMS.DEAD and sms.attempts == 2
+    assert gateway.outbox == []
+
+
+@pytest.mark.django_db
+def test_failed_sms_waits_for_backoff(gateway, settings):
+    settings.SMS_SETTINGS['RETRY_DELAY'] = timedelta(minutes=1)
+    enqueue_sms(FAILING_PHONE, 'hello')
+
+    assert process_outbox()['pending'] == 1
+    gateway.failing_numbers = set()
+    assert process_outbox() == {'sent': 0, 'pending': 0, 'dead': 0}, 'Retry should wait for the backoff'
+
+
+@pytest.mark.django_db
+def test_expired_sms_is_not_sent(gateway):
+    sms = enqueue_sms(VALID_PHONE, 'late', expires_in=60)
+    SMS.objects.filter(id=sms.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    assert process_outbox() == {'sent': 0, 'pending': 0, 'dead': 1}
+    assert gateway.outbox == []
+
+
+@pytest.mark.django_db
+def test_undecryptable_sms_is_dead_lettered(gateway):
+    sms = enqueue_sms(VALID_PHONE, 'hello')
+    # Encrypted by a process with another key
+    SMS.objects.filter(id=sms.id).update(message=Fernet(Fernet.generate_key()).encrypt(b'hello').decode())
+
+    assert process_outbox() == {'sent': 0, 'pending': 0, 'dead': 1}, 'Decrypt failures should not be retried'
+    sms.refresh_from_db()
+    assert sms.attempts == 1 and sms.last_error == 'Failed to decrypt the message'
+    assert gateway.outbox == []
+
+
+@pytest.mark.django_db
+def test_leased_sms_is_not_claimed_twice(gateway, settings):
+    settings.SMS_SETTINGS['GATEWAY'] = 'user.sms.MissingGateway'  # Crashes the worker after claiming the batch
+    enqueue_sms(VALID_PHONE, 'hello')
+
+    with pytest.raises(ImportError):
+        process_outbox()
+
+    settings.SMS_SETTINGS['GATEWAY'] = 'user.sms.LocalGateway'
+    assert process_outbox()['sent'] == 0, 'Message should stay leased to the crashed worker'
+
+    SMS.objects.update(next_attempt_at=timezone.now())  # Lease is over
+    assert process_outbox()['sent'] == 1
+
+
+@pytest.mark.django_db
+def test_process_sms_outbox_command(gateway):
+    enqueue_sms(VALID_PHONE, 'hello')
+    out = StringIO()
+    call_command('process_sms_outbox', '--once', stdout=out)
+
+    assert 'sent: 1' in out.getvalue()
+    assert gateway.outbox == [(VALID_PHONE, 'hello')]
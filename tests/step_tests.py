@@ -381,7 +381,7 @@ def test_delete_multiple_steps(client, steps):
     response = client.delete(
         STEPS_URL,
         data={
-            'selector': ','.join(str(steps.values_list('id', flat=True))),
+            'selector': ','.join(str(step_id) for step_id in steps.values_list('id', flat=True)),
         },
         content_type=CONTENT_TYPE
     )
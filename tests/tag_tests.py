@@ -192,8 +192,8 @@ def test_edit_tag(client, tags, tag_id, name, expected):
         ('10', 404),
         ('1', 200),
         (',', 404),
-        ('10,20,30', 404),
-        ('10,20,haha', 404),
+        ('10000,20000,30000', 404),
+        ('10000,20000,haha', 404),
         ('MULTIPLE_VALID_ID', 200),
         ('MULTIPLE_VALID_ID,20,30', 200),
         ('all', 200)
@@ -3,6 +3,9 @@ from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 from task.models import Task
+from TODO_V2.models import VersionConflict
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from tests.authentication_tests import INVALID_PHONE
 from user.models import User
 from django.urls import reverse
@@ -408,3 +411,87 @@ def test_task_delete(client, task, tasks):
         content_type=CONTENT_TYPE,
     )
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_task_update_if_match(client, task, django_assert_num_queries):
+    assert task.version == 1
+
+    response = client.patch(
+        TASK_URL,
+        data={'task_id': task.id, 'title': 'first device'},
+        content_type=CONTENT_TYPE,
+        HTTP_IF_MATCH='"1"',
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['task']['version'] == 2
+
+    # Second device still has version 1
+    response = client.patch(
+        TASK_URL,
+        data={'task_id': task.id, 'title': 'second device'},
+        content_type=CONTENT_TYPE,
+        HTTP_IF_MATCH='"1"',
+    )
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    task.refresh_from_db()
+    assert task.title == 'first device' and task.version == 2
+
+    response = client.patch(
+        TASK_URL,
+        data={'task_id': task.id, 'title': 'second device'},
+        content_type=CONTENT_TYPE,
+        HTTP_IF_MATCH='2',
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.patch(TASK_URL, data={'task_id': task.id}, content_type=CONTENT_TYPE, HTTP_IF_MATCH='abc')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # Without If-Match (or with "*") the update always applies
+    response = client.patch(TASK_URL, data={'task_id': task.id, 'title': 'no header'}, content_type=CONTENT_TYPE)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['task']['version'] == 4
+
+    response = client.patch(
+        TASK_URL, data={'task_id': task.id, 'title': 'any'}, content_type=CONTENT_TYPE, HTTP_IF_MATCH='*'
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['task']['version'] == 5
+
+
+@pytest.mark.django_db
+def test_versioned_save_is_a_single_conditional_update(task):
+    stale = Task.objects.get(id=task.id)
+
+    task.expected_version = 1
+    task.title = 'Changed'
+    with CaptureQueriesContext(connection) as queries:
+        task.save(update_fields=['title'])
+    updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+    assert len(updates) == 1 and '"version" = 1' in updates[0]
+    assert task.version == 2
+
+    stale.expected_version = 1
+    stale.title = 'Stale'
+    with pytest.raises(VersionConflict):
+        stale.save()
+    assert stale.version == 1 and stale.expected_version is None
+    assert Task.objects.get(id=task.id).title == 'Changed'
+
+
+@pytest.mark.django_db
+def test_unconditional_saves_increment_the_stored_version(task):
+    first, second = Task.objects.get(id=task.id), Task.objects.get(id=task.id)
+    first.title, second.title = 'First', 'Second'
+    with CaptureQueriesContext(connection) as queries:
+        first.save()
+    second.save()
+    assert queries[-1]['sql'].startswith('UPDATE'), 'The new version should be read back by the UPDATE itself'
+
+    assert (first.version, second.version) == (2, 3), 'Concurrent saves should not write the same version'
+    assert Task.objects.get(id=task.id).version == 3
+
+    # A client that saw the first save can't overwrite the second one
+    first.expected_version = 2
+    with pytest.raises(VersionConflict):
+        first.save()
@@ -0,0 +1,137 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+from TODO_V2.throttling import SlidingWindowRateThrottle
+from task.models import Task
+from user.models import User
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+import pytest
+
+
+cache = caches['throttle']
+factory = APIRequestFactory()
+
+
+class ThrottledView(APIView):
+    throttle_scope = 'test_scope'
+
+
+@pytest.fixture
+def rate(settings, request):
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['test_scope'] = request.param
+    cache.delete_pattern('throttle_test_scope_*')
+    yield request.param
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].pop('test_scope')
+    cache.delete_pattern('throttle_test_scope_*')
+
+
+def allow(ip='10.0.0.1'):
+    throttle = SlidingWindowRateThrottle()
+    request = factory.get('/', REMOTE_ADDR=ip)
+    request.user = AnonymousUser()
+    return throttle.allow_request(request, ThrottledView()), throttle
+
+
+@pytest.mark.parametrize('rate', ['3/min'], indirect=True)
+def test_sliding_window_limits_requests(rate):
+    assert [allow()[0] for _ in range(3)] == [True] * 3
+
+    allowed, throttle = allow()
+    assert not allowed
+    assert 0 < throttle.wait() <= 60
+
+    assert allow('10.0.0.2')[0], 'Clients should be throttled separately'
+
+
+@pytest.mark.parametrize('rate', ['3/sec'], indirect=True)
+def test_sliding_window_slides(rate):
+    while not all(allow()[0] for _ in range(3)):  # Retry if the first requests straddled two windows
+        sleep(1)
+    assert not allow()[0]
+
+    sleep(2.1)  # Both windows are over
+    assert allow()[0]
+
+
+@pytest.mark.parametrize('rate', ['10/min'], indirect=True)
+def test_sliding_window_is_atomic(rate):
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(lambda _: allow()[0], range(50)))
+
+    assert results.count(True) == 10, 'Concurrent requests should not exceed the limit'
+
+
+@pytest.mark.parametrize('rate', ['1000/min'], indirect=True)
+def test_sliding_window_memory_is_constant(rate):
+    for _ in range(100):
+        _, throttle = allow()
+
+    client = cache.client.get_client()
+    assert client.hlen(cache.make_key(throttle.key)) == 3
+    assert 0 < client.pttl(cache.make_key(throttle.key)) <= 120_000
+
+
+@pytest.fixture
+def budget(settings):
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['tasks'] = '1000/sec'
+    settings.THROTTLE_COST_BUDGETS = {'tasks': '10/hour'}
+    yield
+    cache.delete_pattern('throttle_cost_tasks_*')
+
+
+@pytest.mark.django_db
+def test_cost_budget_charges_rows_returned(budget):
+    heavy = User.objects.create_user(phone='09123456789')
+    light = User.objects.create_user(phone='09123456788')
+    for i in range(5):
+        Task.objects.create(title=f'Task {i}', user=heavy)
+    light_task = Task.objects.create(title='Task', user=light)
+
+    heavy_client, light_client = APIClient(), APIClient()
+    heavy_client.force_authenticate(heavy)
+    light_client.force_authenticate(light)
+    url = reverse('task:task-endpoints')
+
+    response = heavy_client.get(url, {'get': 'all', 'quick': 'true'})
+    assert response.status_code == 200
+    assert response['X-Request-Cost'] == '6'
+    assert response['X-Cost-Budget-Limit'] == '10'
+    assert response['X-Cost-Budget-Remaining'] == '4'
+
+    response = heavy_client.get(url, {'get': 'all', 'quick': 'true'})
+    assert response.status_code == 200, 'Requests are served while there is budget left'
+    assert response['X-Cost-Budget-Remaining'] == '0'
+
+    response = heavy_client.get(url, {'get': 'all', 'quick': 'true'})
+    assert response.status_code == 429
+    assert int(response['Retry-After']) > 0
+
+    for _ in range(5):
+        response = light_client.get(url, {'get': light_task.id, 'quick': 'true'})
+        assert response.status_code == 200, 'Light clients should not be affected'
+        assert response['X-Request-Cost'] == '1'
+    assert response['X-Cost-Budget-Remaining'] == '5'
+
+
+@pytest.mark.django_db
+def test_cost_budget_refills(budget, settings):
+    settings.THROTTLE_COST_BUDGETS = {'tasks': '10/sec'}
+    user = User.objects.create_user(phone='09123456789')
+    for i in range(20):
+        Task.objects.create(title=f'Task {i}', user=user)
+
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('task:task-endpoints')
+
+    assert client.get(url, {'get': 'all', 'quick': 'true'}).status_code == 200
+    assert client.get(url, {'get': 'all', 'quick': 'true'}).status_code == 429, 'Debt should block the next request'
+
+    # The balance is 10 - 21 = -11, refilled at 10 per second
+    sleep(.5)
+    assert client.get(url, {'get': 'all', 'quick': 'true'}).status_code == 429
+    sleep(1)
+    assert client.get(url, {'get': 'all', 'quick': 'true'}).status_code == 200
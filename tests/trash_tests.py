@@ -0,0 +1,135 @@
+from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from contact.models import Contact
+from step.models import Step
+from task.models import Task
+from user.models import User
+from TODO_V2.trash import purge_trash
+import pytest
+
+
+TASK_URL = reverse('task:task-endpoints')
+TASK_RESTORE_URL = reverse('task:task-restore')
+CONTACT_URL = reverse('contact:contact-endpoints')
+CONTACT_RESTORE_URL = reverse('contact:contact-restore')
+STEPS_URL = reverse('step:step-endpoints')
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(phone='09123456789')
+
+
+@pytest.fixture
+def client(db, user, settings):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['tasks'] = '1000/sec'
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['contacts'] = '1000/sec'
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['steps'] = '1000/sec'
+    return client
+
+
+@pytest.fixture
+def tasks(user):
+    tasks = [Task.objects.create(user=user, title=f'Task {i}') for i in range(3)]
+    for task in tasks:
+        Step.objects.create(task=task, title=f'Step of {task.title}')
+    return tasks
+
+
+@pytest.mark.django_db
+def test_delete_moves_tasks_to_the_trash(client, user, tasks):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.delete(TASK_URL, data={'task_id': 'all'}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['message'] == 'Deleted all(3) tasks successfully'
+
+    writes = [query['sql'] for query in queries if not query['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))]
+    assert len(writes) == 1 and writes[0].startswith('UPDATE'), 'Deleting should be a single UPDATE'
+
+    assert not user.tasks.exists()
+    assert Task.trash.filter(user=user).count() == 3
+    assert Step.objects.count() == 3, 'Steps should be kept until the task is purged'
+
+    response = client.get(TASK_URL, data={'get': 'all', 'quick': 'false'})
+    assert response.json()['tasks'] == []
+    response = client.get(STEPS_URL, data={'get': 'all'})
+    assert response.json()['steps'] == [], 'Steps of deleted tasks should be hidden'
+
+    response = client.delete(TASK_URL, data={'task_id': 'all'}, format='json')
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_restore_tasks(client, user, tasks):
+    Task.objects.filter(user=user).delete()
+
+    response = client.post(TASK_RESTORE_URL, data={'task_id': tasks[0].id}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['message'] == 'Restored 1 task(s) successfully'
+    assert list(user.tasks.values_list('id', flat=True)) == [tasks[0].id]
+    assert user.tasks.get().steps.count() == 1
+
+    response = client.post(TASK_RESTORE_URL, data={'task_id': f'{tasks[1].id},{tasks[2].id}'}, format='json')
+    assert response.json()['message'] == 'Restored 2 task(s) successfully'
+    assert user.tasks.count() == 3
+
+    response = client.post(TASK_RESTORE_URL, data={'task_id': 'all'}, format='json')
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    response = client.post(TASK_RESTORE_URL, data={'task_id': 'a'}, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    other = Task.objects.create(user=User.objects.create_user(phone='09120000000'), title='Other')
+    other.delete()
+    response = client.post(TASK_RESTORE_URL, data={'task_id': other.id}, format='json')
+    assert response.status_code == status.HTTP_404_NOT_FOUND, 'Tasks of other users should not be restored'
+
+
+@pytest.mark.django_db
+def test_delete_and_restore_contacts(client, user):
+    contacts = [Contact.objects.create(user=user, name=f'Contact {i}') for i in range(2)]
+
+    response = client.delete(CONTACT_URL, data={'selector': contacts[0].id}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    response = client.delete(CONTACT_URL, data={'selector': 'all'}, format='json')
+    assert response.json()['message'] == 'Deleted 1 contact(s) successfully'
+    assert not user.contacts.exists()
+
+    response = client.post(CONTACT_RESTORE_URL, data={'selector': 'all'}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['message'] == 'Restored 2 contact(s) successfully'
+    assert user.contacts.count() == 2
+
+
+@pytest.mark.django_db
+def test_purge_trash(user, tasks):
+    contact = Contact.objects.create(user=user, name='Contact')
+    contact.tasks.add(tasks[0])
+    contact.delete()
+    tasks[0].delete()
+    tasks[1].delete()
+    Task.trash.filter(id=tasks[1].id).update(deleted_at=timezone.now() - timedelta(days=1))
+    Contact.trash.update(deleted_at=timezone.now() - timedelta(days=1))
+
+    assert purge_trash(older_than=timedelta(hours=1), batch_size=1) == {'task.Task': 1, 'contact.Contact': 1}
+    assert list(Task.all_objects.values_list('id', flat=True).order_by('id')) == [tasks[0].id, tasks[2].id]
+    assert not Step.objects.filter(task_id=tasks[1].id).exists(), 'Purged tasks should take their steps along'
+    assert not Contact.all_objects.exists()
+
+    assert purge_trash() == {'task.Task': 0, 'contact.Contact': 0}, 'Recent trash should be kept'
+
+
+@pytest.mark.django_db
+def test_soft_delete_can_be_turned_off(settings, user, tasks):
+    settings.TRASH_SETTINGS = {'ENABLED': False}
+
+    tasks[0].delete()
+    assert Task.objects.filter(user=user).delete() == (4, {'task.Task': 2, 'step.Step': 2})
+    assert not Task.all_objects.exists()
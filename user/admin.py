@@ -1,8 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User
+from .models import User, SMS
 from .forms import UserCreationForm, UserChangeFormNew
 from django.contrib.auth.models import Group
+from django.utils import timezone
 
 admin.site.unregister(Group)
 
@@ -43,3 +44,17 @@ class UserAdmin(UserAdmin):
         ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser', 'user_permissions')}),
         ('Dates', {'fields': ('last_login', 'date_joined')}),
     )
+
+
+@admin.register(SMS)
+class SMSAdmin(admin.ModelAdmin):
+    list_display = ['id', 'phone', 'status', 'attempts', 'created_at', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['phone']
+    exclude = ['message']
+    readonly_fields = ['phone', 'attempts', 'last_error', 'created_at', 'expires_at', 'sent_at']
+    actions = ['retry']
+
+    @admin.action(description='Retry selected messages')
+    def retry(self, request, queryset):
+        queryset.exclude(status=SMS.SENT).update(status=SMS.PENDING, attempts=0, next_attempt_at=timezone.now())
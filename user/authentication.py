@@ -0,0 +1,34 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import authentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .cache import get_cached_user, get_user_cache_settings
+from .models import User
+from .tokens import is_token_revoked
+
+
+class JWTAuthentication(authentication.JWTAuthentication):
+    """
+    simplejwt's JWTAuthentication loading the user through the user cache (when USER_CACHE_SETTINGS["ENABLED"])
+    and also rejecting the tokens revoked by bumping the user's token_version.
+    """
+    def get_user(self, validated_token):
+        if not get_user_cache_settings()['ENABLED']:
+            user = super().get_user(validated_token)
+        else:
+            try:
+                user_id = validated_token[api_settings.USER_ID_CLAIM]
+            except KeyError:
+                raise InvalidToken(_('Token contained no recognizable user identification'))
+
+            try:
+                user = get_cached_user(user_id)
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+            if not user.is_active:
+                raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if is_token_revoked(validated_token, user):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return user
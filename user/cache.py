@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework_simplejwt.settings import api_settings
+from .models import User
+
+
+CACHED_USER_FIELDS = ('id', 'phone', 'is_active', 'token_version')
+
+
+def get_user_cache_settings() -> dict:
+    user_cache_settings = {
+        'CACHE_ALIAS': 'default',
+        'ENABLED': True,
+        'TIMEOUT': 5 * 60,
+    }
+    user_cache_settings.update(getattr(settings, 'USER_CACHE_SETTINGS', {}))
+
+    timeout = user_cache_settings['TIMEOUT']
+    if hasattr(timeout, 'total_seconds'):
+        user_cache_settings['TIMEOUT'] = timeout.total_seconds()
+
+    return user_cache_settings
+
+
+def user_cache_key(user_id) -> str:
+    return f'jwt-user-{user_id}'
+
+
+def get_cached_user(user_id) -> User:
+    """
+    Returns the user whose USER_ID_FIELD is `user_id`, with only CACHED_USER_FIELDS loaded (the rest are deferred
+    and loaded on access). The loaded fields are cached, so authenticating a request doesn't hit the database.
+    Raises User.DoesNotExist.
+    """
+    user_cache_settings = get_user_cache_settings()
+    cache = caches[user_cache_settings['CACHE_ALIAS']]
+
+    key = user_cache_key(user_id)
+    record = cache.get(key)
+    if record is None:
+        record = User.objects.values(*CACHED_USER_FIELDS).get(**{api_settings.USER_ID_FIELD: user_id})
+        cache.set(key, record, user_cache_settings['TIMEOUT'])
+
+    # Deferred instance, saving it only writes the loaded fields
+    return User.from_db('default', list(record), list(record.values()))
+
+
+def invalidate_cached_user(user: User, previous_user_id=None):
+    """
+    Removes the cached record of `user`, and the one cached under `previous_user_id` when its USER_ID_FIELD (e.g.
+    the phone number) was changed, so tokens issued for the old value stop authenticating right away.
+    """
+    user_cache_settings = get_user_cache_settings()
+    keys = [user_cache_key(getattr(user, api_settings.USER_ID_FIELD))]
+    if previous_user_id is not None:
+        keys.append(user_cache_key(previous_user_id))
+    caches[user_cache_settings['CACHE_ALIAS']].delete_many(keys)
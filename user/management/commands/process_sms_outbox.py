@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from user.sms import process_outbox
+from time import sleep
+
+
+class Command(BaseCommand):
+    help = 'Sends the pending messages of the SMS outbox, run as many workers as needed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='process a single batch and exit')
+        parser.add_argument('--batch-size', type=int, help='defaults to SMS_SETTINGS["BATCH_SIZE"]')
+        parser.add_argument('--interval', type=float, default=1, help='seconds to wait when the outbox is empty')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        try:
+            while True:
+                result = process_outbox(options['batch_size'])
+                if any(result.values()):
+                    self.stdout.write(
+                        f'sent: {result["sent"]}, retrying: {result["pending"]}, dead: {result["dead"]}'
+                    )
+                if options['once']:
+                    break
+                if not any(result.values()):
+                    sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
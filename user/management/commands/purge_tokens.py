@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from user.tokens import purge_expired_tokens, token_tables_size, vacuum_token_tables
+
+
+def format_size(size: int) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} TB'
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired refresh tokens from the token blacklist tables in chunks (meant to be run periodically)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='rows deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0, help='seconds to sleep between chunks')
+        parser.add_argument('--no-vacuum', action='store_true', help="don't VACUUM (ANALYZE) the tables afterwards")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        size_before = token_tables_size()
+        outstanding, blacklisted = purge_expired_tokens(options['batch_size'], options['pause'])
+        if not options['no_vacuum']:
+            vacuum_token_tables()
+        size_after = token_tables_size()
+
+        self.stdout.write(f'Removed {outstanding} outstanding and {blacklisted} blacklisted tokens')
+        for table, size in size_before.items():
+            self.stdout.write(f'{table}: {format_size(size)} -> {format_size(size_after.get(table, 0))}')
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_alter_user_phone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SMS',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(max_length=11, verbose_name='Phone number')),
+                ('message', models.TextField(help_text='Encrypted with CIPHER', verbose_name='Message')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('dead', 'Dead')], default='pending', max_length=7, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Last error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Next attempt at')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Expires at')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Sent at')),
+            ],
+            options={
+                'verbose_name': 'SMS',
+                'verbose_name_plural': 'SMS outbox',
+                'ordering': ['next_attempt_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['next_attempt_at'], name='sms_pending_idx')],
+            },
+        ),
+    ]
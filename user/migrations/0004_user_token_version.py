@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_sms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, help_text='Incremented to revoke every issued token', verbose_name='Token version'),
+        ),
+    ]
@@ -59,6 +59,8 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     date_joined = models.DateTimeField(default=timezone.now, verbose_name='Registration date')
 
+    token_version = models.PositiveIntegerField(default=0, verbose_name='Token version', help_text='Incremented to revoke every issued token')
+
     objects = UserManager()
 
     USERNAME_FIELD = 'phone'
@@ -70,3 +72,41 @@ class User(AbstractBaseUser, PermissionsMixin):
     class Meta:
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+
+
+class SMS(models.Model):
+    PENDING = 'pending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (DEAD, 'Dead'),
+    )
+
+    phone = models.CharField(max_length=11, verbose_name='Phone number')
+    message = models.TextField(verbose_name='Message', help_text='Encrypted with CIPHER')
+
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=PENDING, verbose_name='Status')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')
+    last_error = models.TextField(blank=True, null=True, verbose_name='Last error')
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Created at')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Next attempt at')
+    expires_at = models.DateTimeField(blank=True, null=True, verbose_name='Expires at')
+    sent_at = models.DateTimeField(blank=True, null=True, verbose_name='Sent at')
+
+    def __str__(self):
+        return f'{self.phone} ({self.status})'
+
+    class Meta:
+        verbose_name = 'SMS'
+        verbose_name_plural = 'SMS outbox'
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'],
+                condition=models.Q(status='pending'),
+                name='sms_pending_idx'
+            ),
+        ]
@@ -1,19 +1,49 @@
 from datetime import timedelta
-from django.core.cache import cache
+from django.core.cache import caches
 from django.conf import settings
 from random import randint
 from typing import Dict, Any
 from django.core.exceptions import ImproperlyConfigured
+from django.utils.crypto import salted_hmac
+from base64 import urlsafe_b64encode
 import logging
 
 
 logger = logging.getLogger(__name__)
+# An OTP is a hash holding the digest of its token and the (encoded) data to return once it's consumed, so that the
+# token can be checked by Redis itself
+SAVE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'digest', ARGV[1], 'data', ARGV[2])
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# Only a matching digest removes the OTP, a wrong one leaves it untouched. The digests are compared in constant time
+# (every byte is compared, whatever the first difference).
+CONSUME_SCRIPT = """
+local otp = redis.call('HMGET', KEYS[1], 'digest', 'data')
+if not otp[1] then
+    return nil
+end
+local stored, submitted = otp[1], ARGV[1]
+local difference = #stored == #submitted and 0 or 1
+for i = 1, math.min(#stored, #submitted) do
+    difference = bit.bor(difference, bit.bxor(stored:byte(i), submitted:byte(i)))
+end
+if difference ~= 0 then
+    return {0}
+end
+redis.call('DEL', KEYS[1])
+return {1, otp[2]}
+"""
 
 
 class OTP:
     def __init__(self, indicator: str, config: Dict[str, Any] = None):
         self.indicator = indicator
-        self.encoder = settings.CIPHER
 
         self.settings = getattr(settings, 'OTP_SETTINGS', {}).copy()
         if config:
@@ -25,6 +55,8 @@ class OTP:
 
         self.validate_settings()
 
+        self.cache = caches[self.settings.get('CACHE_ALIAS', 'default')]
+
     def validate_settings(self):
         try:  # DIGITS Validation
             digits = self.settings['DIGITS']
@@ -53,50 +85,51 @@ class OTP:
 
         return str(randint(int(start), int(end)))
 
+    @property
+    def key(self) -> str:
+        return f'{self.indicator}-otp'
+
     def save_token(self, token: str, **kwargs) -> bool:
+        """
+        Starts an OTP for `token`, `kwargs` are returned by consume_otp. Fails when there is an active OTP (checked
+        in the same round trip).
+        """
         if len(token) != self.settings['DIGITS']:
             return False
-        if cache.get(f'{self.indicator}-otp'):
-            return False
-        encoded_token = self.encoder.encrypt(token.encode())
-        kwargs.update({'token': encoded_token})
-        cache.set(f'{self.indicator}-otp', kwargs, self.expiration_time)
-        return True
-
-    def restore_token(self) -> (bool, str, dict):
-        data: dict | None = cache.get(f'{self.indicator}-otp')
-
-        if data is None:
-            return False, 'NO_ACTIVE_OTP', dict()
-
-        if not isinstance(data, dict):
-            return False, 'OTP_MISMATCH', dict()
-
-        token = data.pop('token', None)
-
-        if token is None:
-            return False, 'NO_TOKEN_FOUND', data
-
-        return True, token, data
-
-    def validate_otp(self, token: str) -> (bool, str | dict):
-        success, result, extra = self.restore_token()
-
-        if not success:
-            return success, result
-        # noinspection PyBroadException
-        try:
-            decrypted_token = self.encoder.decrypt(result.decode()).decode()
-        except Exception as e:
-            return False, 'FAILED_TO_DECRYPT_TOKEN'
-
-        if decrypted_token == token:
-            return True, extra
-        else:
+        client = self.cache.client.get_client(write=True)
+        return bool(client.register_script(SAVE_SCRIPT)(
+            keys=[self.cache.client.make_key(self.key)],
+            args=[self.token_digest(token), self.cache.client.encode(kwargs), int(self.expiration_time * 1000)],
+        ))
+
+    def token_digest(self, token: str) -> str:
+        # Keyed with SECRET_KEY and bound to the indicator, so a leaked digest can't be brute-forced offline
+        digest = salted_hmac('user.otp.OTP', f'{self.indicator}:{token}', algorithm='sha256').digest()
+        return urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+    def consume_otp(self, token: str) -> (bool, str | dict):
+        """
+        Validates `token` and removes the OTP in a single round trip: a Lua script compares the digest of `token`
+        with the stored one and only deletes the OTP when they match, so concurrent attempts can't both succeed
+        and a wrong token never makes the OTP unavailable to the right one.
+        """
+        client = self.cache.client.get_client(write=True)
+        consumed = client.register_script(CONSUME_SCRIPT)(
+            keys=[self.cache.client.make_key(self.key)],
+            args=[self.token_digest(token)],
+        )
+        if consumed is None:
+            return False, 'NO_ACTIVE_OTP'
+        if not consumed[0]:
             return False, 'INVALID_OTP_TOKEN'
 
+        extra = self.cache.client.decode(consumed[1])
+        if not isinstance(extra, dict):
+            return False, 'OTP_MISMATCH'
+        return True, extra
+
     def cancel_otp(self) -> bool:
-        return cache.delete(f'{self.indicator}-otp')
+        return self.cache.delete(self.key)
 
     def __str__(self):
         return f'OTP - {self.indicator}'
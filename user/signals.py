@@ -0,0 +1,22 @@
+from django.dispatch.dispatcher import receiver
+from django.db.models.signals import post_save, post_delete, pre_save
+from rest_framework_simplejwt.settings import api_settings
+from user.cache import invalidate_cached_user
+from user.models import User
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance: User, update_fields=None, **kwargs):
+    # The cached record is keyed by USER_ID_FIELD, remember the stored value in case it's being changed
+    field = api_settings.USER_ID_FIELD
+    if instance.pk is not None and field != User._meta.pk.name and (update_fields is None or field in update_fields):
+        instance._previous_user_id = User.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance: User, **kwargs):
+    previous_user_id = getattr(instance, '_previous_user_id', None)
+    if previous_user_id == getattr(instance, api_settings.USER_ID_FIELD):
+        previous_user_id = None
+    invalidate_cached_user(instance, previous_user_id)
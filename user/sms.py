@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.fernet import InvalidToken
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from typing import Dict, List, Tuple
+from TODO_V2.utility import send_sms
+from .models import SMS
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class ConsoleGateway:
+    """
+    Prints the messages to stdout, the default gateway until a real provider is configured.
+    """
+    def send(self, to: str, message: str):
+        send_sms(to, message)
+
+
+class LocalGateway:
+    """
+    Keeps the sent messages in memory (LocalGateway.outbox) for tests. Sending to a number in
+    LocalGateway.failing_numbers raises ConnectionError, to simulate an unavailable provider.
+    """
+    outbox: List[Tuple[str, str]] = []
+    failing_numbers: set = set()
+
+    def send(self, to: str, message: str):
+        if to in self.failing_numbers:
+            raise ConnectionError(f'Failed to deliver SMS to {to}')
+        self.outbox.append((to, message))
+
+
+def get_sms_settings() -> dict:
+    sms_settings = {
+        'GATEWAY': 'user.sms.ConsoleGateway',
+        'BATCH_SIZE': 50,
+        'CONCURRENCY': 4,
+        'MAX_ATTEMPTS': 5,
+        'RETRY_DELAY': 5,
+        'LEASE_TIME': 30,
+    }
+    sms_settings.update(getattr(settings, 'SMS_SETTINGS', {}))
+
+    for key, value in sms_settings.items():
+        if hasattr(value, 'total_seconds'):
+            sms_settings[key] = value.total_seconds()
+
+    return sms_settings
+
+
+def enqueue_sms(to: str, message: str, expires_in: float = None) -> SMS:
+    """
+    Stores the message in the outbox, it's delivered by the process_sms_outbox worker. Messages that
+    aren't delivered within `expires_in` seconds (e.g. OTPs) are dropped instead of being sent late.
+    """
+    now = timezone.now()
+    return SMS.objects.create(
+        phone=to,
+        message=settings.CIPHER.encrypt(message.encode()).decode(),
+        next_attempt_at=now,
+        expires_at=now + timedelta(seconds=expires_in) if expires_in else None,
+    )
+
+
+def claim_batch(batch_size: int, lease_time: float) -> List[SMS]:
+    """
+    Locks up to `batch_size` due messages (skipping the ones locked by other workers) and leases them
+    for `lease_time` seconds, so a crashed worker's messages are picked up again once the lease is over.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            SMS.objects.select_for_update(skip_locked=True)
+            .filter(status=SMS.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if batch:
+            SMS.objects.filter(id__in=[sms.id for sms in batch]).update(
+                attempts=F('attempts') + 1,
+                next_attempt_at=now + timedelta(seconds=lease_time),
+            )
+    for sms in batch:
+        sms.attempts += 1
+    return batch
+
+
+def process_outbox(batch_size: int = None) -> Dict[str, int]:
+    """
+    Sends one batch of due messages through the configured gateway, CONCURRENCY at a time. Failed messages
+    are retried with an exponential backoff and dead-lettered after MAX_ATTEMPTS attempts, messages that can't be
+    decrypted (encrypted with a key that isn't in CIPHER_KEYS) right away.
+    """
+    sms_settings = get_sms_settings()
+    batch = claim_batch(batch_size or sms_settings['BATCH_SIZE'], sms_settings['LEASE_TIME'])
+    result = {SMS.SENT: 0, SMS.PENDING: 0, SMS.DEAD: 0}
+    if not batch:
+        return result
+
+    now = timezone.now()
+    expired = [sms for sms in batch if sms.expires_at and sms.expires_at <= now]
+    for sms in expired:
+        sms.status, sms.last_error = SMS.DEAD, 'Expired before it could be sent'
+    batch = [sms for sms in batch if sms not in expired]
+
+    gateway = import_string(sms_settings['GATEWAY'])()
+
+    def deliver(sms: SMS):
+        try:
+            gateway.send(sms.phone, settings.CIPHER.decrypt(sms.message.encode()).decode())
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=sms_settings['CONCURRENCY']) as executor:
+        errors = list(executor.map(deliver, batch))
+
+    now = timezone.now()
+    for sms, error in zip(batch, errors):
+        if error is None:
+            sms.status, sms.sent_at, sms.last_error = SMS.SENT, now, None
+        elif isinstance(error, InvalidToken):  # Retrying won't help
+            logger.error(f'Giving up on SMS {sms.id} to {sms.phone}: its message can\'t be decrypted')
+            sms.status, sms.last_error = SMS.DEAD, 'Failed to decrypt the message'
+        elif sms.attempts >= sms_settings['MAX_ATTEMPTS']:
+            logger.error(f'Giving up on SMS {sms.id} to {sms.phone} after {sms.attempts} attempts: {error}')
+            sms.status, sms.last_error = SMS.DEAD, str(error)
+        else:
+            logger.warning(f'Failed to send SMS {sms.id} to {sms.phone} (attempt {sms.attempts}): {error}')
+            delay = sms_settings['RETRY_DELAY'] * 2 ** (sms.attempts - 1)
+            sms.next_attempt_at, sms.last_error = now + timedelta(seconds=delay), str(error)
+
+    batch += expired
+    SMS.objects.bulk_update(batch, ['status', 'sent_at', 'last_error', 'next_attempt_at'])
+    for sms in batch:
+        result[sms.status] += 1
+    return result
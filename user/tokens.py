@@ -0,0 +1,98 @@
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+from .cache import invalidate_cached_user
+from .models import User
+from typing import Dict, Tuple
+from time import sleep
+
+
+TOKEN_VERSION_CLAIM = 'token_version'
+
+
+class TokenVersionMixin(tokens.Token):
+    """
+    Embeds the user's token_version in the token, tokens whose version is older than the user's are revoked.
+
+    Listed after simplejwt's token class so the claim is set before BlacklistMixin.for_user stores the token as
+    an OutstandingToken.
+    """
+    @classmethod
+    def for_user(cls, user: User):
+        token = super().for_user(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+
+class RefreshToken(tokens.RefreshToken, TokenVersionMixin):
+    pass
+
+
+class AccessToken(tokens.AccessToken, TokenVersionMixin):
+    pass
+
+
+def is_token_revoked(token: tokens.Token, user: User) -> bool:
+    # Tokens issued before versions were introduced carry no claim and count as version 0
+    return token.get(TOKEN_VERSION_CLAIM, 0) != user.token_version
+
+
+def revoke_user_tokens(user: User) -> int:
+    """
+    Revokes every access and refresh token issued to `user` so far with a single UPDATE (log out everywhere).
+    Returns the new token version, which is also set on `user`.
+    """
+    User.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    user.refresh_from_db(fields=['token_version'])
+    invalidate_cached_user(user)  # update() doesn't send post_save
+    return user.token_version
+
+
+def purge_expired_tokens(batch_size: int = 1000, pause: float = 0) -> Tuple[int, int]:
+    """
+    Deletes expired outstanding tokens (and their blacklist entries) `batch_size` rows at a time, each chunk
+    in its own short transaction so the tables aren't locked for long. Returns the number of
+    (outstanding, blacklisted) rows removed.
+    """
+    outstanding_removed = blacklisted_removed = 0
+    while True:
+        with transaction.atomic():
+            token_ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not token_ids:
+                break
+            _, removed = OutstandingToken.objects.filter(id__in=token_ids).delete()
+        outstanding_removed += removed.get(OutstandingToken._meta.label, 0)
+        blacklisted_removed += removed.get(BlacklistedToken._meta.label, 0)
+        if pause:
+            sleep(pause)
+
+    return outstanding_removed, blacklisted_removed
+
+
+def token_tables_size() -> Dict[str, int]:
+    """
+    Returns the on-disk size (including indexes and TOAST) of the token blacklist tables in bytes.
+    """
+    tables = [OutstandingToken._meta.db_table, BlacklistedToken._meta.db_table]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT relname, pg_total_relation_size(oid) FROM pg_class WHERE relname = ANY(%s)',
+            [tables]
+        )
+        return dict(cursor.fetchall())
+
+
+def vacuum_token_tables():
+    """
+    Runs VACUUM (ANALYZE) on the token blacklist tables, so the space freed by a purge is reused and the planner
+    statistics match the new row counts. Unlike VACUUM FULL it doesn't lock the tables.
+    """
+    with connection.cursor() as cursor:
+        for model in (BlacklistedToken, OutstandingToken):
+            cursor.execute(f'VACUUM (ANALYZE) {connection.ops.quote_name(model._meta.db_table)}')
@@ -9,4 +9,5 @@ urlpatterns = [
     path('complete/', views.CompleteAuthentication.as_view(), name='complete-authentication'),
     path('renew/', views.RenewToken.as_view(), name='renew-token'),
     path('edit/', views.EditProfile.as_view(), name='edit-profile'),
+    path('logout/', views.LogoutEverywhere.as_view(), name='logout-everywhere'),
 ]
@@ -8,9 +8,10 @@ from .otp import OTP
 from .models import User, phone_validator
 from rest_framework import status
 from TODO_V2.mixins import GetDataMixin, ResponseBuilderMixin
-from TODO_V2.utility import send_sms
+from .sms import enqueue_sms
+from .tokens import RefreshToken, AccessToken, is_token_revoked, revoke_user_tokens
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiResponse, OpenApiExample, OpenApiParameter
-from rest_framework_simplejwt.tokens import RefreshToken, AccessToken, OutstandingToken, BlacklistedToken
+from rest_framework_simplejwt.tokens import OutstandingToken
 from .serializers import UserSerializer, EditProfileSerializer
 import logging
 
@@ -194,7 +195,7 @@ class StartAuthentication(APIView, GetDataMixin, ResponseBuilderMixin):
         otp = OTP(data['phone'])
         token = otp.generate_token()
         if otp.save_token(token, **extra):
-            send_sms(data['phone'], f'{auth_type} with {token}')
+            enqueue_sms(data['phone'], f'{auth_type} with {token}', expires_in=otp.expiration_time)
             return self.build_response(
                 response_status=status.HTTP_200_OK,
                 message='OTP token sent successfully.',
@@ -419,7 +420,7 @@ class CompleteAuthentication(APIView, GetDataMixin, ResponseBuilderMixin):
             )
 
         otp = OTP(data['phone'])
-        success, result = otp.validate_otp(data['token'])
+        success, result = otp.consume_otp(data['token'])
 
         if not success:
             if result == 'OTP_MISMATCH':
@@ -432,11 +433,6 @@ class CompleteAuthentication(APIView, GetDataMixin, ResponseBuilderMixin):
                     response_status=status.HTTP_404_NOT_FOUND,
                     message='There is no active OTP for this phone'
                 )
-            elif result == 'NO_TOKEN_FOUND':
-                return self.build_response(
-                    response_status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    message='Failed to retrieve OTP token'
-                )
             elif result == 'INVALID_OTP_TOKEN':
                 return self.build_response(
                     response_status=status.HTTP_406_NOT_ACCEPTABLE,
@@ -448,8 +444,6 @@ class CompleteAuthentication(APIView, GetDataMixin, ResponseBuilderMixin):
                     message='Something went wrong'
                 )
 
-        otp.cancel_otp()
-
         if 'id' in result:  # login
             try:
                 user = User.objects.get(id=result['id'])
@@ -460,10 +454,7 @@ class CompleteAuthentication(APIView, GetDataMixin, ResponseBuilderMixin):
                     )
 
                 # Deactivating the existing tokens
-                active_tokens = OutstandingToken.objects.filter(user=user)
-                if active_tokens.exists():
-                    for token in active_tokens:
-                        BlacklistedToken.objects.get_or_create(token=token)
+                revoke_user_tokens(user)
 
                 refresh_token = RefreshToken.for_user(user)
 
@@ -577,7 +568,7 @@ class CompleteAuthentication(APIView, GetDataMixin, ResponseBuilderMixin):
                 ]
             ),
             401: OpenApiResponse(
-                description='Blacklisted',
+                description='Blacklisted/revoked',
                 response=dict,
                 examples=[
                     OpenApiExample(
@@ -585,6 +576,12 @@ class CompleteAuthentication(APIView, GetDataMixin, ResponseBuilderMixin):
                         value={
                             'message': 'Refresh token is blacklisted.',
                         }
+                    ),
+                    OpenApiExample(
+                        'Revoked refresh token',
+                        value={
+                            'message': 'Refresh token is revoked.',
+                        }
                     )
                 ]
             ),
@@ -648,11 +645,11 @@ class RenewToken(APIView, GetDataMixin, ResponseBuilderMixin):
                 message='Invalid refresh token'
             )
 
+        # Looked up by the (unique, indexed) jti claim rather than the token text
         is_allowed = OutstandingToken.objects.filter(
-            token=str(refresh),
+            jti=refresh['jti'],
             expires_at__gt=timezone.now(),
-        ).exclude(
-            blacklistedtoken__isnull=False,
+            blacklistedtoken__isnull=True,
         ).exists()
 
         if not is_allowed:
@@ -675,6 +672,12 @@ class RenewToken(APIView, GetDataMixin, ResponseBuilderMixin):
                 message='User not found'
             )
 
+        if is_token_revoked(refresh, user):
+            return self.build_response(
+                response_status=status.HTTP_401_UNAUTHORIZED,
+                message='Refresh token is revoked'
+            )
+
         access = AccessToken.for_user(user)
 
         return self.build_response(
@@ -842,3 +845,39 @@ class EditProfile(APIView, ResponseBuilderMixin):
             message='Failed to update profile',
             errors=serializer.errors
         )
+
+
+@extend_schema_view(
+    post=extend_schema(
+        tags=['Authentication'],
+        summary='Log out everywhere',
+        description='Revoke every access and refresh token issued to the user.' + AUTHENTICATION_REQUIRED,
+        request=None,
+        responses={
+            200: OpenApiResponse(
+                description='Logged out',
+                response=dict,
+                examples=[
+                    OpenApiExample(
+                        'Success Response',
+                        value={
+                            'message': 'Logged out from all sessions.'
+                        }
+                    )
+                ]
+            ),
+            401: UNAUTHORIZED_RESPONSE,
+            429: TOO_MANY_REQUESTS_RESPONSE,
+        }
+    )
+)
+class LogoutEverywhere(APIView, ResponseBuilderMixin):
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'auth_renew'
+
+    def post(self, request):
+        revoke_user_tokens(request.user)
+        return self.build_response(
+            response_status=status.HTTP_200_OK,
+            message='Logged out from all sessions.'
+        )